@@ -0,0 +1,83 @@
+"""Benchmark annotator keystrokes: rich markup redraw vs cached ANSI frames.
+
+Usage: python -m benchmarks.annotator_render --chars 10000
+"""
+import io
+import re
+import time
+
+import click
+from rich.console import Console
+
+from cli.annotator import DocumentView
+
+from benchmarks.synthetic import keywords_and_summaries
+
+
+def _legacy_frame(console, desc, word_start, word_end, entities):
+    """The previous print_colorful_description, minus `clear` and the prompt."""
+    tags = entities.copy()
+    intags = [
+        tag
+        for tag in tags
+        if (tag[0] <= word_start and word_end <= tag[1])
+        or (word_start < tag[0] <= word_end)
+        or (word_start < tag[1] <= word_end)
+    ]
+    if not intags:
+        tags.append([word_start, word_end, "CURRENT"])
+    tags = sorted(tags, key=lambda x: x[0])
+    colors = {"KEYWORD": "red", "CURRENT": "purple"}
+    i = 0
+    output = ""
+    for _start, _stop, _label in tags:
+        color = colors[_label]
+        output += "".join([desc[i:_start], f"[{color}]{desc[_start:_stop]}[/{color}]"])
+        i = _stop
+    console.print("".join([output, desc[i:]]))
+
+
+@click.command()
+@click.option("--chars", default=10000, help="length of the annotated text.")
+@click.option("--keys", default=500, help="number of simulated keystrokes.")
+def main(chars, keys):
+    _, summaries = keywords_and_summaries(1000, 1000)
+    text = " ".join(summaries)[:chars]
+    words = [(m.start(), m.end()) for m in re.finditer(r"\S+", text)]
+    entities = [[start, stop, "KEYWORD"] for start, stop in words[::3]]
+    moves = [words[i % len(words)] for i in range(keys)]
+
+    console = Console(file=io.StringIO(), force_terminal=True, width=120)
+    start = time.perf_counter()
+    for word_start, word_end in moves:
+        _legacy_frame(console, text, word_start, word_end, entities)
+        # the previous key loop re-sorted entities after every key
+        entities = sorted(entities, key=lambda x: x[0])
+    legacy = (time.perf_counter() - start) / keys
+
+    view = DocumentView(text, entities)
+    start = time.perf_counter()
+    for word_start, word_end in moves:
+        view.frame(word_start, word_end)
+    cached = (time.perf_counter() - start) / keys
+
+    start = time.perf_counter()
+    for i, (word_start, word_end) in enumerate(moves):
+        # every key edits an entity, the rendering is rebuilt
+        if i % 2:
+            view.entities.add([word_start, word_end, "KEYWORD"])
+        else:
+            match = view.find_unset(word_start, word_end)
+            if match:
+                view.entities.remove(match)
+        view.frame(word_start, word_end)
+    edited = (time.perf_counter() - start) / keys
+
+    print(f"{len(text)} chars, {len(entities)} entities")
+    print(f"rich markup redraw  {legacy * 1e3:>8.3f}ms per key")
+    print(f"ANSI frame, move    {cached * 1e3:>8.3f}ms per key")
+    print(f"ANSI frame, edit    {edited * 1e3:>8.3f}ms per key")
+
+
+if __name__ == "__main__":
+    main()
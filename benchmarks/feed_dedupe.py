@@ -0,0 +1,78 @@
+"""Benchmark near-duplicate collapsing: MinHash/LSH against the feed store.
+
+Usage: python -m benchmarks.feed_dedupe --archived 100000 --batch 1000
+"""
+import time
+import tempfile
+from pathlib import Path
+
+import click
+
+from src import database
+from src import dedupe
+
+from benchmarks import synthetic
+
+
+@click.command()
+@click.option("--archived", default=100000, help="signatures already in the store.")
+@click.option("--batch", default=1000, help="feeds of one fetch cycle.")
+@click.option("--copies", default=0.2, help="share of feeds copying another.")
+@click.option("--threshold", default=0.6, help="similarity of near duplicates.")
+def main(archived, batch, copies, threshold):
+    feeds, texts, originals = synthetic.near_duplicates(
+        archived + batch, copies, seed=1
+    )
+
+    start = time.perf_counter()
+    for text in texts[:batch]:
+        dedupe.signature(text)
+    elapsed = time.perf_counter() - start
+    print(f"signature          {elapsed / batch * 1e6:>10.1f}us per feed")
+
+    with tempfile.TemporaryDirectory() as directory:
+        database.connect(str(Path(directory) / "archives.db"))
+        database.create_table()
+
+        start = time.perf_counter()
+        for offset in range(0, archived, batch):
+            with database.transaction():
+                dedupe.collapse(
+                    feeds[offset : offset + batch],
+                    texts[offset : offset + batch],
+                    threshold,
+                )
+        elapsed = time.perf_counter() - start
+        print(f"archive            {archived / elapsed:>10.0f} feeds/sec")
+
+        start = time.perf_counter()
+        with database.transaction():
+            unique = dedupe.collapse(feeds[archived:], texts[archived:], threshold)
+        elapsed = time.perf_counter() - start
+        print(
+            f"collapse batch     {elapsed * 1e3:>10.1f}ms "
+            f"({batch} feeds, {archived} archived)"
+        )
+
+        # every feed is recorded, a copy should point at its original
+        sql = "select link, duplicate_of from {TABLE}_signatures".format(
+            TABLE=database.FeedStore.table
+        )
+        found = dict(database.FeedStore.cursor.execute(sql).fetchall())
+        index = {feed["link"]: i for i, feed in enumerate(feeds)}
+        copied = [i for i, original in enumerate(originals) if original != i]
+        caught = sum(1 for i in copied if found[feeds[i]["link"]] is not None)
+        wrong = sum(
+            1
+            for link, duplicate_of in found.items()
+            if duplicate_of is not None
+            and originals[index[link]] != originals[index[duplicate_of]]
+        )
+        flagged = sum(1 for duplicate_of in found.values() if duplicate_of)
+        print(f"recall             {caught / max(1, len(copied)):>10.3f}")
+        print(f"precision          {1 - wrong / max(1, flagged):>10.3f}")
+        print(f"batch kept         {len(unique):>10} of {batch} feeds")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""Benchmark the rss fetch stage against the local RSSHub stand-in.
+
+Usage: python -m benchmarks.feed_fetching --accounts 100 --latency 0.2
+"""
+import time
+
+import click
+
+from src import fetcher
+from src import settings
+from benchmarks.rsshub_server import start_server, load_recorded_feeds
+
+
+def _fresh_states(users):
+    return [
+        dict(
+            user=user,
+            etag=None,
+            modified=None,
+            last_seen=None,
+            failures=0,
+            next_fetch=0,
+        )
+        for user in users
+    ]
+
+
+def _run(api, states, concurrency):
+    start = time.perf_counter()
+    results = list(fetcher.fetch_accounts(api, states, concurrency, timeout=15))
+    elapsed = time.perf_counter() - start
+
+    errors = sum(1 for result in results if result[4] is not None)
+    not_modified = sum(1 for result in results if result[1] == 304)
+    states = [
+        fetcher.next_state(state, headers, data, error, 300, 86400)
+        for state, _, headers, data, error in results
+    ]
+    return elapsed, errors, not_modified, states
+
+
+@click.command()
+@click.option("--accounts", default=100, help="number of accounts to fetch.")
+@click.option("--latency", default=0.2, help="simulated server latency (s).")
+@click.option("--concurrency", default=settings.get_int("rss.CONCURRENCY", 8))
+def main(accounts, latency, concurrency):
+    users = [f"user{i}" for i in range(accounts)]
+    server, api = start_server(load_recorded_feeds(users=users), latency=latency)
+
+    try:
+        for name, workers in (("sequential", 1), ("concurrent", concurrency)):
+            elapsed, errors, _, states = _run(api, _fresh_states(users), workers)
+            print(
+                f"{name:<12} j={workers:<3} {accounts} accounts "
+                f"{elapsed:>7.2f}s ({errors} errors)"
+            )
+
+        # second pass sends If-None-Match and gets 304 back
+        elapsed, errors, not_modified, _ = _run(api, states, concurrency)
+        print(
+            f"{'conditional':<12} j={concurrency:<3} {accounts} accounts "
+            f"{elapsed:>7.2f}s ({not_modified} not modified)"
+        )
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
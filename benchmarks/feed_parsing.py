@@ -0,0 +1,49 @@
+"""Benchmark feed parsing: feedparser vs incremental parsing with few new entries.
+
+Usage: python -m benchmarks.feed_parsing --repeat 10
+"""
+import time
+
+import click
+import feedparser
+
+from src.feed_parser import parse_entries
+
+from benchmarks.rsshub_server import load_recorded_feeds
+
+
+def _timed(parse, bodies, repeat):
+    start = time.perf_counter()
+    entries = 0
+    for _ in range(repeat):
+        for body, last_seen in bodies:
+            entries += len(parse(body, last_seen)["entries"])
+    return time.perf_counter() - start, entries // repeat
+
+
+@click.command()
+@click.option("--repeat", default=10, help="times every feed is parsed.")
+def main(repeat):
+    feeds = list(load_recorded_feeds().values())
+    links = [
+        [entry["link"] for entry in parse_entries(body)["entries"]] for body in feeds
+    ]
+    everything = [(body, None) for body in feeds]
+
+    elapsed, entries = _timed(lambda body, _: feedparser.parse(body), everything, repeat)
+    print(f"feedparser          {elapsed:>8.3f}s ({entries} entries)")
+
+    elapsed, entries = _timed(parse_entries, everything, repeat)
+    print(f"full pull parse     {elapsed:>8.3f}s ({entries} entries)")
+
+    for new in (5, 1, 0):
+        bodies = [
+            (body, feed_links[new] if len(feed_links) > new else None)
+            for body, feed_links in zip(feeds, links)
+        ]
+        elapsed, entries = _timed(parse_entries, bodies, repeat)
+        print(f"incremental, {new} new {elapsed:>8.3f}s ({entries} entries)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""Benchmark archive search: FTS5 index vs LIKE scans, at scale.
+
+Usage: python -m benchmarks.feed_search --rows 1000000
+"""
+import time
+import random
+import tempfile
+from pathlib import Path
+
+import click
+
+from src import database
+
+from benchmarks import synthetic
+
+
+def _archive_feeds(start, count, texts, rng):
+    feeds = synthetic.feeds(start, count)
+    for feed in feeds:
+        text = next(texts)
+        feed["title"] = text[:100]
+        feed["summary"] = text.replace(" ", "<br />", 1)
+        feed["published"] = "{}, {:02d} {} 2021 12:00:00 GMT".format(
+            rng.choice(["Mon", "Tue", "Wed"]),
+            rng.randint(1, 28),
+            rng.choice(["Jan", "Feb", "Mar", "Apr"]),
+        )
+    return feeds
+
+
+def _timed(function, repeat=5):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+@click.command()
+@click.option("--rows", default=1000000, help="number of archived feeds.")
+@click.option("--batch", default=10000, help="feeds per insert transaction.")
+def main(rows, batch):
+    rng = random.Random(0)
+    texts = synthetic.tweets(rows)
+    with tempfile.TemporaryDirectory() as directory:
+        database.connect(str(Path(directory) / "archives.db"))
+        database.create_table()
+
+        start = time.perf_counter()
+        for offset in range(0, rows, batch):
+            with database.transaction():
+                database.insert_feeds(_archive_feeds(offset, batch, texts, rng))
+        elapsed = time.perf_counter() - start
+        print(f"insert with index  {rows / elapsed:>10.0f} rows/sec ({rows} rows)")
+
+        start = time.perf_counter()
+        database.rebuild_search_index()
+        print(f"rebuild index      {time.perf_counter() - start:>10.2f}s")
+
+        cases = (
+            ("rare term", '"sandbox" "escape" "kernel" "heap"', {}),
+            ("common term", '"exploit"', {}),
+            ("prefix", '"rev"*', {}),
+            ("account", '"exploit"', {"account": "user7"}),
+            ("date range", '"exploit"', {"since": 1612137600, "until": 1612742400}),
+            ("page 50", '"exploit"', {"offset": 49 * 20}),
+        )
+        for name, query, filters in cases:
+            elapsed, (total, _) = _timed(
+                lambda: database.search_feeds(query, **filters)
+            )
+            print(f"search {name:<12} {elapsed * 1e3:>10.1f}ms ({total} matches)")
+
+        sql = "select count(*) from {TABLE} where summary like ?".format(
+            TABLE=database.FeedStore.table
+        )
+        elapsed, _ = _timed(
+            lambda: database.FeedStore.cursor.execute(sql, ["%sandbox%"]).fetchone(), 1
+        )
+        print(f"LIKE scan          {elapsed * 1e3:>10.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
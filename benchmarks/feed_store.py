@@ -0,0 +1,68 @@
+"""Benchmark FeedStore insert and dedupe throughput on a large archive.
+
+Usage: python -m benchmarks.feed_store --rows 1000000
+"""
+import os
+import time
+import tempfile
+
+import click
+
+from src import database
+
+from benchmarks.synthetic import feeds as synthetic_feeds
+
+
+def _legacy_store(feeds):
+    """The previous per-row path: title scan + insert + commit each."""
+    cursor, conn = database.FeedStore.cursor, database.FeedStore.conn
+    table = database.FeedStore.table
+    for feed in feeds:
+        cursor.execute(
+            f"select exists(select 1 from {table} where title=?)", (feed["title"],)
+        )
+        if not cursor.fetchone()[0]:
+            cursor.execute(
+                f"insert into {table} (author, title, link, published, summary) "
+                "values (?, ?, ?, ?, ?)",
+                list(feed.values()),
+            )
+            conn.commit()
+
+
+@click.command()
+@click.option("--rows", default=1000000, help="archived rows to build up.")
+@click.option("--batch", default=10000, help="feeds per fetch cycle.")
+@click.option("--legacy", default=200, help="feeds to time on the legacy path.")
+def main(rows, batch, legacy):
+    with tempfile.TemporaryDirectory() as tmp:
+        database.connect(os.path.join(tmp, "archives.db"))
+        database.create_table()
+
+        start = time.perf_counter()
+        for offset in range(0, rows, batch):
+            with database.transaction():
+                database.insert_feeds(synthetic_feeds(offset, batch))
+        elapsed = time.perf_counter() - start
+        print(f"bulk insert    {rows / elapsed:>12.0f} rows/sec ({rows} rows)")
+
+        # a fetch cycle where 90% of the entries are already archived
+        feeds = synthetic_feeds(rows - batch * 9 // 10, batch)
+        start = time.perf_counter()
+        with database.transaction():
+            new_feeds = database.insert_feeds(feeds)
+        elapsed = time.perf_counter() - start
+        print(
+            f"bulk dedupe    {len(feeds) / elapsed:>12.0f} rows/sec "
+            f"({len(new_feeds)} new of {len(feeds)})"
+        )
+
+        feeds = synthetic_feeds(rows + batch, legacy)
+        start = time.perf_counter()
+        _legacy_store(feeds)
+        elapsed = time.perf_counter() - start
+        print(f"legacy         {len(feeds) / elapsed:>12.0f} rows/sec ({legacy} rows)")
+
+
+if __name__ == "__main__":
+    main()
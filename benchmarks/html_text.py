@@ -0,0 +1,47 @@
+"""Benchmark summary text extraction: BeautifulSoup vs html_text.
+
+Summaries come from the recorded RSSHub feeds, parsed by feedparser as
+`rss today` sees them.
+
+Usage: python -m benchmarks.html_text --repeat 20
+"""
+import time
+
+import click
+import feedparser
+from bs4 import BeautifulSoup
+
+from src import html_text
+
+from benchmarks.rsshub_server import load_recorded_feeds
+
+
+def _recorded_summaries():
+    summaries = []
+    for body in load_recorded_feeds().values():
+        summaries += [entry["summary"] for entry in feedparser.parse(body)["entries"]]
+    return summaries
+
+
+@click.command()
+@click.option("--repeat", default=20, help="times the recorded summaries are used.")
+def main(repeat):
+    summaries = _recorded_summaries() * repeat
+
+    start = time.perf_counter()
+    expected = [BeautifulSoup(html, "html.parser").text for html in summaries]
+    elapsed = time.perf_counter() - start
+    print(f"BeautifulSoup       {elapsed:>8.3f}s ({len(summaries) / elapsed:.0f}/sec)")
+
+    start = time.perf_counter()
+    texts = html_text.html_to_texts(summaries)
+    elapsed = time.perf_counter() - start
+    print(f"html_text           {elapsed:>8.3f}s ({len(summaries) / elapsed:.0f}/sec)")
+
+    fallbacks = sum(html_text.strip_tags(html) is None for html in summaries)
+    mismatches = sum(text != other for text, other in zip(texts, expected))
+    print(f"{len(summaries)} summaries, {fallbacks} fallbacks, {mismatches} mismatches")
+
+
+if __name__ == "__main__":
+    main()
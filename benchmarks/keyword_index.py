@@ -0,0 +1,63 @@
+"""Benchmark keyword loading: features.txt vs the compiled keyword index.
+
+Usage: python -m benchmarks.keyword_index --keywords 1000000
+"""
+import os
+import time
+import tempfile
+
+import click
+
+from src.keyword_index import KeywordIndex
+from src.matcher import load_keyword_matcher
+
+from benchmarks.synthetic import keywords_and_summaries
+
+
+@click.command()
+@click.option("--keywords", "n_keywords", default=1000000, help="number of keywords.")
+@click.option("--lookups", "n_lookups", default=10000, help="number of lookups.")
+def main(n_keywords, n_lookups):
+    keywords, _ = keywords_and_summaries(n_keywords, 0)
+    probes = keywords[:: max(1, len(keywords) // n_lookups)]
+
+    with tempfile.TemporaryDirectory() as directory:
+        text_file = os.path.join(directory, "features.txt")
+        index_file = os.path.join(directory, "features.idx")
+        with open(text_file, "w") as f:
+            f.writelines(keyword + "\n" for keyword in keywords)
+
+        start = time.perf_counter()
+        index = KeywordIndex(index_file)
+        index.update(keywords)
+        index.save()
+        index.close()
+        print(f"index compile       {time.perf_counter() - start:>8.3f}s")
+        print(
+            f"file size           text {os.path.getsize(text_file) >> 10}KiB, "
+            f"index {os.path.getsize(index_file) >> 10}KiB"
+        )
+
+        start = time.perf_counter()
+        with open(text_file) as f:
+            words = set(line.strip() for line in f)
+        hits = sum(keyword in words for keyword in probes)
+        print(f"text load + lookup  {time.perf_counter() - start:>8.3f}s ({hits} hits)")
+
+        start = time.perf_counter()
+        index = KeywordIndex(index_file)
+        hits = sum(keyword in index for keyword in probes)
+        print(f"index load + lookup {time.perf_counter() - start:>8.3f}s ({hits} hits)")
+
+        start = time.perf_counter()
+        matcher = load_keyword_matcher(text_file)
+        print(f"text matcher        {time.perf_counter() - start:>8.3f}s ({len(matcher)})")
+
+        start = time.perf_counter()
+        matcher = KeywordIndex(index_file).get_matcher()
+        print(f"index matcher       {time.perf_counter() - start:>8.3f}s ({len(matcher)})")
+        index.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""Benchmark rss keyword tagging: set intersection + re.finditer vs keyword matcher.
+
+Usage: python -m benchmarks.keyword_matching --keywords 30000 --summaries 10000
+"""
+import re
+import time
+
+import click
+
+from src.matcher import KeywordMatcher
+
+from benchmarks.synthetic import keywords_and_summaries
+
+
+def _legacy_entities(summaries, keywords):
+    keywords = set(keywords)
+    count = 0
+    for text in summaries:
+        for keyword in set(text.split()) & keywords:
+            count += sum(1 for _ in re.finditer(re.escape(keyword), text))
+    return count
+
+
+def _matcher_entities(summaries, matcher):
+    return sum(len(matcher.findall(text)) for text in summaries)
+
+
+@click.command()
+@click.option("--keywords", "n_keywords", default=30000, help="number of keywords.")
+@click.option("--summaries", "n_summaries", default=10000, help="number of summaries.")
+def main(n_keywords, n_summaries):
+    keywords, summaries = keywords_and_summaries(n_keywords, n_summaries)
+
+    start = time.perf_counter()
+    matcher = KeywordMatcher(keywords)
+    build = time.perf_counter() - start
+    print(f"matcher build       {build:>8.3f}s ({len(matcher)} keywords)")
+
+    start = time.perf_counter()
+    legacy = _legacy_entities(summaries, keywords)
+    print(f"set + re.finditer   {time.perf_counter() - start:>8.3f}s ({legacy} hits)")
+
+    start = time.perf_counter()
+    hits = _matcher_entities(summaries, matcher)
+    print(f"keyword matcher     {time.perf_counter() - start:>8.3f}s ({hits} hits)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""Micro-benchmark per-document keyword selection.
+
+Compares the previous sort + filter chain with TextRank.get_keywords.
+
+Usage: python -m benchmarks.keyword_selection
+"""
+import time
+import random
+import string
+from collections import OrderedDict
+
+import click
+
+from src import utils
+from src.textrank import TextRank
+
+
+def _legacy_select(node_weight, number):
+    """The previous get_keywords + filter_keywords."""
+    keywords = {}
+    node_weight = OrderedDict(
+        sorted(node_weight.items(), key=lambda t: t[1], reverse=True)
+    )
+    for i in range(number):
+        for key, value in node_weight.items():
+            keywords[key] = value
+
+    keywords = dict(filter(lambda x: x[1] >= 1, keywords.items()))
+    keywords = set(keywords.keys())
+    keywords = list(filter(lambda x: 3 < len(x) < 15, keywords))
+    keywords = list(filter(utils.is_ascii_word, keywords))
+    return keywords
+
+
+def _synthetic_node_weights(vocab_size, count, seed=0):
+    rng = random.Random(seed)
+    letters = string.ascii_lowercase + string.ascii_uppercase
+    vocab = [
+        "".join(rng.choice(letters) for _ in range(rng.randint(2, 16)))
+        for _ in range(vocab_size * 4)
+    ]
+    return [
+        {rng.choice(vocab): rng.uniform(0.15, 3) for _ in range(vocab_size)}
+        for _ in range(count)
+    ]
+
+
+@click.command()
+@click.option("--sizes", default="5,10,50,500", help="comma separated vocab sizes.")
+@click.option("--docs", default=20000, help="documents per size.")
+@click.option("--number", default=10, help="keywords per document.")
+def main(sizes, docs, number):
+    textrank = TextRank.__new__(TextRank)  # no spaCy model needed here
+
+    print(f"{'vocab':>6} {'legacy(us/doc)':>15} {'top-k(us/doc)':>14}")
+    for size in map(int, sizes.split(",")):
+        node_weights = _synthetic_node_weights(size, docs)
+
+        start = time.perf_counter()
+        for node_weight in node_weights:
+            _legacy_select(node_weight, number)
+        legacy = (time.perf_counter() - start) / docs
+
+        start = time.perf_counter()
+        for node_weight in node_weights:
+            textrank.get_keywords(number, node_weight, filtered=True)
+        topk = (time.perf_counter() - start) / docs
+
+        print(f"{size:>6} {legacy * 1e6:>15.1f} {topk * 1e6:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""Benchmark report saves: rewriting report.json vs appending to the JSONL report.
+
+Usage: python -m benchmarks.report_io --entries 100000 --edits 100
+"""
+import os
+import time
+import tempfile
+
+import click
+
+from src import utils
+from src.report import ReportWriter, Report, compact
+
+from benchmarks.synthetic import keywords_and_summaries
+
+
+@click.command()
+@click.option("--entries", default=100000, help="number of report entries.")
+@click.option("--edits", default=100, help="number of annotation edits.")
+def main(entries, edits):
+    _, texts = keywords_and_summaries(1000, entries)
+    reports = [[text, {"entities": [[0, 4, "KEYWORD"]]}] for text in texts]
+
+    with tempfile.TemporaryDirectory() as directory:
+        legacy = os.path.join(directory, "report.json")
+        start = time.perf_counter()
+        utils.dump_json(reports, legacy)
+        dump = time.perf_counter() - start
+        print(f"report.json dump        {dump * 1e3:>10.1f}ms ({entries} entries)")
+
+        # the annotator rewrote the whole file for every session
+        start = time.perf_counter()
+        for _ in range(edits):
+            data = utils.load_json(legacy)
+            data[0][1]["entities"] = []
+            utils.dump_json(data, legacy)
+        elapsed = (time.perf_counter() - start) / edits
+        print(f"report.json edit+save   {elapsed * 1e3:>10.1f}ms per edit")
+
+        path = os.path.join(directory, "report.jsonl")
+        start = time.perf_counter()
+        with ReportWriter(path) as writer:
+            for text, data in reports:
+                writer.append(text, data["entities"])
+        elapsed = time.perf_counter() - start
+        print(f"jsonl append            {elapsed / entries * 1e6:>10.1f}us per entry")
+
+        with Report(path) as report:
+            probes = range(0, len(report), max(1, len(report) // 1000))
+            start = time.perf_counter()
+            for i in probes:
+                report[i]
+            elapsed = (time.perf_counter() - start) / len(probes)
+            print(f"jsonl random read       {elapsed * 1e6:>10.1f}us per entry")
+
+            start = time.perf_counter()
+            for i in range(edits):
+                report.edit(i, [])
+            elapsed = (time.perf_counter() - start) / edits
+            print(f"jsonl journaled edit    {elapsed * 1e6:>10.1f}us per edit")
+
+        start = time.perf_counter()
+        compact(path)
+        elapsed = time.perf_counter() - start
+        print(f"jsonl compact           {elapsed * 1e3:>10.1f}ms")
+        print(
+            f"sizes: json {os.path.getsize(legacy)}, "
+            f"jsonl {os.path.getsize(path)} bytes"
+        )
+
+
+if __name__ == "__main__":
+    main()
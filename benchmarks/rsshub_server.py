@@ -0,0 +1,152 @@
+"""Local stand-in for RSSHub serving recorded twitter feeds.
+
+Feeds are rendered in RSSHub's RSS 2.0 layout from the tweets archived
+in the sqlite store, so runs don't need the network. The server answers
+conditional requests (ETag / Last-Modified) with 304.
+
+Usage: python -m benchmarks.rsshub_server --port 8765
+       python butler.py rss today --api http://127.0.0.1:8765/twitter/user/{user}
+"""
+import time
+import hashlib
+import sqlite3
+import threading
+from xml.sax.saxutils import escape
+from email.utils import formatdate
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import click
+
+from src import settings
+
+API_PATH = "/twitter/user/"
+
+_CHANNEL = """<?xml version="1.0" encoding="UTF-8"?>
+<rss xmlns:atom="http://www.w3.org/2005/Atom" version="2.0">
+<channel>
+<title><![CDATA[Twitter @{user}]]></title>
+<link>https://twitter.com/{user}</link>
+<description><![CDATA[Twitter @{user} - Made with love by RSSHub]]></description>
+<generator>RSSHub</generator>
+<language>zh-cn</language>
+<lastBuildDate>{build_date}</lastBuildDate>
+<ttl>5</ttl>
+{items}
+</channel>
+</rss>
+"""
+
+_ITEM = """<item>
+<title><![CDATA[{title}]]></title>
+<description><![CDATA[{summary}]]></description>
+<pubDate>{published}</pubDate>
+<guid isPermaLink="false">{link}</guid>
+<link>{link}</link>
+<author><![CDATA[{author}]]></author>
+</item>"""
+
+
+def render_feed(user, rows):
+    items = "\n".join(
+        _ITEM.format(
+            title=title.replace('""', '"'),
+            summary=summary.replace('""', '"'),
+            published=escape(published),
+            link=escape(link),
+            author=author,
+        )
+        for author, title, link, published, summary in rows
+    )
+    return _CHANNEL.format(
+        user=user, build_date=formatdate(usegmt=True), items=items
+    ).encode("utf-8")
+
+
+def load_recorded_feeds(database=None, users=None):
+    """Return {user: rss bytes} built from archived tweets.
+
+    Archived authors are mapped onto users round robin, so any number of
+    accounts can be served.
+    """
+    database = database or settings.get("sqlite.LOCAL_SQLITE_DB")
+    table = settings.get("sqlite.FEED_TABLE_NAME")
+    users = users or settings.get_list("subscribe")
+
+    conn = sqlite3.connect(database)
+    rows = conn.execute(
+        f"select author, title, link, published, summary from {table}"
+    ).fetchall()
+    conn.close()
+
+    by_author = {}
+    for row in rows:
+        by_author.setdefault(row[0], []).append(row)
+    recordings = list(by_author.values()) or [[]]
+
+    return {
+        user: render_feed(user, recordings[i % len(recordings)])
+        for i, user in enumerate(users)
+    }
+
+
+class RSSHubHandler(BaseHTTPRequestHandler):
+    feeds = {}
+    latency = 0.0
+    last_modified = formatdate(usegmt=True)
+
+    def do_GET(self):
+        time.sleep(self.latency)
+
+        user = self.path[len(API_PATH) :] if self.path.startswith(API_PATH) else None
+        body = self.feeds.get(user)
+        if body is None:
+            self.send_error(404)
+            return
+
+        etag = '"{}"'.format(hashlib.md5(body).hexdigest())
+        if self.headers.get("If-None-Match") == etag or (
+            self.headers.get("If-Modified-Since") == self.last_modified
+        ):
+            self.send_response(304)
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/xml; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", etag)
+        self.send_header("Last-Modified", self.last_modified)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_server(feeds, port=0, latency=0.0):
+    """Serve feeds in a background thread, return (server, api template)."""
+    handler = type(
+        "Handler", (RSSHubHandler,), {"feeds": feeds, "latency": latency}
+    )
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    api = "http://127.0.0.1:{}{}{{user}}".format(server.server_port, API_PATH)
+    return server, api
+
+
+@click.command()
+@click.option("--port", default=8765, help="port to listen on.")
+@click.option("--latency", default=0.0, help="seconds to sleep per request.")
+def main(port, latency):
+    server, api = start_server(load_recorded_feeds(), port, latency)
+    print(f"Serving recorded feeds at {api}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""Benchmark tweet sanitizing throughput in lines/sec.
+
+Usage: python -m benchmarks.sanitize --lines 200000
+       python -m benchmarks.sanitize --tweets username.json
+"""
+import re
+import time
+
+import click
+
+from src import utils
+from src import constants
+
+from benchmarks.synthetic import tweets as synthetic_tweets
+
+def _legacy_sanitize(text):
+    """The previous rule-by-rule implementation."""
+    patterns = (
+        constants.REGEX_URL,
+        constants.REGEX_HASHTAG,
+        constants.REGEX_MENTION,
+        constants.REGEX_MD5,
+    )
+    for pattern in patterns:
+        text = re.sub(pattern, "", text)
+    text = constants.REGEX_EMOJI_PATTERN.sub(r"", text)
+    text = re.sub(constants.REGEX_WHITESPACE, " ", text)
+    return text.strip().lower()
+
+
+@click.command()
+@click.option("--lines", default=200000, help="number of synthetic tweets.")
+@click.option(
+    "--tweets",
+    type=click.Path(exists=True),
+    help="twint json export to use instead of synthetic tweets.",
+)
+def main(lines, tweets):
+    if tweets:
+        texts = [data["tweet"] for data in utils.load_json_lines(tweets)]
+    else:
+        texts = list(synthetic_tweets(lines))
+
+    start = time.perf_counter()
+    legacy = [_legacy_sanitize(text) for text in texts]
+    elapsed = time.perf_counter() - start
+    print(f"rule by rule    {len(texts) / elapsed:>10.0f} lines/sec")
+
+    start = time.perf_counter()
+    fused = list(utils.sanitize_many(texts))
+    elapsed = time.perf_counter() - start
+    print(f"sanitize_many   {len(texts) / elapsed:>10.0f} lines/sec")
+
+    assert fused == legacy
+    start = time.perf_counter()
+    list(utils.sanitize_many(texts, drop_slang=True, drop_stopwords=True))
+    elapsed = time.perf_counter() - start
+    print(f"+ slang/stop    {len(texts) / elapsed:>10.0f} lines/sec")
+
+
+if __name__ == "__main__":
+    main()
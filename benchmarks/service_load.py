@@ -0,0 +1,77 @@
+"""Load test the analysis service on localhost, with and without batching.
+
+Usage: python -m benchmarks.service_load --endpoint tag --clients 16
+       python -m benchmarks.service_load --endpoint analyze --batch-sizes 1,64
+"""
+import json
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import click
+
+from src import service
+from src import settings
+from src.textrank import TextRank
+from src.report import load_report
+from src.keyword_index import load_features_index
+
+
+def _post(url, payload):
+    request = urllib.request.Request(
+        url,
+        data=json.dumps(payload).encode("utf-8"),
+        headers={"Content-Type": "application/json"},
+    )
+    start = time.perf_counter()
+    with urllib.request.urlopen(request) as response:
+        response.read()
+    return time.perf_counter() - start
+
+
+def _run(url, texts, clients):
+    with ThreadPoolExecutor(max_workers=clients) as executor:
+        start = time.perf_counter()
+        latencies = sorted(executor.map(lambda text: _post(url, {"text": text}), texts))
+        elapsed = time.perf_counter() - start
+    return elapsed, latencies
+
+
+@click.command()
+@click.option("--endpoint", type=click.Choice(["tag", "analyze"]), default="tag")
+@click.option("--clients", default=16, help="concurrent client threads.")
+@click.option("--requests", "n_requests", default=2000, help="number of requests.")
+@click.option("--batch-sizes", default="1,64", help="max batch sizes to compare.")
+@click.option("--max-wait-ms", default=5.0, help="batch wait.")
+def main(endpoint, clients, n_requests, batch_sizes, max_wait_ms):
+    with load_report(settings.get("data.REPORT")) as entries:
+        texts = [data[0] for data in entries]
+    texts = (texts * (n_requests // max(len(texts), 1) + 1))[:n_requests]
+    # tagging doesn't need the spaCy model
+    textrank = TextRank() if endpoint == "analyze" else None
+    matcher = load_features_index().get_matcher()
+
+    for max_batch_size in map(int, batch_sizes.split(",")):
+        analysis = service.AnalysisService(
+            textrank, matcher, max_batch_size, max_wait_ms / 1e3
+        )
+        server = service.start_server(analysis)
+        url = f"http://127.0.0.1:{server.server_port}/{endpoint}"
+        try:
+            _run(url, texts[: clients * 4], clients)  # warm up
+            elapsed, latencies = _run(url, texts, clients)
+        finally:
+            server.shutdown()
+            analysis.close()
+
+        batching = analysis.metrics.summary(analysis.batchers)["batching"][endpoint]
+        print(
+            f"batch<={max_batch_size:<4} {len(texts) / elapsed:>8.0f} req/sec  "
+            f"p50={latencies[len(latencies) // 2] * 1e3:.1f}ms "
+            f"p99={latencies[int(len(latencies) * 0.99)] * 1e3:.1f}ms  "
+            f"mean batch {batching['mean_batch_size']:.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
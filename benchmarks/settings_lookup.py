@@ -0,0 +1,60 @@
+"""Benchmark settings lookups: re-parsing project.yaml vs the cached Config.
+
+Usage: python -m benchmarks.settings_lookup --lookups 10000
+"""
+import time
+
+import click
+
+from src import settings
+from src import environment
+
+# lookups done while importing the cli modules and running rss today
+_STARTUP_KEYS = (
+    "data.SLANG",
+    "data.STOP",
+    "nlp.MODEL",
+    "nlp.MODE",
+    "nlp.BATCH_SIZE",
+    "sqlite.FEED_TABLE_NAME",
+    "sqlite.ACCOUNT_TABLE_NAME",
+    "sqlite.LOCAL_SQLITE_DB",
+    "rss.CONCURRENCY",
+    "rss.TIMEOUT",
+    "subscribe",
+)
+
+
+def _uncached_get(key_name):
+    """The previous lookup path: parse the yaml file on every call."""
+    result = settings._load_yaml_file(environment.get_project_config())
+    for search_key in key_name.split(settings.SEPARATOR):
+        result = result[search_key]
+    return result
+
+
+def _timeit(get, keys, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for key in keys:
+            get(key)
+    return time.perf_counter() - start
+
+
+@click.command()
+@click.option("--lookups", default=10000, help="number of repeated lookups.")
+def main(lookups):
+    config = settings.Config(environment.get_project_config())
+
+    uncached = _timeit(_uncached_get, _STARTUP_KEYS, 1)
+    cached = _timeit(config.get, _STARTUP_KEYS, 1)
+    print(f"startup lookups   yaml {uncached * 1e3:>9.2f}ms  cached {cached * 1e3:>9.2f}ms")
+
+    repeat = max(1, lookups // 100)
+    uncached = _timeit(_uncached_get, ("rss.TIMEOUT",), repeat) / repeat
+    cached = _timeit(config.get, ("rss.TIMEOUT",), lookups) / lookups
+    print(f"per lookup        yaml {uncached * 1e6:>9.2f}us  cached {cached * 1e6:>9.2f}us")
+
+
+if __name__ == "__main__":
+    main()
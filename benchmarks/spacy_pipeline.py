@@ -0,0 +1,54 @@
+"""Benchmark spaCy throughput: full per-call path vs minimal nlp.pipe.
+
+Usage: python -m benchmarks.spacy_pipeline --limit 2000
+"""
+import time
+import itertools
+
+import click
+
+from src import settings
+from src.report import load_report
+from src.textrank import load_nlp
+
+
+def _per_call(nlp, texts, batch_size):
+    for text in texts:
+        nlp(text)
+
+
+def _pipe(nlp, texts, batch_size):
+    for _ in nlp.pipe(texts, batch_size=batch_size):
+        pass
+
+
+@click.command()
+@click.option(
+    "-r",
+    "--report",
+    default=settings.get("data.REPORT"),
+    help="report to take texts from.",
+)
+@click.option("--limit", default=2000, help="number of texts to process.")
+@click.option("--batch-size", default=256, help="nlp.pipe batch size.")
+def main(report, limit, batch_size):
+    with load_report(report) as entries:
+        texts = [data[0] for data in itertools.islice(entries, limit)]
+    model = settings.get("nlp.MODEL", "en_core_web_sm")
+
+    cases = (
+        ("full nlp(text)", "full", _per_call),
+        ("full nlp.pipe", "full", _pipe),
+        ("minimal nlp(text)", "minimal", _per_call),
+        ("minimal nlp.pipe", "minimal", _pipe),
+    )
+    for name, mode, runner in cases:
+        nlp = load_nlp(model, mode)
+        start = time.perf_counter()
+        runner(nlp, texts, batch_size)
+        elapsed = time.perf_counter() - start
+        print(f"{name:<20} {len(texts) / elapsed:>10.1f} docs/sec")
+
+
+if __name__ == "__main__":
+    main()
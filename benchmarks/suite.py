@@ -0,0 +1,380 @@
+"""Benchmark suite over synthetic data, with JSON results and regression gates.
+
+Usage: python -m benchmarks.suite run -o results.json [--quick] [--only sanitize]
+       python -m benchmarks.suite compare baseline.json results.json --threshold 0.15
+
+Every case is timed best of --repeat runs on data from benchmarks.synthetic,
+so two runs on the same machine see the same inputs. `compare` exits with
+status 1 when a metric got worse than the baseline by more than threshold.
+"""
+import sys
+import json
+import time
+import platform
+import tempfile
+import statistics
+import subprocess
+from pathlib import Path
+from datetime import datetime
+
+import click
+
+from src import environment
+
+from benchmarks import synthetic
+
+# name -> function(quick, repeat) returning {metric: _metric(...)}
+_CASES = {}
+
+
+def case(name):
+    def register(function):
+        _CASES[name] = function
+        return function
+
+    return register
+
+
+def _metric(value, unit, better="higher"):
+    return {"value": value, "unit": unit, "better": better}
+
+
+def _best_of(repeat, function, *args):
+    """Return the shortest wall time of repeat calls."""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(*args)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+class Skipped(Exception):
+    pass
+
+
+def _textrank():
+    from src.textrank import TextRank
+
+    try:
+        return TextRank()
+    except OSError as e:
+        raise Skipped(f"spaCy model not available: {e}")
+
+
+@case("textrank.pagerank")
+def _textrank_pagerank(quick, repeat):
+    from benchmarks.textrank_scaling import _synthetic_sentences
+
+    textrank = _textrank()
+    results = {}
+    for size in (1000, 20000) if quick else (1000, 20000, 100000):
+        sentences = _synthetic_sentences(size)
+        vocab = textrank.get_vocab(sentences)
+        token_pairs = textrank.get_token_pairs(4, sentences)
+        elapsed = _best_of(
+            repeat,
+            lambda: textrank.pagerank(textrank.get_matrix(vocab, token_pairs)),
+        )
+        results[f"vocab_{size}_ms"] = _metric(elapsed * 1e3, "ms", "lower")
+    return results
+
+
+@case("textrank.analyze")
+def _textrank_analyze(quick, repeat):
+    textrank = _textrank()
+    results = {}
+    for length in (50, 500) if quick else (50, 500, 5000):
+        documents = synthetic.documents(20, length)
+
+        def analyze():
+            for document in documents:
+                textrank.analyze(document, candidate_pos=["NOUN", "PROPN"])
+                textrank.get_keywords(10)
+
+        elapsed = _best_of(repeat, analyze)
+        results[f"words_{length}_docs_per_sec"] = _metric(
+            len(documents) / elapsed, "docs/sec"
+        )
+    return results
+
+
+@case("sanitize")
+def _sanitize(quick, repeat):
+    from src import utils
+
+    texts = list(synthetic.tweets(20000 if quick else 200000))
+    elapsed = _best_of(repeat, lambda: list(utils.sanitize_many(texts)))
+    return {"lines_per_sec": _metric(len(texts) / elapsed, "lines/sec")}
+
+
+@case("matching")
+def _matching(quick, repeat):
+    from cli.rss import _get_text_entities
+    from src.matcher import KeywordMatcher
+
+    keywords, summaries = synthetic.keywords_and_summaries(
+        30000, 2000 if quick else 10000
+    )
+    start = time.perf_counter()
+    matcher = KeywordMatcher(keywords)
+    build = time.perf_counter() - start
+
+    elapsed = _best_of(
+        repeat, lambda: [_get_text_entities(text, matcher) for text in summaries]
+    )
+    return {
+        "build_ms": _metric(build * 1e3, "ms", "lower"),
+        "texts_per_sec": _metric(len(summaries) / elapsed, "texts/sec"),
+    }
+
+
+@case("feed_store")
+def _feed_store(quick, repeat):
+    from src import database
+
+    rows = 20000 if quick else 200000
+    batch = 1000
+    previous = database.FeedStore.database
+    with tempfile.TemporaryDirectory() as directory:
+        database.connect(str(Path(directory) / "archives.db"))
+        try:
+            database.create_table()
+            start = time.perf_counter()
+            for offset in range(0, rows, batch):
+                with database.transaction():
+                    database.insert_feeds(synthetic.feeds(offset, batch))
+            insert = time.perf_counter() - start
+
+            # a fetch cycle where 90% of the entries are already archived
+            def dedupe():
+                feeds = synthetic.feeds(rows - batch * 9 // 10, batch)
+                with database.transaction() as conn:
+                    database.insert_feeds(feeds)
+                    conn.rollback()
+
+            elapsed = _best_of(repeat, dedupe)
+        finally:
+            database.connect(previous)
+    return {
+        "insert_rows_per_sec": _metric(rows / insert, "rows/sec"),
+        "dedupe_rows_per_sec": _metric(batch / elapsed, "rows/sec"),
+    }
+
+
+@case("feed_dedupe")
+def _feed_dedupe(quick, repeat):
+    from src import database
+    from src import dedupe
+
+    archived = 10000 if quick else 50000
+    batch = 1000
+    feeds, texts, _ = synthetic.near_duplicates(archived + batch, seed=1)
+    previous = database.FeedStore.database
+    with tempfile.TemporaryDirectory() as directory:
+        database.connect(str(Path(directory) / "archives.db"))
+        try:
+            database.create_table()
+            for offset in range(0, archived, batch):
+                with database.transaction():
+                    dedupe.collapse(
+                        feeds[offset : offset + batch],
+                        texts[offset : offset + batch],
+                        0.6,
+                    )
+
+            # a fetch cycle against the archived signatures, not recorded
+            def collapse():
+                with database.transaction() as conn:
+                    unique = dedupe.collapse(feeds[archived:], texts[archived:], 0.6)
+                    conn.rollback()
+                return unique
+
+            elapsed = _best_of(repeat, collapse)
+            kept = len(collapse())
+        finally:
+            database.connect(previous)
+    return {
+        "collapse_feeds_per_sec": _metric(batch / elapsed, "feeds/sec"),
+        "kept_ratio": _metric(kept / batch, "ratio", better="lower"),
+    }
+
+
+@case("feed_parsing")
+def _feed_parsing(quick, repeat):
+    from src.feed_parser import parse_entries
+
+    bodies = [
+        synthetic.rss_feed(f"user{i}", 20, seed=i)
+        for i in range(20 if quick else 100)
+    ]
+    seen = [parse_entries(body)["entries"][5]["link"] for body in bodies]
+
+    def parse(last_seen):
+        for body, link in zip(bodies, last_seen):
+            parse_entries(body, link)
+
+    full = _best_of(repeat, parse, [None] * len(bodies))
+    incremental = _best_of(repeat, parse, seen)
+    return {
+        "full_feeds_per_sec": _metric(len(bodies) / full, "feeds/sec"),
+        "incremental_feeds_per_sec": _metric(len(bodies) / incremental, "feeds/sec"),
+    }
+
+
+@case("setup_corpus")
+def _setup_corpus(quick, repeat):
+    from cli.setup import corpus
+
+    files, per_file = (4, 5000) if quick else (8, 25000)
+    with tempfile.TemporaryDirectory() as directory:
+        tweets = Path(directory) / "tweets"
+        tweets.mkdir()
+        synthetic.write_tweet_exports(tweets, files, per_file)
+
+        def ingest():
+            output = Path(directory) / "corpus.txt"
+            for path in (output, Path(directory) / "corpus_clean.txt"):
+                path.unlink(missing_ok=True)
+            corpus.callback(str(tweets), str(output), 1, 10000)
+
+        elapsed = _best_of(repeat, ingest)
+    return {"tweets_per_sec": _metric(files * per_file / elapsed, "tweets/sec")}
+
+
+@case("startup")
+def _startup(quick, repeat):
+    results = {}
+    for command in ([], ["rss"], ["setup"]):
+        times = []
+        for _ in range(max(repeat, 3) if quick else max(repeat, 7)):
+            start = time.perf_counter()
+            subprocess.run(
+                [sys.executable, "butler.py", *command, "--help"],
+                capture_output=True,
+                check=True,
+                cwd=environment.get_root_directory(),
+            )
+            times.append(time.perf_counter() - start)
+        name = "_".join(["butler", *command])
+        results[f"{name}_help_ms"] = _metric(
+            statistics.median(times) * 1e3, "ms", "lower"
+        )
+    return results
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=environment.get_root_directory(),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+@click.group()
+def suite():
+    pass
+
+
+@suite.command()
+@click.option("-o", "--output", default="results.json", help="the path of results.")
+@click.option("--quick", is_flag=True, help="smaller inputs, for a smoke run.")
+@click.option("--repeat", default=3, help="runs per case, the best one counts.")
+@click.option("--only", multiple=True, help="run only these cases (repeatable).")
+def run(output, quick, repeat, only):
+    """Run the benchmark cases and write their metrics to JSON."""
+    unknown = set(only) - set(_CASES)
+    if unknown:
+        raise click.BadParameter(f"unknown cases {sorted(unknown)}", param_hint="--only")
+
+    results = {}
+    for name, function in _CASES.items():
+        if only and name not in only:
+            continue
+        click.echo(f"{name} ...", nl=False)
+        try:
+            results[name] = function(quick, repeat)
+        except Skipped as e:
+            results[name] = {"skipped": str(e)}
+            click.echo(f" skipped: {e}")
+            continue
+        click.echo("")
+        for metric, value in results[name].items():
+            click.echo(f"  {metric:<32} {value['value']:>14.1f} {value['unit']}")
+
+    report = {
+        "meta": {
+            "date": datetime.now().isoformat(timespec="seconds"),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "quick": quick,
+            "repeat": repeat,
+        },
+        "results": results,
+    }
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    click.echo(f"Wrote {output}")
+
+
+def _regressions(baseline, results, threshold):
+    """Yield (case, metric, old, new, change) of every compared metric.
+
+    change is relative and positive when the metric got worse.
+    """
+    for name, metrics in results["results"].items():
+        old_metrics = baseline["results"].get(name, {})
+        if "skipped" in metrics or "skipped" in old_metrics:
+            continue
+        for metric, new in metrics.items():
+            old = old_metrics.get(metric)
+            if old is None or not old["value"]:
+                continue
+            change = (new["value"] - old["value"]) / old["value"]
+            if new["better"] == "higher":
+                change = -change
+            yield name, metric, old["value"], new["value"], change
+
+
+@suite.command()
+@click.argument("baseline", type=click.Path(exists=True))
+@click.argument("results", type=click.Path(exists=True))
+@click.option(
+    "--threshold",
+    default=0.15,
+    help="relative change past which a metric counts as a regression.",
+)
+def compare(baseline, results, threshold):
+    """Compare results against a baseline, exit 1 on regressions."""
+    with open(baseline) as f:
+        baseline = json.load(f)
+    with open(results) as f:
+        results = json.load(f)
+    if baseline["meta"].get("quick") != results["meta"].get("quick"):
+        click.echo("warning: comparing a --quick run against a full run")
+
+    failed = 0
+    for name, metric, old, new, change in _regressions(baseline, results, threshold):
+        regressed = change > threshold
+        failed += regressed
+        mark = "REGRESSED" if regressed else ""
+        click.echo(
+            f"{name + '.' + metric:<48} {old:>12.1f} -> {new:>12.1f} "
+            f"{(new - old) / old:>+8.1%} {mark}"
+        )
+
+    if failed:
+        click.echo(f"{failed} metric(s) regressed more than {threshold:.0%}")
+        sys.exit(1)
+    click.echo("No regressions.")
+
+
+if __name__ == "__main__":
+    suite()
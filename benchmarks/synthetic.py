@@ -0,0 +1,139 @@
+"""Seeded synthetic tweets, RSS feeds and corpora for offline benchmarks.
+
+Every generator takes a seed, the same arguments give the same data.
+"""
+import json
+import random
+import string
+from pathlib import Path
+
+from benchmarks.rsshub_server import render_feed
+
+WORDS = (
+    "fuzzing exploit kernel heap overflow patch released new blog post on "
+    "the of a bug chain rce sandbox escape browser chrome windows linux "
+    "analysis malware sample reverse engineering talk slides"
+).split()
+NOISE = (
+    "https://t.co/{}",
+    "#infosec",
+    "#{}",
+    "@{}",
+    "{:032x}",
+    "\U0001F600",
+    "\U0001F680",
+)
+PUBLISHED = "Tue, 02 Mar 2021 15:54:30 GMT"
+
+
+def random_word(rng):
+    return "".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(4, 10)))
+
+
+def tweets(count, seed=0):
+    """Yield tweet texts with urls, hashtags, mentions, hashes and emoji."""
+    rng = random.Random(seed)
+    for _ in range(count):
+        words = [rng.choice(WORDS) for _ in range(rng.randint(8, 30))]
+        for _ in range(rng.randint(0, 5)):
+            noise = rng.choice(NOISE).format(rng.getrandbits(128))
+            words.insert(rng.randrange(len(words) + 1), noise)
+        yield "  ".join(words) if rng.random() < 0.1 else " ".join(words)
+
+
+def tweet_records(count, seed=0):
+    """Yield twint export records, some replies and some not in english."""
+    rng = random.Random(seed)
+    for text in tweets(count, seed):
+        reply = rng.random() < 0.1
+        yield {
+            "tweet": f"@{random_word(rng)} {text}" if reply else text,
+            "language": "en" if rng.random() < 0.9 else "fr",
+            "reply_to": [{"screen_name": random_word(rng)}] if reply else [],
+        }
+
+
+def write_tweet_exports(directory, files, per_file, seed=0):
+    """Write files twint exports of per_file tweets, return their paths."""
+    directory = Path(directory)
+    paths = []
+    for i in range(files):
+        path = directory / f"user{i}.json"
+        with open(path, "w", encoding="utf-8") as f:
+            for record in tweet_records(per_file, seed + i):
+                f.write(json.dumps(record) + "\n")
+        paths.append(path)
+    return paths
+
+
+def keywords_and_summaries(n_keywords, n_summaries, seed=0):
+    """Return (keywords, summaries), each summary holds up to 4 keywords."""
+    rng = random.Random(seed)
+    keywords = sorted({random_word(rng) for _ in range(n_keywords)})
+    filler = [random_word(rng) for _ in range(5000)]
+
+    summaries = []
+    for _ in range(n_summaries):
+        words = [rng.choice(filler) for _ in range(rng.randint(20, 50))]
+        for _ in range(rng.randint(0, 4)):
+            words.insert(rng.randrange(len(words) + 1), rng.choice(keywords))
+        summaries.append(" ".join(words))
+    return keywords, summaries
+
+
+def feeds(start, count):
+    """Return archive rows as insert_feeds takes them."""
+    return [
+        {
+            "author": f"user{i % 100}",
+            "title": f"title of tweet {i}",
+            "link": f"https://twitter.com/user{i % 100}/status/{i}",
+            "published": PUBLISHED,
+            "summary": f"summary of tweet {i} " * 8,
+        }
+        for i in range(start, start + count)
+    ]
+
+
+def rss_feed(user, count, seed=0):
+    """Return the body of an RSSHub style feed of count entries, newest first."""
+    rows = []
+    for i, text in enumerate(tweets(count, seed)):
+        link = f"https://twitter.com/{user}/status/{seed * 1000000 + count - i}"
+        summary = text.replace(" ", "<br />", 1) + f'<img src="{link}?a=1&amp;b=2" />'
+        rows.append((user, text[:100], link, PUBLISHED, summary))
+    return render_feed(user, rows)
+
+
+def documents(count, length, seed=0):
+    """Return count documents of length words drawn from a zipf-like vocab."""
+    rng = random.Random(seed)
+    vocab = [random_word(rng) for _ in range(max(50, length))]
+    weights = [1 / (rank + 1) for rank in range(len(vocab))]
+    return [
+        " ".join(rng.choices(vocab, weights, k=length)) + "." for _ in range(count)
+    ]
+
+
+def near_duplicates(count, copies=0.2, seed=0):
+    """Return (feeds, texts, originals), about copies of the feeds retweet or
+    reword an earlier one; originals[i] is the feed that feeds[i] copies."""
+    rng = random.Random(seed)
+    rows = feeds(0, count)
+    texts, originals = [], []
+    for i, (row, text) in enumerate(zip(rows, tweets(count, seed))):
+        original = i
+        if i and rng.random() < copies:
+            original = originals[rng.randrange(i)]
+            words = texts[original].split()
+            for _ in range(rng.randint(0, 2)):
+                # reworded, most of the advisory stays the same
+                words[rng.randrange(len(words))] = rng.choice(WORDS)
+            text = " ".join(words)
+            if rng.random() < 0.5:
+                author = rows[original]["author"]
+                row["title"] = f"RT {author}: {text[:100]}"
+                text = f"RT\u2002{author}{text}"
+        texts.append(text)
+        originals.append(original)
+    return rows, texts, originals
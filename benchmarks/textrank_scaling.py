@@ -0,0 +1,86 @@
+"""Benchmark the TextRank graph engine against vocabulary size.
+
+Usage: python -m benchmarks.textrank_scaling
+"""
+import time
+import random
+
+import click
+import numpy as np
+
+from src.textrank import TextRank
+
+
+def _synthetic_sentences(vocab_size, seed=0):
+    rng = random.Random(seed)
+    words = [f"w{i}" for i in range(vocab_size)]
+    sentences = [words[i : i + 12] for i in range(0, vocab_size, 12)]
+    for _ in range(len(sentences)):
+        sentences.append([rng.choice(words) for _ in range(12)])
+    return sentences
+
+
+def _dense_pagerank(textrank, vocab, token_pairs):
+    """The previous dense engine, kept here as the reference point."""
+    vocab_size = len(vocab)
+    g = np.zeros((vocab_size, vocab_size), dtype="float")
+    for word1, word2 in token_pairs:
+        g[vocab[word1]][vocab[word2]] = 1
+    g = g + g.T - np.diag(g.diagonal())
+    norm = np.sum(g, axis=0)
+    g = np.divide(g, norm, out=np.zeros_like(g), where=norm != 0)
+
+    pr = np.array([1] * vocab_size)
+    previous_pr = 0
+    for epoch in range(textrank.steps):
+        pr = (1 - textrank.d) + textrank.d * np.dot(g, pr)
+        if abs(previous_pr - sum(pr)) < textrank.min_diff:
+            break
+        else:
+            previous_pr = sum(pr)
+    return pr
+
+
+def _sparse_pagerank(textrank, vocab, token_pairs):
+    return textrank.pagerank(textrank.get_matrix(vocab, token_pairs))
+
+
+def _timeit(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - start, result
+
+
+@click.command()
+@click.option(
+    "--sizes",
+    default="100,1000,5000,20000,100000",
+    help="comma separated vocabulary sizes.",
+)
+@click.option(
+    "--dense-limit",
+    default=5000,
+    help="largest vocabulary size to run the dense reference on.",
+)
+def main(sizes, dense_limit):
+    textrank = TextRank()
+    print(f"{'vocab':>8} {'pairs':>9} {'sparse(s)':>10} {'dense(s)':>10}")
+    for size in map(int, sizes.split(",")):
+        sentences = _synthetic_sentences(size)
+        vocab = textrank.get_vocab(sentences)
+        token_pairs = textrank.get_token_pairs(4, sentences)
+
+        sparse_time, pr = _timeit(_sparse_pagerank, textrank, vocab, token_pairs)
+        dense_time = "-"
+        if size <= dense_limit:
+            elapsed, reference = _timeit(
+                _dense_pagerank, textrank, vocab, token_pairs
+            )
+            assert np.allclose(pr, reference)
+            dense_time = f"{elapsed:.4f}"
+
+        print(f"{size:>8} {len(token_pairs):>9} {sparse_time:>10.4f} {dense_time:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,32 +1,98 @@
+import sys
 import click
 import importlib
 from loguru import logger
 
+# command name -> short help, cli.<name> is imported only when invoked
+_butler_commands = {
+    "annotator": "Fix existed dataset.",
+    "setup": "Generate and preprocess dataset.",
+    "rss": "RSS reader cli.",
+    "diagnose": "Startup and performance diagnostics.",
+    "serve": "Local HTTP analysis service.",
+}
 
-@click.group()
-def butler():
-    pass
 
+class LazyGroup(click.Group):
+    """Group whose subcommand modules are imported on first use."""
 
-_butler_commands = (
-    "annotator",
-    "setup",
-    "rss",
+    def __init__(self, *args, lazy_commands=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.lazy_commands = lazy_commands or {}
+
+    def list_commands(self, ctx):
+        return sorted(set(super().list_commands(ctx)) | set(self.lazy_commands))
+
+    def get_command(self, ctx, cmd_name):
+        if cmd_name not in self.commands and cmd_name in self.lazy_commands:
+            module = importlib.import_module(f"cli.{cmd_name}")
+            self.add_command(getattr(module, cmd_name))
+        return super().get_command(ctx, cmd_name)
+
+    def format_commands(self, ctx, formatter):
+        # use the registered help so --help imports nothing
+        rows = []
+        for cmd_name in self.list_commands(ctx):
+            if cmd_name in self.commands:
+                rows.append((cmd_name, self.commands[cmd_name].get_short_help_str()))
+            else:
+                rows.append((cmd_name, self.lazy_commands[cmd_name]))
+
+        if rows:
+            with formatter.section("Commands"):
+                formatter.write_dl(rows)
+
+
+def _command_name(ctx, args):
+    """Return the subcommand words of args, like "rss today"."""
+    words = []
+    command = ctx.command
+    for arg in args:
+        if not isinstance(command, click.Group):
+            break
+        subcommand = command.get_command(ctx, arg)
+        if subcommand is not None:
+            words.append(arg)
+            command = subcommand
+    return " ".join(words)
+
+
+@click.group(cls=LazyGroup, lazy_commands=_butler_commands)
+@click.option(
+    "--profile",
+    is_flag=True,
+    help="record stage timers, counters and peak memory of the command.",
 )
+@click.option(
+    "--profile-dir",
+    help="where --profile writes its JSON and Prometheus summaries.",
+    default="logs/profile",
+)
+@click.option(
+    "--profile-dump",
+    is_flag=True,
+    help="with --profile, also save a cProfile dump of the slowest stage.",
+)
+@click.pass_context
+def butler(ctx, profile, profile_dir, profile_dump):
+    if not profile:
+        return
 
+    from src import profiler
 
-def _setup_logger():
-    logger.add("logs/{time}.log", level="DEBUG", rotation="10 MB")
+    profiler.enable(_command_name(ctx, sys.argv[1:]), profile_dir, profile_dump)
 
+    def finish():
+        for path in profiler.finish():
+            logger.info(f"Profile written to {path}")
 
-def _setup_commands_for_butler():
-    for cmd in _butler_commands:
-        module = importlib.import_module(f"cli.{cmd}")
-        method = getattr(module, cmd)
-        butler.add_command(method)
+    ctx.call_on_close(finish)
+
+
+def _setup_logger():
+    logger.add("logs/{time}.log", level="DEBUG", rotation="10 MB")
 
 
 if __name__ == "__main__":
     _setup_logger()
-    _setup_commands_for_butler()
     butler()
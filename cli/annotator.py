@@ -1,4 +1,3 @@
-import os
 import re
 import sys
 import click
@@ -6,15 +5,32 @@ from loguru import logger
 from rich import print
 from readchar import readkey
 
-from src import utils
+from src import settings
+from src import profiler
+from src.intervals import IntervalSet
+from src.keyword_index import SOURCE_ANNOTATION, load_keyword_index
+from src.report import load_report
+
+
+# ANSI sequences, frames are written without spawning `clear`
+CLEAR_SCREEN = "\x1b[H\x1b[2J\x1b[3J"
+RESET = "\x1b[0m"
 
 
 def red(word):
-    return f"[red]{word}[/red]"
+    return f"\x1b[31m{word}{RESET}"
 
 
 def purple(word):
-    return f"[purple]{word}[/purple]"
+    return f"\x1b[38;5;129m{word}{RESET}"
+
+
+def white(word):
+    return f"\x1b[37m{word}{RESET}"
+
+
+def yellow(word):
+    return f"\x1b[33m{word}{RESET}"
 
 
 KEY_LEFT_ARROW = "\x1b[D"
@@ -34,55 +50,118 @@ LABELS_COLOR = {
     "CURRENT": purple,
 }
 
+LABEL_PROMPT = "{} {}-{}".format(
+    white("️➡️ (label) ="),
+    LABELS_COLOR["KEYWORD"]("k"),
+    LABELS_COLOR["KEYWORD"]("KEYWORD"),
+)
+
 
-def print_colorful_description(desc, word_start, word_end, entities):
-    """ Highlight current word. """
-
-    tags = entities.copy()
-    intags = [
-        tag
-        for tag in tags
-        if (tag[0] <= word_start and word_end <= tag[1])  # word located at tag internal
-        or (word_start < tag[0] <= word_end)  # word located at start_tag half part
-        or (word_start < tag[1] <= word_end)  # word located at stop_tag half part
-    ]
-
-    if not intags:
-        tags.append([word_start, word_end, "CURRENT"])
-    tags = sorted(tags, key=lambda x: x[0])
-    """ print colorful description. """
-    i = 0
-    output = ""
-    for _start, _stop, _label in tags:
-        output += "".join(
+class DocumentView(object):
+    """Frames of one text, its entities and the highlighted word.
+
+    The word list is split once per text and the colored text is rebuilt
+    only when the entities change; moving the cursor splices the CURRENT
+    highlight into the cached rendering.
+    """
+
+    def __init__(self, text, entities):
+        self.text = text
+        self.entities = IntervalSet(entities)
+        self.words = get_word_list(text)
+        self._version = None
+
+    def _render_entities(self):
+        # rendered text before the gap and before the color of each entity
+        parts = []
+        self._gap_offsets = []
+        self._color_offsets = []
+        self._gap_starts = []
+        length = i = 0
+        for start, stop, label in self.entities:
+            self._gap_offsets.append(length)
+            self._gap_starts.append(i)
+            gap = self.text[i:start]
+            colored = LABELS_COLOR[label](self.text[start:stop])
+            self._color_offsets.append(length + len(gap))
+            parts += [gap, colored]
+            length += len(gap) + len(colored)
+            i = stop
+        self._gap_offsets.append(length)
+        self._gap_starts.append(i)
+        self._rendered = "".join(parts)
+        self._tail_start = i
+        self._version = self.entities.version
+
+    def covered(self, word_start, word_end):
+        """Whether an entity holds or cuts into the word."""
+        for start, stop, _ in self.entities.window(word_start, word_end):
+            if (
+                (start <= word_start and word_end <= stop)  # word inside the tag
+                or (word_start < start <= word_end)  # tag starts in the word
+                or (word_start < stop <= word_end)  # tag stops in the word
+            ):
+                return True
+        return False
+
+    def find_unset(self, word_start, word_end):
+        """First entity sharing the start or stop of the word, or inside it."""
+        low, high = min(word_start, word_end), max(word_start, word_end)
+        for entity in self.entities.window(low, high):
+            start, stop, _ = entity
+            if (
+                start == word_start
+                or stop == word_end
+                or (start > word_start and stop < word_end)
+            ):
+                return entity
+        return None
+
+    def highlighted(self, word_start, word_end):
+        """The colored text with the word highlighted unless in an entity."""
+        if self._version != self.entities.version:
+            self._render_entities()
+        text = self.text
+        if self.covered(word_start, word_end):
+            return self._rendered + text[self._tail_start :]
+
+        k = self.entities.insert_position(word_start)
+        head = "".join(
+            [
+                self._rendered[: self._gap_offsets[k]],
+                text[self._gap_starts[k] : word_start],
+                LABELS_COLOR["CURRENT"](text[word_start:word_end]),
+            ]
+        )
+        if k == len(self.entities):
+            return head + text[word_end:]
+        return "".join(
             [
-                desc[i:_start],
-                LABELS_COLOR[_label](desc[_start:_stop]),
+                head,
+                text[word_end : self.entities.spans[k][0]],
+                self._rendered[self._color_offsets[k] :],
+                text[self._tail_start :],
             ]
         )
-        i = _stop
-    print("".join([output, desc[i:]]), flush=True)
-    print()
-
-    print_label()
-    """ print prompt. """
-    word = desc[word_start:word_end]
-    print(
-        f"[white]➡️️[/white] [white]([/white][yellow]{word}[/yellow][white]) = [/white]",
-        end="",
-    )
-    """ flush to stdout. """
-    sys.stdout.flush()
-
-
-def print_label():
-    print(
-        "[white]️➡️ (label) = [/white]",
-        "{}-{}".format(
-            LABELS_COLOR["KEYWORD"]("k"),
-            LABELS_COLOR["KEYWORD"]("KEYWORD"),
-        ),
-    )
+
+    def frame(self, word_start, word_end):
+        word = self.text[word_start:word_end]
+        return "".join(
+            [
+                CLEAR_SCREEN,
+                self.highlighted(word_start, word_end),
+                "\n\n",
+                LABEL_PROMPT,
+                "\n",
+                white("➡️️ ("),
+                yellow(word),
+                white(") = "),
+            ]
+        )
+
+    def draw(self, word_start, word_end):
+        sys.stdout.write(self.frame(word_start, word_end))
+        sys.stdout.flush()
 
 
 def print_usage():
@@ -132,7 +211,9 @@ def get_word_list(desc):
 
 def user_control(text, entities=[]):
     """ word_list: Store result extracted by regex. """
-    word_list = get_word_list(text)
+    view = DocumentView(text, entities)
+    word_list = view.words
+    entities = view.entities
 
     pos = 0
     start_pos = 0
@@ -140,9 +221,6 @@ def user_control(text, entities=[]):
     stop_pos = len(word_list) - 1
 
     while pos <= stop_pos:
-        """ Flush and clear console output. """
-        os.system("clear")
-
         if not edit_mode:
             # get next word
             start, stop, _ = word_list[pos]
@@ -150,7 +228,8 @@ def user_control(text, entities=[]):
             # reset edit_mode to False
             edit_mode = False
 
-        print_colorful_description(text, start, stop, entities)
+        """ Clear the console and draw the frame in one write. """
+        view.draw(start, stop)
         choice = readkey()
 
         if KEY_LEFT_ARROW == choice and pos != start_pos:
@@ -180,15 +259,9 @@ def user_control(text, entities=[]):
             break
         elif "u" == choice:
             # unset current highlight
-            match = [
-                entry
-                for entry in entities
-                if (entry[0] == start)
-                or (entry[1] == stop)
-                or (entry[0] > start and entry[1] < stop)
-            ]
+            match = view.find_unset(start, stop)
             if match:
-                entities.remove(match[0])
+                entities.remove(match)
         elif "h" == choice:
             # print usage
             print_usage()
@@ -197,63 +270,83 @@ def user_control(text, entities=[]):
         elif choice in LABELS.keys():
             """ Add the labeled data into entities. """
             label = LABELS[choice]
-            entry = [start, stop, label]
-            if entry not in entities:
-                entities.append([start, stop, label])
+            # kept sorted by start index
+            entities.add([start, stop, label])
 
         if not edit_mode:
             # default clean start and stop value.
             start, stop = 0, 0
-
-        # sort entities according the start index
-        entities = sorted(entities, key=lambda x: x[0])
-    return entities
+    return entities.tolist()
 
 
 @click.command()
 @click.option(
     "-d",
     "--dataset",
-    default="assets/report.json",
-    type=click.Path(exists=True),
-    help="dataset(report.json).",
+    default=settings.get_str("data.REPORT", "assets/report.jsonl"),
+    type=click.Path(),
+    help="dataset(report.jsonl), edits go to its journal.",
+)
+@click.option(
+    "--restart",
+    is_flag=True,
+    help="review from the first entry, not where the last session stopped.",
 )
-def annotator(dataset):
+def annotator(dataset, restart):
     """ Fix existed dataset. """
     """ Read dataset. """
-    dataset_path = dataset
-    dataset = utils.load_json(dataset)
-
-    with open("assets/features.txt") as f:
-        keywords = set(word.strip() for word in f.readlines())
+    features_file = settings.get_str("data.FEATURES", "assets/features.txt")
+    with profiler.stage("load"):
+        # entries are read one at a time, edits are journaled as they happen
+        dataset = load_report(dataset)
+        keywords = load_keyword_index(
+            settings.get_str("data.FEATURES_INDEX", "assets/features.idx"),
+            features_file,
+        )
 
+    # entries before the cursor were done in earlier sessions
+    start = 0 if restart else dataset.cursor
+    cursor = start
+    print(f"[white]Annotating from entry {start} of {len(dataset)}.[/white]")
     try:
         """ Iterate until get lines of specified number data. """
-        for data in dataset:
+        for i, data in dataset.entries(start):
+            cursor = i
             """ entities: Store (start_index, end_index, word). """
             text = data[0]
             entities = data[1]["entities"]
             if not entities:
                 continue
 
+            old_entities = [list(entity) for entity in entities]
             old_keywords = set(text[entity[0] : entity[1]] for entity in entities)
-            for keyword in old_keywords:
-                if keyword in keywords:
-                    keywords.remove(keyword)
 
             """ Show and generate dataset word by word. """
-            data[1]["entities"] = user_control(text, entities=entities)
-            for entity in data[1]["entities"]:
-                keywords.add(text[entity[0] : entity[1]])
+            with profiler.stage("annotate"):
+                entities = user_control(text, entities=entities)
+            if entities != old_entities:
+                dataset.edit(i, entities)
+            if i + 1 > dataset.cursor:
+                dataset.save_cursor(i + 1)
+            new_keywords = set(text[entity[0] : entity[1]] for entity in entities)
+            for keyword in old_keywords - new_keywords:
+                keywords.remove(keyword)
+            for keyword in new_keywords - old_keywords:
+                keywords.add(keyword, SOURCE_ANNOTATION)
+            profiler.count("texts.annotated")
+            profiler.count("keywords.removed", len(old_keywords - new_keywords))
+            profiler.count("keywords.added", len(new_keywords - old_keywords))
+        cursor = len(dataset)
     except KeyboardInterrupt:
         print("Keyboard Interrupt.")
     except Exception as e:
         logger.exception(e)
     finally:
         print()
-        """ Dump the dataset to local. """
-        utils.dump_json(dataset, dataset_path)
-        # TODO: add hit count stats.
-        with open("assets/features.txt", "w") as f:
-            for word in keywords:
-                f.write(word + "\n")
+        if cursor > dataset.cursor:
+            dataset.save_cursor(cursor)
+        dataset.close()
+        with profiler.stage("save"):
+            # text copy first, so the index stays the newer of the two
+            keywords.export(features_file)
+            keywords.save()
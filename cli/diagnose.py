@@ -0,0 +1,60 @@
+import sys
+import time
+import click
+import subprocess
+from rich import print
+
+from src import environment
+
+
+@click.group()
+def diagnose():
+    """ Startup and performance diagnostics. """
+    pass
+
+
+def _parse_importtime(stderr):
+    """Parse `-X importtime` output into (self_us, cumulative_us, module).
+
+    Nested imports keep their indentation in module.
+    """
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:") :].split("|")
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            # skip the header line
+            continue
+        self_us, cumulative_us, module = fields
+        imports.append((int(self_us), int(cumulative_us), module.rstrip()))
+    return imports
+
+
+@diagnose.command()
+@click.option("-n", "--top", default=20, help="number of imports to show.")
+@click.argument("command", nargs=-1)
+def startup(top, command):
+    """Report import time of `butler.py COMMAND --help`."""
+    args = [sys.executable, "-X", "importtime", "butler.py", *command, "--help"]
+
+    start = time.perf_counter()
+    process = subprocess.run(
+        args, capture_output=True, text=True, cwd=environment.get_root_directory()
+    )
+    elapsed = time.perf_counter() - start
+
+    imports = _parse_importtime(process.stderr)
+    # top level imports only, their cumulative time sums to the total
+    total_us = sum(
+        cumulative for _, cumulative, module in imports if module[1] != " "
+    )
+
+    print(f"[white]{' '.join(['butler.py', *command])}[/white]")
+    print(f"{'cumulative(ms)':>15} {'self(ms)':>10}  module")
+    for self_us, cumulative_us, module in sorted(imports, key=lambda x: -x[1])[:top]:
+        print(f"{cumulative_us / 1e3:>15.1f} {self_us / 1e3:>10.1f}  {module.strip()}")
+
+    print(f"\nimports: {total_us / 1e3:.1f}ms, wall clock: {elapsed * 1e3:.1f}ms")
+    if process.returncode:
+        print(f"[red]exit code {process.returncode}[/red]")
@@ -1,14 +1,23 @@
-import re
+import time
 import click
+import signal
+import sqlite3
+from datetime import timedelta, timezone
 from loguru import logger
-from bs4 import BeautifulSoup
+from rich import print
+from rich.markup import escape
 from rich.progress import track
 
-import feedparser
-from src import utils
+from src import dedupe
+from src import fetcher
 from src import database
 from src import constants
 from src import settings
+from src import html_text
+from src import profiler
+from src.keyword_index import load_features_index
+from src.report import ReportWriter, resolve_report, compact as compact_report
+from src.watcher import AdaptiveSchedule, Watcher
 
 
 @click.group()
@@ -19,46 +28,104 @@ def rss():
 
 def _construct_feed(entry):
     return {
-        "title": utils.escape_quotes(entry["title"]),
+        "title": entry["title"],
         "link": entry["link"],
-        "summary": utils.escape_quotes(entry["summary"]),
+        "summary": entry["summary"],
         "published": entry["published"],
         "author": entry["author"],
     }
 
 
-def _parse_and_store_entries(data):
-    unread_feeds = []
+def _is_reply(entry):
+    return entry["title"].startswith("Re")
+
+
+def _parse_and_store_entries(user, data):
+    feeds = []
     for entry in data["entries"]:
         # skip reply tweet.
-        if entry["title"].startswith("Re"):
+        if _is_reply(entry):
             continue
 
-        feed = _construct_feed(entry)
+        feeds.append(_construct_feed(entry))
 
-        if not database.check_exists(feed):
-            database.insert_feed(feed)
-            unread_feeds.append(feed)
+    return database.insert_feeds(feeds, user)
 
-    return unread_feeds
 
+def _get_unread_feeds(api, concurrency, timeout, incremental=True):
+    following_accounts = settings.get_list("subscribe")
+    states = database.get_account_states(following_accounts)
+    due_states = [state for state in states if fetcher.is_due(state)]
+
+    unread_feeds = []
+    start = time.perf_counter()
+    results = fetcher.fetch_accounts(
+        api, due_states, concurrency, timeout, incremental
+    )
+    # one transaction for the whole fetch cycle
+    with database.transaction():
+        for state, status, headers, data, error in track(
+            results, total=len(due_states), description="Querying twitter..."
+        ):
+            user = state["user"]
+            if error is not None:
+                logger.info(f"Failed to get {user} tweets: {error}")
+            elif data is not None:
+                try:
+                    with profiler.stage("sqlite.insert"):
+                        unread_feeds += _parse_and_store_entries(user, data)
+                except Exception as e:
+                    logger.exception(e)
+                    # not stored, fetch these entries again after the backoff
+                    error = e
 
-def _get_user_feeds(user):
-    api = constants.RSSHUB_API.format(user=user)
-    data = feedparser.parse(api)
-    unread_feeds = _parse_and_store_entries(data)
+            with profiler.stage("sqlite.state"):
+                _next_account_state(state, headers, data, error)
+
+    elapsed = time.perf_counter() - start
+    logger.info(
+        f"Fetched {len(due_states)}/{len(states)} accounts in {elapsed:.2f}s "
+        f"(concurrency={concurrency})."
+    )
     return unread_feeds
 
 
-def _get_text_entities(text, keywords):
+def _next_account_state(state, headers, data, error):
+    state = fetcher.next_state(
+        state,
+        headers,
+        data,
+        error,
+        settings.get_float("rss.BACKOFF_BASE", 300),
+        settings.get_float("rss.BACKOFF_MAX", 86400),
+    )
+    database.update_account_state(state)
+    return state
+
+
+def _collapse_duplicates(feeds, texts):
+    # one representative per cluster of near duplicate feeds
+    with profiler.stage("dedupe"), database.transaction():
+        unique = dedupe.collapse(
+            feeds,
+            texts,
+            settings.get_float("rss.DEDUPE_THRESHOLD", 0.6),
+            settings.get_float("rss.DEDUPE_MAX_AGE", 30) * 86400,
+        )
+    profiler.count("feeds.duplicates", len(feeds) - len(unique))
+    return unique
+
+
+def _source(feed):
+    return {"author": feed["author"], "link": feed["link"]}
+
+
+def _get_text_entities(text, matcher):
     entities = []
-    for keyword in keywords:
-        for m in re.finditer(keyword, text):
-            start = m.start()
-            stop = start + len(keyword)
-            label = "KEYWORD"
-            entity = [start, stop, label]
-            entities.append(entity)
+    for start, stop in matcher.findall(text):
+        label = "KEYWORD"
+        entity = [start, stop, label]
+        entities.append(entity)
     return {"entities": entities}
 
 
@@ -66,42 +133,320 @@ def _get_text_entities(text, keywords):
 @click.option(
     "-o",
     "--output",
-    help="the path of output report.json.",
-    default="assets/report.json",
+    help="the path of the report matched feeds are appended to.",
+    default=settings.get_str("data.REPORT", "assets/report.jsonl"),
+)
+@click.option(
+    "--api",
+    help="feed url template of an account.",
+    default=constants.RSSHUB_API,
+)
+@click.option(
+    "-j",
+    "--concurrency",
+    help="number of concurrent requests.",
+    default=settings.get_int("rss.CONCURRENCY", 8),
+)
+@click.option(
+    "--timeout",
+    help="timeout in seconds of each request.",
+    default=settings.get_float("rss.TIMEOUT", 15),
+)
+@click.option(
+    "--incremental/--full",
+    help="stop parsing a feed at the entry seen last time, or parse it all.",
+    default=True,
 )
-def today(output):
-    reports = []
+@click.option(
+    "--dedupe/--keep-duplicates",
+    "collapse",
+    help="collapse near duplicate feeds to one report entry, or keep each copy.",
+    default=True,
+)
+def today(output, api, concurrency, timeout, incremental, collapse):
+    database.create_table()
+    with profiler.stage("fetch"):
+        unread_feeds = _get_unread_feeds(api, concurrency, timeout, incremental)
+    logger.info(f"Get {len(unread_feeds)} unread feeds.")
+    profiler.count("feeds.unread", len(unread_feeds))
 
-    unread_feeds = []
-    following_accounts = settings.get("subscribe")
-    for user in track(following_accounts, description="Querying twitter..."):
-        try:
-            user_unread_feed = _get_user_feeds(user)
-            unread_feeds += user_unread_feed
-        except:
-            logger.info(f"Failed to get {user} tweets.")
+    with profiler.stage("index.load"):
+        index = load_features_index()
+        matcher = index.get_matcher()
+
+    with profiler.stage("html"):
+        texts = html_text.html_to_texts(feed["summary"] for feed in unread_feeds)
+
+    if collapse:
+        unique = _collapse_duplicates(unread_feeds, texts)
+        logger.info(
+            f"Collapsed {len(unread_feeds) - len(unique)} near duplicate feeds."
+        )
+    else:
+        unique = [(feed, text, []) for feed, text in zip(unread_feeds, texts)]
+
+    # every matched feed is on disk as soon as it is appended
+    matched = 0
+    with ReportWriter(resolve_report(output)) as report:
+        for _, text, duplicates in unique:
+            try:
+                if not text:
+                    continue
+
+                with profiler.stage("match"):
+                    entities = _get_text_entities(text, matcher)
+                if not entities["entities"]:
+                    continue
+                for start, stop, _ in entities["entities"]:
+                    index.hit(text[start:stop])
+                with profiler.stage("report.append"):
+                    report.append(
+                        text, entities["entities"], [_source(f) for f in duplicates]
+                    )
+                matched += 1
+            except Exception as e:
+                logger.exception(e)
+    logger.info(f"Appended {matched} matched feeds to {report.path}.")
+    profiler.count("feeds.matched", matched)
+
+    with profiler.stage("index.save"):
+        index.save()
 
-    logger.info(f"Get {len(unread_feeds)} unread feeds.")
 
-    with open("assets/features.txt") as f:
-        keywords = set([word.strip() for word in f.readlines()])
+def _write_watch_job(job, index, report):
+    # store new feeds and append the matched ones to the report
+    user = job["state"]["user"]
+    error = job["error"]
+    if error is not None:
+        logger.info(f"Failed to get {user} tweets: {error}")
 
-    for unread_feed in unread_feeds:
+    # a job that failed in any stage has no entries to write
+    feeds = [_construct_feed(entry) for entry in job["entries"]] if not error else []
+    if feeds:
         try:
-            text = unread_feed["summary"]
-            text = utils.unescape_quotes(text)
-            soup = BeautifulSoup(text, "html.parser")
-            text = soup.text
-            if not text:
-                continue
-
-            words = set(text.split())
-            matched_keywords = words & keywords
-            if not matched_keywords:
-                continue
-            feed_report = [text, _get_text_entities(text, matched_keywords)]
-            reports.append(feed_report)
+            _write_watch_feeds(user, feeds, job, index, report)
         except Exception as e:
             logger.exception(e)
+            # not stored, fetch these entries again after the backoff
+            error = e
+
+    with profiler.stage("sqlite.state"):
+        return _next_account_state(job["state"], job["headers"], job["data"], error)
+
+
+def _write_watch_feeds(user, feeds, job, index, report):
+    texts = dict(zip((feed["link"] for feed in feeds), job["texts"]))
+    entities_of = dict(zip((feed["link"] for feed in feeds), job["entities"]))
+    # matching already ran in the pipeline, collapsing keeps the report short
+    with database.transaction():
+        with profiler.stage("sqlite.insert"):
+            new_feeds = database.insert_feeds(feeds, user)
+        unique = _collapse_duplicates(
+            new_feeds, [texts[feed["link"]] for feed in new_feeds]
+        )
+
+    matched = 0
+    for feed, text, duplicates in unique:
+        entities = entities_of[feed["link"]]
+        if not text or not entities:
+            continue
+        for start, stop, _ in entities:
+            index.hit(text[start:stop])
+        report.append(text, entities, [_source(f) for f in duplicates])
+        matched += 1
+    logger.info(f"{user}: {len(new_feeds)} new feeds, {matched} matched.")
+    profiler.count("feeds.new", len(new_feeds))
+    profiler.count("feeds.matched", matched)
+
+
+def _log_watch_stats(watcher):
+    for stage, (count, p50, p95, longest) in watcher.stats.summary().items():
+        logger.info(
+            f"{stage:<6} n={count:<6} p50={p50 * 1e3:.1f}ms "
+            f"p95={p95 * 1e3:.1f}ms max={longest * 1e3:.1f}ms"
+        )
+
+
+@rss.command()
+@click.option(
+    "-o",
+    "--output",
+    help="the path of the report, one matched feed per line.",
+    default="assets/watch.jsonl",
+)
+@click.option(
+    "--api",
+    help="feed url template of an account.",
+    default=constants.RSSHUB_API,
+)
+@click.option(
+    "-j",
+    "--concurrency",
+    help="number of concurrent requests.",
+    default=settings.get_int("rss.CONCURRENCY", 8),
+)
+@click.option(
+    "--timeout",
+    help="timeout in seconds of each request.",
+    default=settings.get_float("rss.TIMEOUT", 15),
+)
+@click.option(
+    "--stats-interval",
+    help="seconds between stage latency reports.",
+    default=60.0,
+)
+def watch(output, api, concurrency, timeout, stats_interval):
+    """Poll accounts continuously, each at its own pace."""
+    database.create_table()
+    states = database.get_account_states(settings.get_list("subscribe"))
+    index = load_features_index()
+
+    schedule = AdaptiveSchedule(
+        [state["user"] for state in states],
+        settings.get_float("rss.WATCH_MIN_INTERVAL", 300),
+        settings.get_float("rss.WATCH_MAX_INTERVAL", 21600),
+    )
+    watcher = Watcher(
+        api,
+        states,
+        index.get_matcher(),
+        schedule,
+        concurrency=concurrency,
+        timeout=timeout,
+        queue_size=settings.get_int("rss.QUEUE_SIZE", 64),
+        entry_filter=lambda entry: not _is_reply(entry),
+    )
+
+    def tick():
+        _log_watch_stats(watcher)
+        # save() merges the hits with what other processes saved since,
+        # otherwise get_matcher() reloads a newer generation on its own
+        if index.dirty:
+            with profiler.stage("index.save"):
+                index.save()
+        watcher.matcher = index.get_matcher()
+
+    def shutdown(signum, frame):
+        logger.info("Stopping, finishing in-flight feeds...")
+        watcher.stop()
+
+    signal.signal(signal.SIGINT, shutdown)
+    signal.signal(signal.SIGTERM, shutdown)
+
+    logger.info(f"Watching {len(states)} accounts.")
+    with ReportWriter(resolve_report(output)) as report:
+        watcher.run(
+            lambda job: _write_watch_job(job, index, report), tick, stats_interval
+        )
+
+
+@rss.command()
+@click.option(
+    "-r",
+    "--report",
+    help="the path of the report.",
+    default=settings.get_str("data.REPORT", "assets/report.jsonl"),
+)
+def compact(report):
+    """Fold annotation edits into the report.
+
+    Stop `rss today` and `rss watch` on the report first.
+    """
+    count, edits = compact_report(resolve_report(report))
+    logger.info(f"Compacted {count} feeds, folded {edits} edited feeds.")
+
+
+def _search_query(words, raw):
+    """Every word must match, as a literal phrase unless raw FTS5 syntax."""
+    if raw:
+        return " ".join(words)
+    terms = []
+    for word in " ".join(words).split():
+        prefix = word.endswith("*")
+        word = word.rstrip("*")
+        if word:
+            word = '"{}"'.format(word.replace('"', '""'))
+            terms.append(word + "*" if prefix else word)
+    return " ".join(terms)
+
+
+# title highlight marks, swapped for markup once the title is escaped
+_MARKS = ("\x02", "\x03")
+
+
+@rss.command()
+@click.argument("query", nargs=-1, required=True)
+@click.option(
+    "-a",
+    "--account",
+    help="only feeds fetched from this account, its handle as in subscribe.",
+)
+@click.option(
+    "--since",
+    help="only feeds published on or after this day.",
+    type=click.DateTime(["%Y-%m-%d"]),
+)
+@click.option(
+    "--until",
+    help="only feeds published on or before this day.",
+    type=click.DateTime(["%Y-%m-%d"]),
+)
+@click.option("-p", "--page", help="page of results to show.", default=1)
+@click.option("-n", "--per-page", help="results per page.", default=20)
+@click.option(
+    "-c",
+    "--candidates",
+    help="rank only the newest N matches, 0 ranks all.",
+    default=settings.get_int("rss.SEARCH_CANDIDATES", 10000),
+)
+@click.option(
+    "--raw",
+    is_flag=True,
+    help="pass QUERY as an FTS5 expression (AND, OR, NOT, NEAR, column:).",
+)
+def search(query, account, since, until, page, per_page, candidates, raw):
+    """Full-text search the archived feeds."""
+    try:
+        database.create_search_index()
+    except sqlite3.OperationalError as e:
+        raise click.ClickException(f"no archive to search, {e}")
+
+    # days are UTC, as the feeds' published times
+    if since:
+        since = int(since.replace(tzinfo=timezone.utc).timestamp())
+    if until:
+        until += timedelta(days=1)
+        until = int(until.replace(tzinfo=timezone.utc).timestamp())
+
+    page = max(page, 1)
+    try:
+        total, feeds = database.search_feeds(
+            _search_query(query, raw),
+            account=account,
+            since=since,
+            until=until,
+            limit=per_page,
+            offset=(page - 1) * per_page,
+            candidates=candidates or None,
+            marks=_MARKS,
+        )
+    except sqlite3.OperationalError as e:
+        raise click.UsageError(f"bad search query: {e}")
 
-    utils.dump_json(reports, output)
+    # the total stops counting past the candidates
+    ranked = min(total, candidates) if candidates else total
+    pages = max(1, -(-ranked // per_page))
+    found = f"more than {ranked}" if ranked < total else total
+    print(f"[white]{found} feeds, page {page}/{pages}[/white]")
+    if ranked < total:
+        print(
+            f"[white]ranking the newest {ranked}, narrow the query "
+            "or raise --candidates for older feeds[/white]"
+        )
+    for feed in feeds:
+        title = escape(feed["highlight"])
+        title = title.replace(_MARKS[0], "[bold red]").replace(_MARKS[1], "[/bold red]")
+        print(
+            f"\n[white]{feed['published']}[/white] [yellow]@{escape(feed['author'])}"
+            f"[/yellow]\n{title}\n[blue]{escape(feed['link'])}[/blue]"
+        )
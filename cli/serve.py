@@ -0,0 +1,58 @@
+import time
+import click
+import signal
+import threading
+from loguru import logger
+
+from src import settings
+from src import service
+from src.textrank import TextRank, get_nlp
+from src.keyword_index import load_features_index
+
+
+@click.command()
+@click.option(
+    "--host",
+    help="address to listen on.",
+    default=settings.get_str("serve.HOST", "127.0.0.1"),
+)
+@click.option(
+    "-p",
+    "--port",
+    help="port to listen on.",
+    default=settings.get_int("serve.PORT", 8780),
+)
+@click.option(
+    "-b",
+    "--max-batch-size",
+    help="most texts solved together in one batch.",
+    default=settings.get_int("serve.MAX_BATCH_SIZE", 64),
+)
+@click.option(
+    "--max-wait-ms",
+    help="how long a batch waits for more requests.",
+    default=settings.get_float("serve.MAX_WAIT_MS", 5),
+)
+def serve(host, port, max_batch_size, max_wait_ms):
+    """Local HTTP analysis service."""
+    start = time.perf_counter()
+    get_nlp()
+    textrank = TextRank()
+    matcher = load_features_index().get_matcher()
+    elapsed = time.perf_counter() - start
+    logger.info(f"Loaded model and {len(matcher)} keywords in {elapsed:.1f}s.")
+
+    analysis = service.AnalysisService(
+        textrank, matcher, max_batch_size, max_wait_ms / 1e3
+    )
+    server = service.start_server(analysis, host, port)
+    logger.info(f"Serving on http://{host}:{server.server_port}")
+
+    stopped = threading.Event()
+    signal.signal(signal.SIGINT, lambda signum, frame: stopped.set())
+    signal.signal(signal.SIGTERM, lambda signum, frame: stopped.set())
+    stopped.wait()
+
+    server.shutdown()
+    analysis.close()
+    logger.info("Stopped.")
@@ -1,9 +1,21 @@
+import time
 import click
+import shutil
+import tempfile
 from pathlib import Path
+from contextlib import nullcontext
+from concurrent.futures import ProcessPoolExecutor
+from loguru import logger
 from rich.progress import track
 
 from src import utils
+from src import settings
+from src import textrank
 from src import database as db
+from src import profiler
+from src.cache import KeywordCache, make_key
+from src.corpus_graph import CorpusGraph
+from src.keyword_index import load_keyword_index
 from src.textrank import TextRank
 
 
@@ -16,12 +28,37 @@ def setup():
 def _filter_no_reply_tweets(tweet_dataset):
     result = filter(lambda x: not x["reply_to"], tweet_dataset)
     result = filter(lambda x: not x["tweet"].startswith("@"), result)
-    return list(result)
+    return result
 
 
 def _filter_only_english_tweets(tweet_dataset):
     result = filter(lambda x: x["language"] == "en", tweet_dataset)
-    return list(result)
+    return result
+
+
+def _ingest_tweets_file(tweets_file, output, output_clean, chunk_size):
+    """Stream one export into the corpus files, return the tweets count."""
+    minimized_dataset = utils.iter_json_lines(tweets_file)
+    minimized_dataset = _filter_only_english_tweets(minimized_dataset)
+    minimized_dataset = _filter_no_reply_tweets(minimized_dataset)
+
+    count = 0
+    with open(output, "a") as f, open(output_clean, "a") as f_clean:
+        for chunk in utils.chunked(minimized_dataset, chunk_size):
+            tweets = [data["tweet"] for data in chunk]
+            f.writelines(utils.unescape_xml_symbol(text) + "\n" for text in tweets)
+            # sanitize_many is lazy, the stage times it with the write
+            with profiler.stage("sanitize"):
+                f_clean.writelines(text + "\n" for text in utils.sanitize_many(tweets))
+            count += len(tweets)
+    return count
+
+
+def _concat_files(paths, output):
+    with open(output, "ab") as f:
+        for path in paths:
+            with open(path, "rb") as shard:
+                shutil.copyfileobj(shard, f)
 
 
 @setup.command()
@@ -37,35 +74,99 @@ def _filter_only_english_tweets(tweet_dataset):
     help="the path of output corpus.txt.",
     type=click.Path(),
 )
-def corpus(tweets, output):
+@click.option(
+    "-w",
+    "--workers",
+    help="number of worker processes.",
+    default=1,
+)
+@click.option(
+    "--chunk-size",
+    help="number of tweets buffered before each write.",
+    default=10000,
+)
+def corpus(tweets, output, workers, chunk_size):
     """Generate corpus.txt from raw tweets data."""
 
     tweets = Path(tweets)
     output = Path(output)
     output_clean = output.parent / (output.name + "_clean" + output.suffix)
 
-    output = open(output, "a")
-    output_clean = open(output_clean, "a")
+    # sorted so the corpus order doesn't depend on the file system
+    tweets_files = sorted(tweets.glob("*.json"))
 
-    for tweets_file in tweets.glob("*.json"):
-        minimized_dataset = utils.load_json_lines(tweets_file)
-        minimized_dataset = _filter_only_english_tweets(minimized_dataset)
-        minimized_dataset = _filter_no_reply_tweets(minimized_dataset)
+    if workers <= 1:
+        count = 0
+        with profiler.stage("ingest"):
+            for tweets_file in track(tweets_files):
+                count += _ingest_tweets_file(
+                    tweets_file, output, output_clean, chunk_size
+                )
+        profiler.count("files", len(tweets_files))
+        profiler.count("tweets", count)
+        logger.info(f"Ingested {count} tweets.")
+        return
 
-        tweets_text = [
-            utils.unescape_xml_symbol(data["tweet"]) + "\n"
-            for data in minimized_dataset
+    # every file goes to its own shard, shards are appended in file order
+    with tempfile.TemporaryDirectory(dir=output.parent) as tmp:
+        shards = [
+            (Path(tmp) / f"{i}.txt", Path(tmp) / f"{i}_clean.txt")
+            for i in range(len(tweets_files))
         ]
+        with profiler.stage("ingest"), ProcessPoolExecutor(
+            max_workers=workers
+        ) as executor:
+            counts = executor.map(
+                _ingest_tweets_file,
+                tweets_files,
+                [shard for shard, _ in shards],
+                [shard_clean for _, shard_clean in shards],
+                [chunk_size] * len(tweets_files),
+            )
+            count = sum(track(counts, total=len(tweets_files)))
 
-        tweets_clean_text = [
-            utils.sanitize_text(data["tweet"]) + "\n" for data in minimized_dataset
-        ]
+        with profiler.stage("concat"):
+            _concat_files([shard for shard, _ in shards], output)
+            _concat_files([shard_clean for _, shard_clean in shards], output_clean)
+    profiler.count("files", len(tweets_files))
+    profiler.count("tweets", count)
+    logger.info(f"Ingested {count} tweets.")
+
+
+# TextRank instance of the current (worker) process
+_textrank = None
+
+
+def _init_keyword_worker():
+    global _textrank
+    _textrank = TextRank()
+
+
+_KEYWORD_PARAMS = dict(
+    candidate_pos=["NOUN", "PROPN"],
+    window_size=4,
+    lower=False,
+    number=10,
+)
+
+
+def _extract_keywords(texts):
+    """Return the filtered keywords with scores of each text."""
+    results = _textrank.analyze_many(texts, filtered=True, **_KEYWORD_PARAMS)
 
-        output.writelines(tweets_text)
-        output_clean.writelines(tweets_clean_text)
+    return [top_keywords for _, top_keywords in results]
 
-    output.close()
-    output_clean.close()
+
+def _keyword_cache_params():
+    # everything the cached scores depend on
+    return dict(
+        _KEYWORD_PARAMS,
+        selection="top-k-filtered",
+        damping=textrank.DAMPING,
+        min_diff=textrank.MIN_DIFF,
+        steps=textrank.STEPS,
+        model=textrank.get_model_version(),
+    )
 
 
 @setup.command()
@@ -81,34 +182,239 @@ def corpus(tweets, output):
     help="the path of output features.txt.",
     default="assets/keywords.txt",
 )
-def keyword(clean_corpus, output):
+@click.option(
+    "-b",
+    "--batch-size",
+    help="number of texts solved together in one batch.",
+    default=1000,
+)
+@click.option(
+    "-w",
+    "--workers",
+    help="number of worker processes.",
+    default=1,
+)
+@click.option(
+    "--cache/--no-cache",
+    help="reuse keyword scores of texts analyzed before.",
+    default=True,
+)
+def keyword(clean_corpus, output, batch_size, workers, cache):
 
-    with open(clean_corpus) as f:
+    with profiler.stage("load"), open(clean_corpus) as f:
         data = [line for line in f.readlines()]
-        data = list(set(data))
+        # sorted so shards and merge order don't depend on set hashing
+        data = sorted(set(data))
+    profiler.count("texts", len(data))
 
-    keywords = set()
-    textrank = TextRank()
+    keywords = {}
+
+    def merge(text_keywords):
+        for keyword, score in text_keywords.items():
+            keywords[keyword] = max(score, keywords.get(keyword, score))
 
-    for text in track(data):
-        textrank.analyze(
-            text,
-            candidate_pos=["NOUN", "PROPN"],
-            window_size=4,
-            lower=False,
+    start = time.perf_counter()
+
+    # only texts missing from the cache are analyzed
+    params = _keyword_cache_params()
+    keys = [make_key(text, params) for text in data]
+    keyword_cache = None
+    if cache:
+        keyword_cache = KeywordCache(
+            settings.get_str("cache.KEYWORD_CACHE", "assets/keyword_cache.db"),
+            settings.get_int("cache.MAX_ENTRIES", 1000000),
         )
-        top_keywords = textrank.get_keywords(10)
-        top_keywords = textrank.filter_keywords(top_keywords)
-        keywords |= set(top_keywords)
+        with profiler.stage("cache.lookup"):
+            cached = keyword_cache.get_many(keys)
+            for text_keywords in cached.values():
+                merge(text_keywords)
+        missing = [(key, text) for key, text in zip(keys, data) if key not in cached]
+    else:
+        missing = list(zip(keys, data))
+
+    batches = list(utils.chunked(missing, batch_size))
+    texts = [[text for _, text in batch] for batch in batches]
+    pool = bool(batches) and workers > 1
+    if batches and not pool:
+        _init_keyword_worker()
+    profiler.count("texts.analyzed", len(missing))
+
+    executor = (
+        ProcessPoolExecutor(max_workers=workers, initializer=_init_keyword_worker)
+        if pool
+        else nullcontext()
+    )
+    # workers are shut down however the analysis ends
+    with executor:
+        if pool:
+            results = executor.map(_extract_keywords, texts)
+        else:
+            results = map(_extract_keywords, texts)
 
+        # executor.map yields in submission order, the merge is deterministic
+        batch_results = track(zip(batches, results), total=len(batches))
+        with profiler.stage("analyze"):
+            for batch, batch_keywords in batch_results:
+                for text_keywords in batch_keywords:
+                    merge(text_keywords)
+                if keyword_cache is not None:
+                    with profiler.stage("cache.store"):
+                        keyword_cache.put_many(
+                            (key, text_keywords)
+                            for (key, _), text_keywords in zip(batch, batch_keywords)
+                        )
+
+    elapsed = time.perf_counter() - start
+    logger.info(f"Analyzed {len(data)} docs, {len(data) / elapsed:.1f} docs/sec.")
+    if keyword_cache is not None:
+        with profiler.stage("cache.evict"):
+            keyword_cache.evict()
+        logger.info(
+            "Keyword cache: {hits} hits, {misses} misses, {entries} entries.".format(
+                **keyword_cache.stats()
+            )
+        )
+        keyword_cache.close()
     print("keywords count:", len(keywords))
+    profiler.count("keywords", len(keywords))
 
-    with open(output, "w") as f:
-        for keyword in keywords:
+    with profiler.stage("write"), open(output, "w") as f:
+        for keyword in sorted(keywords):
             f.write(keyword + "\n")
 
 
+@setup.command()
+@click.option(
+    "-c",
+    "--clean-corpus",
+    help="the path of corpus.txt, lines after those in the saved graph are merged.",
+    type=click.Path(exists=True),
+)
+@click.option(
+    "-g",
+    "--graph",
+    help="the path of the saved corpus graph.",
+    default="assets/corpus_graph.npz",
+)
+@click.option(
+    "-o",
+    "--output",
+    help="the path of output scored keywords.",
+    default="assets/keywords_scored.txt",
+)
+@click.option(
+    "-n",
+    "--number",
+    help="number of keywords to write.",
+    default=10000,
+)
+@click.option(
+    "--update/--rebuild",
+    help="merge the corpus into the saved graph, or start a new one.",
+    default=True,
+)
+def graph(clean_corpus, graph, output, number, update):
+    """Rank keywords over one corpus-wide co-occurrence graph."""
+    textrank = TextRank()
+    params = dict(_KEYWORD_PARAMS)
+    window_size = params.pop("window_size")
+    params.pop("number")
+
+    update = update and Path(graph).exists()
+    with profiler.stage("graph.load"):
+        corpus_graph = CorpusGraph.load(graph) if update else CorpusGraph()
+
+    if corpus_graph.corpus_offset is None:
+        raise click.ClickException(
+            f"{graph} doesn't record the corpus lines it holds, run with --rebuild"
+        )
+
+    # the corpus is appended to, only its new tail is merged
+    start = time.perf_counter()
+    delta = CorpusGraph()
+    with profiler.stage("segment"), open(clean_corpus, "rb") as f:
+        try:
+            lines = corpus_graph.corpus_lines(f)
+        except ValueError as e:
+            raise click.ClickException(f"{clean_corpus}: {e}, run with --rebuild")
+        for sentences in textrank.segment_many(lines, **params):
+            delta.add_pairs(textrank.get_token_pairs(window_size, sentences))
+    profiler.count("texts", delta.documents)
+
+    if delta.documents:
+        with profiler.stage("graph.merge"):
+            corpus_graph.merge(delta)
+        logger.info(
+            f"Added {delta.documents} docs in {time.perf_counter() - start:.1f}s, "
+            f"graph has {len(corpus_graph)} words "
+            f"and {len(corpus_graph.keys)} edges."
+        )
+
+        # previous scores seed the solve when only a delta was added
+        start = time.perf_counter()
+        with profiler.stage("rank"):
+            corpus_graph.rank(textrank, warm_start=update)
+        logger.info(f"Ranked graph in {time.perf_counter() - start:.2f}s.")
+        with profiler.stage("graph.save"):
+            corpus_graph.save(graph)
+    else:
+        logger.info(f"No new lines in {clean_corpus}, {graph} is up to date.")
+
+    keywords = corpus_graph.get_keywords(textrank, number)
+    profiler.count("keywords", len(keywords))
+    with profiler.stage("write"), open(output, "w") as f:
+        for keyword, score in keywords.items():
+            f.write(f"{keyword}\t{score:.6f}\n")
+    print("keywords count:", len(keywords))
+
+
+@setup.command()
+@click.option(
+    "-k",
+    "--keywords",
+    help="the path of keywords to add, one per line.",
+    type=click.Path(exists=True),
+)
+@click.option(
+    "--replace/--merge",
+    help="make the index hold only these keywords, or add them.",
+    default=False,
+)
+def features(keywords, replace):
+    """Compile keywords into the binary keyword index."""
+    features_file = settings.get_str("data.FEATURES", "assets/features.txt")
+    with profiler.stage("index.load"):
+        index = load_keyword_index(
+            settings.get_str("data.FEATURES_INDEX", "assets/features.idx"),
+            features_file,
+        )
+
+    if keywords:
+        with profiler.stage("index.update"), open(keywords) as f:
+            if replace:
+                index.sync(f)
+            else:
+                for keyword in f:
+                    index.add(keyword)
+
+    # text copy first, so the index stays the newer of the two
+    with profiler.stage("index.save"):
+        index.export(features_file)
+        index.save()
+    profiler.count("keywords", len(index))
+    print("keywords count:", len(index))
+
+
 @setup.command()
 def database():
     """Setup sqlite3 database."""
+    with profiler.stage("create_table"):
+        db.create_table()
+
+
+@setup.command(name="search-index")
+def search_index():
+    """Rebuild the full-text search index of the archive."""
     db.create_table()
+    with profiler.stage("search.rebuild"):
+        db.rebuild_search_index()
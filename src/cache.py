@@ -0,0 +1,107 @@
+"""Persistent content-hash cache of per-document keyword scores."""
+import json
+import time
+import hashlib
+import sqlite3
+
+_CACHE_TABLE_SCHEMA = """
+Keywords (
+key         char(40) primary key,
+value       text,
+accessed    integer
+)
+"""
+
+# sqlite limits the number of host parameters of a statement
+_MAX_VARIABLES = 500
+
+
+def normalize_text(text):
+    return " ".join(text.split())
+
+
+def make_key(text, params):
+    """Hash of the normalized text and the parameters producing its result."""
+    digest = hashlib.sha1(normalize_text(text).encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(json.dumps(params, sort_keys=True).encode("utf-8"))
+    return digest.hexdigest()
+
+
+class KeywordCache(object):
+    """sqlite key/value store with least recently used eviction."""
+
+    def __init__(self, database, max_entries=1000000):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+        self.conn = sqlite3.connect(database)
+        self.conn.execute("pragma journal_mode=wal")
+        self.conn.execute(f"create table if not exists {_CACHE_TABLE_SCHEMA}")
+        self.conn.execute(
+            "create index if not exists keywords_accessed on keywords (accessed)"
+        )
+        self.conn.commit()
+
+    def __len__(self):
+        return self.conn.execute("select count(*) from keywords").fetchone()[0]
+
+    def get_many(self, keys):
+        """Return {key: value} of the cached keys and touch them."""
+        values = {}
+        for i in range(0, len(keys), _MAX_VARIABLES):
+            chunk = keys[i : i + _MAX_VARIABLES]
+            sql = "select key, value from keywords where key in ({})".format(
+                ", ".join("?" for _ in chunk)
+            )
+            values.update(
+                (key, json.loads(value)) for key, value in self.conn.execute(sql, chunk)
+            )
+
+        now = time.time_ns()
+        self.conn.executemany(
+            "update keywords set accessed = ? where key = ?",
+            ((now, key) for key in values),
+        )
+        self.conn.commit()
+
+        self.hits += len(values)
+        self.misses += len(keys) - len(values)
+        return values
+
+    def put_many(self, items):
+        """Store (key, value) pairs."""
+        now = time.time_ns()
+        self.conn.executemany(
+            "insert or replace into keywords (key, value, accessed) values (?, ?, ?)",
+            ((key, json.dumps(value), now) for key, value in items),
+        )
+        self.conn.commit()
+
+    def evict(self):
+        """Drop the least recently used entries beyond max_entries."""
+        overflow = len(self) - self.max_entries
+        if overflow <= 0:
+            return 0
+
+        self.conn.execute(
+            """delete from keywords where key in (
+                select key from keywords order by accessed limit ?
+            )""",
+            (overflow,),
+        )
+        self.conn.commit()
+        return overflow
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "entries": len(self),
+        }
+
+    def close(self):
+        self.conn.close()
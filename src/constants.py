@@ -1,4 +1,5 @@
 import re
+import functools
 from src import settings
 
 REGEX_URL = "https?://[^\s]+"
@@ -16,12 +17,39 @@ REGEX_EMOJI_PATTERN = re.compile(
     flags=re.UNICODE,
 )
 
-_SLANG_PATH = settings.get("data.SLANG")
-with open(_SLANG_PATH) as f:
-    _EXCLUSION_SLANG_WORDS = set(
-        word.split(":", 1)[0].lower().replace("+", "\+") for word in f.readlines()
-    )
-    REGEX_SLANG = "|".join(_EXCLUSION_SLANG_WORDS)
+
+# Removal rules of sanitize_text fused into one pass. When the rules run
+# one by one the url goes first, so a hashtag or mention must not run
+# into a url glued to it.
+_REGEX_WORD_BEFORE_URL = r"(?:(?!https?://\S)\w)+"
+REGEX_SANITIZE = re.compile(
+    "|".join(
+        (
+            REGEX_URL,
+            "#" + _REGEX_WORD_BEFORE_URL,
+            "@" + _REGEX_WORD_BEFORE_URL,
+            REGEX_MD5,
+            REGEX_EMOJI_PATTERN.pattern,
+        )
+    ),
+    flags=re.UNICODE,
+)
+# single spaces already are " ", only rewrite runs
+REGEX_WHITESPACE_RUN = re.compile(" {2,}")
+
+
+@functools.lru_cache(maxsize=None)
+def get_slang_words():
+    """Read the slang list on first use."""
+    with open(settings.get("data.SLANG")) as f:
+        return frozenset(line.split(":", 1)[0].strip().lower() for line in f)
+
+
+@functools.lru_cache(maxsize=None)
+def get_stop_words():
+    """Read the stop word list on first use."""
+    with open(settings.get("data.STOP")) as f:
+        return frozenset(line.strip().lower() for line in f)
 
 
 RSSHUB_API = "https://rsshub.app/twitter/user/{user}"
@@ -0,0 +1,185 @@
+"""Corpus-level co-occurrence graph and global TextRank."""
+import os
+import zlib
+
+import numpy as np
+
+# pair (i, j), i < j, is packed into one int64 key
+_ID_BITS = 32
+_ID_MASK = (1 << _ID_BITS) - 1
+
+# bytes before the merged offset that must still match in the corpus
+_CHECK_SIZE = 4096
+
+
+def _crc_before(f, offset):
+    start = max(0, offset - _CHECK_SIZE)
+    f.seek(start)
+    return zlib.crc32(f.read(offset - start))
+
+
+class CorpusGraph(object):
+    """Weighted co-occurrence graph over an interned vocabulary.
+
+    An edge weighs the number of documents in which its two words appear
+    within the window. Edges are kept as sorted packed-pair keys with a
+    parallel weight array, so memory follows the vocabulary and the edge
+    count, never the number of documents.
+    """
+
+    def __init__(self):
+        self.vocab = {}  # word -> id
+        self.words = []  # id -> word
+        self.keys = np.zeros(0, dtype=np.int64)
+        self.weights = np.zeros(0, dtype=np.float64)
+        self.scores = np.zeros(0, dtype=np.float64)  # last solve
+        self.documents = 0
+        # bytes of the corpus file merged, crc32 of the bytes just before
+        self.corpus_offset = 0
+        self.corpus_crc = 0
+
+        self._pending = []  # packed keys not merged into keys yet
+        self._pending_size = 0
+
+    def __len__(self):
+        return len(self.words)
+
+    def intern(self, word):
+        index = self.vocab.get(word)
+        if index is None:
+            index = self.vocab[word] = len(self.words)
+            self.words.append(word)
+        return index
+
+    def add_pairs(self, token_pairs):
+        """Add the (word, word) pairs of one document."""
+        keys = set()
+        for word1, word2 in token_pairs:
+            i, j = self.intern(word1), self.intern(word2)
+            if i == j:
+                continue
+            if i > j:
+                i, j = j, i
+            keys.add((i << _ID_BITS) | j)
+
+        self.documents += 1
+        if keys:
+            self._pending.append(np.fromiter(keys, dtype=np.int64, count=len(keys)))
+            self._pending_size += len(keys)
+        if self._pending_size > 1 << 20:
+            self.compact()
+
+    def add_edges(self, keys, weights):
+        """Add weighted packed-pair keys, keys must use this vocab."""
+        self.compact()
+        keys = np.concatenate([self.keys, keys])
+        weights = np.concatenate([self.weights, weights])
+        self.keys, inverse = np.unique(keys, return_inverse=True)
+        self.weights = np.bincount(inverse, weights=weights, minlength=len(self.keys))
+
+    def compact(self):
+        """Merge the pending keys into the edge arrays."""
+        if not self._pending:
+            return
+
+        pending = np.concatenate(self._pending)
+        self._pending = []
+        self._pending_size = 0
+        self.add_edges(pending, np.ones(len(pending)))
+
+    def merge(self, other):
+        """Add the documents and edges of another graph (a corpus delta)."""
+        other.compact()
+        mapping = np.fromiter(
+            (self.intern(word) for word in other.words),
+            dtype=np.int64,
+            count=len(other.words),
+        )
+        i = mapping[other.keys >> _ID_BITS]
+        j = mapping[other.keys & _ID_MASK]
+        keys = (np.minimum(i, j) << _ID_BITS) | np.maximum(i, j)
+        self.add_edges(keys, other.weights)
+        self.documents += other.documents
+
+    def corpus_lines(self, f):
+        """Return the lines of a binary corpus file that were not merged yet.
+
+        The corpus only grows, lines before corpus_offset are in the graph
+        and a torn last line waits for the next run; corpus_offset follows
+        the lines as they are read. Raise ValueError when the file does
+        not continue the corpus merged so far.
+        """
+        size = f.seek(0, os.SEEK_END)
+        offset = self.corpus_offset
+        if size < offset or _crc_before(f, offset) != self.corpus_crc:
+            raise ValueError("the corpus does not continue the one in the graph")
+        f.seek(offset)
+        return self._read_lines(f)
+
+    def _read_lines(self, f):
+        try:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    return
+                yield line.decode("utf-8")
+                self.corpus_offset += len(line)
+        finally:
+            self.corpus_crc = _crc_before(f, self.corpus_offset)
+
+    def edges(self):
+        """Return (rows, cols, weights) of the compacted edges."""
+        self.compact()
+        return self.keys >> _ID_BITS, self.keys & _ID_MASK, self.weights
+
+    def rank(self, textrank, warm_start=True):
+        """Solve PageRank over the whole graph.
+
+        With warm_start the previous scores seed the iteration, nodes
+        added since then start at 1.
+        """
+        rows, cols, weights = self.edges()
+        g = textrank.get_normalized_matrix(len(self), rows, cols, weights)
+
+        pr = np.ones(len(self))
+        if warm_start:
+            pr[: len(self.scores)] = self.scores
+        self.scores = textrank.pagerank(g, pr, converge=True)
+        return self.scores
+
+    def get_keywords(self, textrank, number, filtered=True):
+        """Return the top number words of the last solve, best first."""
+        return textrank.select_keywords(
+            self.words[: len(self.scores)], self.scores, number, filtered
+        )
+
+    def save(self, path):
+        self.compact()
+        with open(path, "wb") as f:
+            np.savez_compressed(
+                f,
+                words=np.array(self.words, dtype=str),
+                keys=self.keys,
+                weights=self.weights,
+                scores=self.scores,
+                documents=np.array(self.documents),
+                corpus_offset=np.array(self.corpus_offset),
+                corpus_crc=np.array(self.corpus_crc),
+            )
+
+    @classmethod
+    def load(cls, path):
+        graph = cls()
+        with np.load(path) as data:
+            graph.words = data["words"].tolist()
+            graph.keys = data["keys"]
+            graph.weights = data["weights"]
+            graph.scores = data["scores"]
+            graph.documents = int(data["documents"])
+            if "corpus_offset" in data:
+                graph.corpus_offset = int(data["corpus_offset"])
+                graph.corpus_crc = int(data["corpus_crc"])
+            else:
+                # saved before offsets were kept, what it holds is unknown
+                graph.corpus_offset = graph.corpus_crc = None
+        graph.vocab = {word: index for index, word in enumerate(graph.words)}
+        return graph
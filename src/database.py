@@ -1,4 +1,10 @@
+import re
+import heapq
+import time
 import sqlite3
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+
 from src import settings
 
 _FEED_TABLE_SCHEMA = """
@@ -7,48 +13,459 @@ author      varchar(64),
 title       varchar(512),
 link        varchar(512),
 published   varchar(64),
-summary     varchar(512)
+summary     varchar(512),
+published_at integer,
+account     varchar(64)
+)
+"""
+
+_ACCOUNT_TABLE_SCHEMA = """
+Accounts (
+user        varchar(64) primary key,
+etag        varchar(256),
+modified    varchar(64),
+last_seen   varchar(512),
+failures    integer default 0,
+next_fetch  real default 0
+)
+"""
+
+# MinHash signatures of archived feeds and their LSH band keys, see dedupe.py
+_SIGNATURE_TABLE_SCHEMA = """
+{TABLE}_signatures (
+link        varchar(512) primary key,
+signature   blob,
+duplicate_of varchar(512),
+seen        real
 )
 """
 
+_BAND_TABLE_SCHEMA = """
+{TABLE}_bands (
+band        integer,
+key         blob,
+link        varchar(512),
+primary key (band, key, link)
+) without rowid
+"""
+
+_FEED_COLUMNS = ("author", "title", "link", "published", "summary")
+_STORED_FEED_COLUMNS = _FEED_COLUMNS + ("published_at", "account")
+_ACCOUNT_COLUMNS = ("user", "etag", "modified", "last_seen", "failures", "next_fetch")
+
+# sqlite limits the number of host parameters of a statement
+_MAX_VARIABLES = 500
+
+# the status link names who tweeted, the account a retweet came from
+# only shows in the feed it was fetched from
+_REGEX_RETWEET = re.compile(r"RT ([^:]{1,64}):")
+_REGEX_ACCOUNT = re.compile(r"https?://(?:www\.)?(?:twitter|x)\.com/(\w+)/status/")
+
+# external content index, rows keep their rowid; author holds display
+# names, only FTS5 expressions of `rss search --raw` query it;
+# short prefix queries like "re*" read a prefix index instead of every term
+_SEARCH_SCHEMA = """
+{TABLE}_fts using fts5(
+    title,
+    summary,
+    author,
+    content='{TABLE}',
+    content_rowid='rowid',
+    tokenize='unicode61 remove_diacritics 2',
+    prefix='2 3'
+)
+"""
+
+_SEARCH_TRIGGERS = (
+    """{TABLE}_fts_insert after insert on {TABLE} begin
+    insert into {TABLE}_fts (rowid, title, summary, author)
+    values (new.rowid, new.title, new.summary, new.author);
+end""",
+    """{TABLE}_fts_delete after delete on {TABLE} begin
+    insert into {TABLE}_fts ({TABLE}_fts, rowid, title, summary, author)
+    values ('delete', old.rowid, old.title, old.summary, old.author);
+end""",
+    """{TABLE}_fts_update after update of title, summary, author on {TABLE} begin
+    insert into {TABLE}_fts ({TABLE}_fts, rowid, title, summary, author)
+    values ('delete', old.rowid, old.title, old.summary, old.author);
+    insert into {TABLE}_fts (rowid, title, summary, author)
+    values (new.rowid, new.title, new.summary, new.author);
+end""",
+)
+
+# "Tue, 02 Mar 2021 15:54:30 GMT" -> "2021-03-02 15:54:30", for the backfill
+_PUBLISHED_ISO = """printf(
+    '%s-%02d-%s %s',
+    substr(published, 13, 4),
+    (instr('JanFebMarAprMayJunJulAugSepOctNovDec', substr(published, 9, 3)) + 2) / 3,
+    substr(published, 6, 2),
+    substr(published, 18, 8)
+)"""
+
+
+def _connect(database):
+    conn = sqlite3.connect(database)
+    conn.execute("pragma journal_mode=wal")
+    return conn
+
+
+class _LazyStore(type):
+    # the connection opens on first use, importing the module touches no file
+    @property
+    def conn(cls):
+        if cls._conn is None:
+            cls._conn = _connect(cls.database)
+            cls._cursor = cls._conn.cursor()
+        return cls._conn
 
-class FeedStore(object):
+    @property
+    def cursor(cls):
+        cls.conn
+        return cls._cursor
+
+
+class FeedStore(object, metaclass=_LazyStore):
     table = settings.get("sqlite.FEED_TABLE_NAME")
+    account_table = settings.get("sqlite.ACCOUNT_TABLE_NAME")
     database = settings.get("sqlite.LOCAL_SQLITE_DB")
 
-    conn = sqlite3.connect(database)
-    cursor = conn.cursor()
+    _conn = None
+    _cursor = None
+    depth = 0  # nesting level of transaction()
+
+
+def connect(database):
+    # switch the store to another sqlite file, opened on first use
+    if FeedStore._conn is not None:
+        FeedStore._conn.close()
+    FeedStore.database = database
+    FeedStore._conn = None
+    FeedStore._cursor = None
+
 
-    def __del__(self):
-        self.conn.commit()
-        self.conn.close()
+@contextmanager
+def transaction():
+    # group writes in one transaction, commit once on exit
+    FeedStore.depth += 1
+    try:
+        yield FeedStore.conn
+    except BaseException:
+        FeedStore.depth -= 1
+        if not FeedStore.depth:
+            FeedStore.conn.rollback()
+        raise
+    else:
+        FeedStore.depth -= 1
+        _commit()
+
+
+def _commit():
+    if not FeedStore.depth:
+        FeedStore.conn.commit()
 
 
 def create_table():
-    sql = f"create table if not exists {_FEED_TABLE_SCHEMA}"
-    FeedStore.cursor.execute(sql)
+    for schema in (_FEED_TABLE_SCHEMA, _ACCOUNT_TABLE_SCHEMA):
+        sql = f"create table if not exists {schema}"
+        FeedStore.cursor.execute(sql)
+    for schema in (_SIGNATURE_TABLE_SCHEMA, _BAND_TABLE_SCHEMA):
+        sql = "create table if not exists " + schema.format(TABLE=FeedStore.table)
+        FeedStore.cursor.execute(sql)
+    sql = "create index if not exists {TABLE}_seen on {TABLE}_signatures (seen)"
+    FeedStore.cursor.execute(sql.format(TABLE=FeedStore.table))
+
+    sql = "select 1 from sqlite_master where name = ?"
+    if not FeedStore.cursor.execute(sql, (f"{FeedStore.table}_link",)).fetchone():
+        # older stores were deduplicated by title, drop repeated links once
+        sql = f"""delete from {FeedStore.table} where rowid not in (
+            select min(rowid) from {FeedStore.table} group by link
+        )"""
+        FeedStore.cursor.execute(sql)
+        sql = "create unique index {TABLE}_link on {TABLE} (link)".format(
+            TABLE=FeedStore.table
+        )
+        FeedStore.cursor.execute(sql)
+    _add_published_at()
+    _add_account()
+    # search filters narrow matches through these instead of joining all
+    for name, columns in (
+        ("published_at", "published_at"),
+        ("account", "account, published_at"),
+    ):
+        sql = "create index if not exists {TABLE}_{NAME} on {TABLE} ({COLUMNS})"
+        FeedStore.cursor.execute(
+            sql.format(TABLE=FeedStore.table, NAME=name, COLUMNS=columns)
+        )
+    create_search_index()
     FeedStore.conn.commit()
 
 
-def insert_feed(feed):
-    # insert row to sqlite db
-    columns = ", ".join(f'"{col}"' for col in feed.keys())
-    values = ", ".join(f'"{val}"' for val in feed.values())
-    data = '"{TABLE}" ({COLUMN}) values ({VALUE})'.format(
-        TABLE=FeedStore.table, COLUMN=columns, VALUE=values
+def _add_published_at():
+    # stores archived before published_at existed, parse the RFC 822 dates
+    sql = f"pragma table_info({FeedStore.table})"
+    columns = [row[1] for row in FeedStore.cursor.execute(sql)]
+    if "published_at" in columns:
+        return
+    FeedStore.cursor.execute(
+        f"alter table {FeedStore.table} add column published_at integer"
+    )
+    FeedStore.cursor.execute(
+        f"update {FeedStore.table} set published_at = "
+        f"cast(strftime('%s', {_PUBLISHED_ISO}) as integer)"
+    )
+
+
+def _add_account():
+    # stores archived before account existed: tweets of an account link
+    # to it, so does a retweet of it, "RT <author>: ..."; the retweets an
+    # account made share the author name of its tweets
+    sql = f"pragma table_info({FeedStore.table})"
+    columns = [row[1] for row in FeedStore.cursor.execute(sql)]
+    if "account" in columns:
+        return
+    FeedStore.cursor.execute(
+        f"alter table {FeedStore.table} add column account varchar(64)"
+    )
+    sql = f"select rowid, author, title, link from {FeedStore.table}"
+    rows = FeedStore.cursor.execute(sql).fetchall()
+    accounts = {}
+    for _, author, title, link in rows:
+        retweet = _REGEX_RETWEET.match(title)
+        if retweet:
+            accounts.setdefault(retweet.group(1), _account_of(link))
+        else:
+            accounts[author] = _account_of(link)
+    updates = []
+    for rowid, author, title, link in rows:
+        retweet = _REGEX_RETWEET.match(title)
+        account = accounts.get(author) if retweet else _account_of(link)
+        updates.append((account, rowid))
+    sql = f"update {FeedStore.table} set account = ? where rowid = ?"
+    FeedStore.cursor.executemany(sql, updates)
+
+
+def _account_of(link):
+    match = _REGEX_ACCOUNT.match(link)
+    return match.group(1).lower() if match else None
+
+
+def _published_at(published):
+    try:
+        return int(parsedate_to_datetime(published).timestamp())
+    except (TypeError, ValueError):
+        return None
+
+
+def create_search_index():
+    """Create the full-text index and its triggers, index existing feeds."""
+    sql = "select 1 from sqlite_master where name = ?"
+    indexed = FeedStore.cursor.execute(sql, (f"{FeedStore.table}_fts",)).fetchone()
+
+    FeedStore.cursor.execute(
+        "create virtual table if not exists "
+        + _SEARCH_SCHEMA.format(TABLE=FeedStore.table)
     )
+    for trigger in _SEARCH_TRIGGERS:
+        FeedStore.cursor.execute(
+            "create trigger if not exists " + trigger.format(TABLE=FeedStore.table)
+        )
+    if not indexed:
+        # stores archived before the index existed
+        rebuild_search_index()
+    _commit()
+
 
-    sql = f"insert into {data}"
+def rebuild_search_index():
+    """Reindex every archived feed, e.g. after a VACUUM renumbered rows."""
+    sql = "insert into {TABLE}_fts ({TABLE}_fts) values ('rebuild')".format(
+        TABLE=FeedStore.table
+    )
     FeedStore.cursor.execute(sql)
-    FeedStore.conn.commit()
+    _commit()
 
 
-def check_exists(feed):
-    # check row exists in sqlite db
-    sql = 'select exists(select 1 from {TABLE} where title="{TITLE}")'.format(
-        TABLE=FeedStore.table, TITLE=feed["title"].replace('"', '""')
+def search_feeds(
+    query,
+    account=None,
+    since=None,
+    until=None,
+    limit=20,
+    offset=0,
+    candidates=10000,
+    marks=("", ""),
+):
+    """Full-text search archived feeds, best match first.
+
+    query is an FTS5 expression over titles and summaries; account is the
+    handle a feed was fetched from, as in the subscribe list; since and
+    until are unix time bounds of the published time. Only the newest
+    candidates matches are ranked and counted (None ranks all), so common
+    terms stay fast. Return (total matches, feeds), the total stops at
+    candidates + 1; every feed also has a "highlight" of its title with
+    matched terms between marks.
+    """
+    match = f"{{title summary}} : ({query})"
+    where = ["{TABLE}_fts match ?"]
+    params = [match]
+    filters = []
+    if account is not None:
+        filters.append("account = ?")
+        params.append(account.lower())
+    if since is not None:
+        filters.append("published_at >= ?")
+        params.append(since)
+    if until is not None:
+        filters.append("published_at < ?")
+        params.append(until)
+    if filters:
+        # the feed indexes pick the rows once, matches are probed against
+        # them; without the + sqlite looks every row up in the index
+        where.append(
+            "+{TABLE}_fts.rowid in (select rowid from {TABLE} where %s)"
+            % " and ".join(filters)
+        )
+    where = " and ".join(where).format(TABLE=FeedStore.table)
+
+    # one scan of the newest matches counts them and scores them,
+    # bm25 weights: title, summary, author (not part of the match)
+    sql = """select rowid, bm25({TABLE}_fts, 1.0, 1.0, 0.0) from {TABLE}_fts
+        where {WHERE} order by rowid desc limit ?""".format(
+        TABLE=FeedStore.table, WHERE=where
+    )
+    count = -1 if candidates is None else candidates + 1
+    scores = FeedStore.cursor.execute(sql, [*params, count]).fetchall()
+    total = len(scores)
+    ranked = heapq.nsmallest(
+        offset + limit, scores[:candidates], key=lambda row: (row[1], -row[0])
+    )
+    rowids = [row[0] for row in ranked[offset:]]
+    if not rowids:
+        return total, []
+
+    sql = """select {TABLE}_fts.rowid, {COLUMN}, highlight({TABLE}_fts, 0, ?, ?)
+        from {TABLE}_fts join {TABLE} t on t.rowid = {TABLE}_fts.rowid
+        where {TABLE}_fts match ? and {TABLE}_fts.rowid in ({VALUE})""".format(
+        TABLE=FeedStore.table,
+        COLUMN=", ".join(f"t.{col}" for col in _FEED_COLUMNS),
+        VALUE=", ".join("?" for _ in rowids),
     )
+    FeedStore.cursor.execute(sql, [*marks, match, *rowids])
+    feeds = {
+        row[0]: dict(zip(_FEED_COLUMNS, row[1:]), highlight=row[-1])
+        for row in FeedStore.cursor
+    }
+    return total, [feeds[rowid] for rowid in rowids]
 
+
+def get_account_states(users):
+    # fetch state of each user, unknown users get a fresh state
+    sql = "select {COLUMN} from {TABLE}".format(
+        COLUMN=", ".join(_ACCOUNT_COLUMNS), TABLE=FeedStore.account_table
+    )
     FeedStore.cursor.execute(sql)
-    FeedStore.conn.commit()
-    return True if FeedStore.cursor.fetchone()[0] else False
+    states = {row[0]: dict(zip(_ACCOUNT_COLUMNS, row)) for row in FeedStore.cursor}
+
+    default = dict.fromkeys(_ACCOUNT_COLUMNS)
+    default.update(failures=0, next_fetch=0)
+    return [states.get(user, dict(default, user=user)) for user in users]
+
+
+def update_account_state(state):
+    sql = "insert or replace into {TABLE} ({COLUMN}) values ({VALUE})".format(
+        TABLE=FeedStore.account_table,
+        COLUMN=", ".join(_ACCOUNT_COLUMNS),
+        VALUE=", ".join("?" for _ in _ACCOUNT_COLUMNS),
+    )
+    FeedStore.cursor.execute(sql, [state[col] for col in _ACCOUNT_COLUMNS])
+    _commit()
+
+
+def _existing_links(links):
+    existing = set()
+    for i in range(0, len(links), _MAX_VARIABLES):
+        chunk = links[i : i + _MAX_VARIABLES]
+        sql = "select link from {TABLE} where link in ({VALUE})".format(
+            TABLE=FeedStore.table, VALUE=", ".join("?" for _ in chunk)
+        )
+        FeedStore.cursor.execute(sql, chunk)
+        existing.update(row[0] for row in FeedStore.cursor)
+    return existing
+
+
+def insert_feeds(feeds, account=None):
+    # bulk insert feeds of the account they were fetched from, return
+    # those not archived before; without one, the account of each link
+    existing = _existing_links([feed["link"] for feed in feeds])
+
+    new_feeds = []
+    for feed in feeds:
+        if feed["link"] not in existing:
+            existing.add(feed["link"])
+            new_feeds.append(feed)
+
+    sql = "insert or ignore into {TABLE} ({COLUMN}) values ({VALUE})".format(
+        TABLE=FeedStore.table,
+        COLUMN=", ".join(_STORED_FEED_COLUMNS),
+        VALUE=", ".join("?" for _ in _STORED_FEED_COLUMNS),
+    )
+    FeedStore.cursor.executemany(
+        sql,
+        (
+            [feed[col] for col in _FEED_COLUMNS]
+            + [
+                _published_at(feed["published"]),
+                account.lower() if account else _account_of(feed["link"]),
+            ]
+            for feed in new_feeds
+        ),
+    )
+    _commit()
+    return new_feeds
+
+
+def find_signatures(keys):
+    """Return (link, duplicate_of, signature) of feeds sharing any band key."""
+    sql = """select s.link, s.duplicate_of, s.signature from {TABLE}_signatures s
+        where s.link in (
+            select link from {TABLE}_bands where {WHERE}
+        )""".format(
+        TABLE=FeedStore.table,
+        WHERE=" or ".join("(band = ? and key = ?)" for _ in keys),
+    )
+    params = [value for band, key in enumerate(keys) for value in (band, key)]
+    return FeedStore.cursor.execute(sql, params).fetchall()
+
+
+def insert_signature(link, signature, keys, duplicate_of=None):
+    sql = "insert or replace into {TABLE}_signatures values (?, ?, ?, ?)".format(
+        TABLE=FeedStore.table
+    )
+    FeedStore.cursor.execute(sql, (link, signature, duplicate_of, time.time()))
+    sql = "insert or ignore into {TABLE}_bands values (?, ?, ?)".format(
+        TABLE=FeedStore.table
+    )
+    FeedStore.cursor.executemany(
+        sql, ((band, key, link) for band, key in enumerate(keys))
+    )
+    _commit()
+
+
+def prune_signatures(before):
+    """Forget signatures recorded before the given unix time."""
+    sql = """delete from {TABLE}_bands where link in (
+        select link from {TABLE}_signatures where seen < ?
+    )""".format(TABLE=FeedStore.table)
+    FeedStore.cursor.execute(sql, (before,))
+    sql = "delete from {TABLE}_signatures where seen < ?".format(TABLE=FeedStore.table)
+    FeedStore.cursor.execute(sql, (before,))
+    _commit()
+
+
+def insert_feed(feed):
+    # insert row to sqlite db
+    insert_feeds([feed])
+
+
+def check_exists(feed):
+    # check row exists in sqlite db
+    return bool(_existing_links([feed["link"]]))
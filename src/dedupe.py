@@ -0,0 +1,112 @@
+"""Near-duplicate feeds: MinHash signatures of word shingles, LSH bands.
+
+A signature keeps the minimum of every hash permutation over the word
+3-grams of a text, so two signatures agree on about Jaccard(a, b) of
+their values. Signatures are cut into bands, texts sharing any band are
+candidates, and a candidate is a duplicate when its signatures agree on
+at least `threshold` of the values. With 16 bands of 4 rows a pair of
+Jaccard 0.5 is a candidate about 64% of the time, 0.7 about 99%.
+
+Signatures and bands live in the feed store, so a retweet is caught
+against what earlier runs archived as well as within one run.
+"""
+import re
+import time
+import zlib
+
+import numpy as np
+
+from src import database
+
+PERMUTATIONS = 64
+BANDS = 16
+ROWS = PERMUTATIONS // BANDS
+SHINGLE = 3
+
+# (a * x + b) mod p of 32 bit hashes stays below 2**64
+_PRIME = np.uint64(4294967291)
+_rng = np.random.RandomState(1)
+_A = _rng.randint(1, 2 ** 32 - 5, PERMUTATIONS, dtype=np.uint64)
+_B = _rng.randint(0, 2 ** 32 - 5, PERMUTATIONS, dtype=np.uint64)
+
+# titles read "RT Fuzzing Labs: ...", the text "RT\u2002Fuzzing Labs..."
+_REGEX_RETWEET = re.compile(r"RT\s+([^:]{1,64}):")
+_REGEX_RT = re.compile(r"RT\s+")
+_REGEX_URL = re.compile(r"https?://\S+")
+_REGEX_WORD = re.compile(r"\w+")
+
+
+def _content(feed, text):
+    """Drop the retweeted account, it names who posted, not what was said."""
+    retweet = _REGEX_RETWEET.match(feed["title"])
+    rt = _REGEX_RT.match(text)
+    if retweet and rt and text.startswith(retweet.group(1), rt.end()):
+        return text[rt.end() + len(retweet.group(1)) :]
+    return text
+
+
+def shingles(text):
+    """Return the set of word 3-grams of a text, the words when shorter."""
+    text = _REGEX_URL.sub(" ", text).lower()
+    words = _REGEX_WORD.findall(text)
+    if len(words) < SHINGLE:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i : i + SHINGLE]) for i in range(len(words) - SHINGLE + 1)}
+
+
+def signature(text):
+    """Return the MinHash signature of a text, None when it has no words."""
+    grams = shingles(text)
+    if not grams:
+        return None
+    hashes = np.fromiter(
+        (zlib.crc32(gram.encode("utf-8")) for gram in grams), np.uint64, len(grams)
+    )
+    values = (np.outer(hashes, _A) + _B) % _PRIME
+    return values.min(axis=0).astype("<u4")
+
+
+def bands(signature):
+    """Return the LSH band keys of a signature."""
+    data = signature.tobytes()
+    size = ROWS * signature.itemsize
+    return [data[i * size : (i + 1) * size] for i in range(BANDS)]
+
+
+def similarity(a, b):
+    """Estimated Jaccard similarity of two signatures."""
+    return float(np.count_nonzero(a == b)) / len(a)
+
+
+def collapse(feeds, texts, threshold, max_age=None):
+    """Collapse near-duplicate feeds, in the order they were archived.
+
+    Every feed is compared with the signatures of the store and of the
+    feeds before it, and recorded there. Return [(feed, text, duplicates)]
+    of the feeds that are first of their kind, duplicates being the later
+    copies of this batch; copies of feeds archived before are dropped and
+    only recorded in the store. max_age (seconds) forgets older signatures.
+    """
+    if max_age:
+        database.prune_signatures(time.time() - max_age)
+
+    kept = {}
+    for feed, text in zip(feeds, texts):
+        sig = signature(_content(feed, text)) if text else None
+        if sig is None:
+            kept[feed["link"]] = (feed, text, [])
+            continue
+
+        keys = bands(sig)
+        best, score = None, threshold
+        for link, representative, data in database.find_signatures(keys):
+            similar = similarity(sig, np.frombuffer(data, "<u4"))
+            if similar >= score:
+                best, score = representative or link, similar
+
+        database.insert_signature(feed["link"], sig.tobytes(), keys, best)
+        if best is None:
+            kept[feed["link"]] = (feed, text, [])
+        elif best in kept:
+            kept[best][2].append(feed)
+    return list(kept.values())
@@ -0,0 +1,103 @@
+"""Incremental RSS / Atom parsing that stops at already seen entries."""
+from xml.etree import ElementTree
+
+import feedparser
+
+_ATOM = "{http://www.w3.org/2005/Atom}"
+_ITEM_TAGS = ("item", _ATOM + "entry")
+# bytes fed to the parser at a time, about a couple of entries
+CHUNK_SIZE = 2048
+
+
+def _rss_entry(element):
+    return {
+        "id": element.findtext("guid") or element.findtext("link"),
+        "title": element.findtext("title", ""),
+        "link": element.findtext("link", ""),
+        "summary": element.findtext("description", ""),
+        "published": element.findtext("pubDate", ""),
+        "author": element.findtext("author", ""),
+    }
+
+
+def _atom_entry(element):
+    link = element.find(_ATOM + "link")
+    link = link.get("href", "") if link is not None else ""
+    return {
+        "id": element.findtext(_ATOM + "id") or link,
+        "title": element.findtext(_ATOM + "title", ""),
+        "link": link,
+        "summary": (
+            element.findtext(_ATOM + "summary")
+            or element.findtext(_ATOM + "content", "")
+        ),
+        "published": (
+            element.findtext(_ATOM + "published")
+            or element.findtext(_ATOM + "updated", "")
+        ),
+        "author": element.findtext(f"{_ATOM}author/{_ATOM}name", ""),
+    }
+
+
+def _is_seen(entry, last_seen):
+    return last_seen is not None and last_seen in (entry["id"], entry["link"])
+
+
+def _is_seen_element(element, last_seen):
+    if last_seen is None:
+        return False
+    if element.tag == "item":
+        return last_seen in (element.findtext("guid"), element.findtext("link"))
+    link = element.find(_ATOM + "link")
+    link = link.get("href") if link is not None else None
+    return last_seen in (element.findtext(_ATOM + "id"), link)
+
+
+def _parse_all(body, last_seen):
+    """feedparser path for documents the XML parser rejects."""
+    entries = []
+    for entry in feedparser.parse(body)["entries"]:
+        entry = {
+            "id": entry.get("id") or entry.get("link", ""),
+            "title": entry.get("title", ""),
+            "link": entry.get("link", ""),
+            "summary": entry.get("summary", ""),
+            "published": entry.get("published", ""),
+            "author": entry.get("author", ""),
+        }
+        if _is_seen(entry, last_seen):
+            return {"entries": entries, "stopped": True}
+        entries.append(entry)
+    return {"entries": entries, "stopped": False}
+
+
+def parse_entries(body, last_seen=None):
+    """Parse the entries newer than last_seen, newest first.
+
+    last_seen is the guid or link of the newest entry of a previous run.
+    Feeds list entries newest first, so parsing stops at that entry and
+    the rest of the document is never read. Return a dict with "entries"
+    and "stopped", which is False if the whole feed was new.
+    """
+    entries = []
+    parser = ElementTree.XMLPullParser(events=("end",))
+    try:
+        for offset in range(0, len(body), CHUNK_SIZE):
+            parser.feed(body[offset : offset + CHUNK_SIZE])
+            for _, element in parser.read_events():
+                if element.tag not in _ITEM_TAGS:
+                    continue
+
+                # the stop check reads two fields, seen entries are never built
+                if _is_seen_element(element, last_seen):
+                    return {"entries": entries, "stopped": True}
+
+                if element.tag == "item":
+                    entries.append(_rss_entry(element))
+                else:
+                    entries.append(_atom_entry(element))
+                element.clear()
+        parser.close()
+    except ElementTree.ParseError:
+        return _parse_all(body, last_seen)
+    return {"entries": entries, "stopped": False}
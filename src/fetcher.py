@@ -0,0 +1,95 @@
+"""Concurrent RSS fetching with conditional GETs and backoff."""
+import time
+import urllib.request
+from urllib.error import HTTPError
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from src import profiler
+from src.feed_parser import parse_entries
+
+HTTP_NOT_MODIFIED = 304
+USER_AGENT = "security-feeds-butler"
+
+
+def fetch_feed(url, etag=None, modified=None, timeout=15):
+    """Conditional GET, return (status, headers, body)."""
+    headers = {"User-Agent": USER_AGENT}
+    if etag:
+        headers["If-None-Match"] = etag
+    if modified:
+        headers["If-Modified-Since"] = modified
+
+    request = urllib.request.Request(url, headers=headers)
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return response.status, response.headers, response.read()
+    except HTTPError as e:
+        if e.code == HTTP_NOT_MODIFIED:
+            return e.code, e.headers, b""
+        raise
+
+
+def fetch_account(api, state, timeout=15, incremental=True):
+    """Fetch and parse the feed of one account.
+
+    Return (state, status, headers, data, error), data is None when the
+    feed is not modified or the request failed. With incremental, parsing
+    stops at the entry last seen by the previous fetch.
+    """
+    url = api.format(user=state["user"])
+    try:
+        with profiler.stage("fetch.network"):
+            status, headers, body = fetch_feed(
+                url, state["etag"], state["modified"], timeout=timeout
+            )
+    except Exception as e:
+        profiler.count("accounts.failed")
+        return state, None, None, None, e
+
+    if status == HTTP_NOT_MODIFIED:
+        profiler.count("accounts.not_modified")
+        return state, status, headers, None, None
+
+    last_seen = state["last_seen"] if incremental else None
+    with profiler.stage("fetch.parse"):
+        data = parse_entries(body, last_seen)
+    profiler.count("bytes.fetched", len(body))
+    profiler.count("entries.parsed", len(data["entries"]))
+    return state, status, headers, data, None
+
+
+def fetch_accounts(api, states, concurrency=8, timeout=15, incremental=True):
+    """Fetch accounts in a bounded thread pool, yield results as completed."""
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = [
+            executor.submit(fetch_account, api, state, timeout, incremental)
+            for state in states
+        ]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+def is_due(state, now=None):
+    now = time.time() if now is None else now
+    return state["next_fetch"] <= now
+
+
+def next_state(state, headers, data, error, backoff_base, backoff_max, now=None):
+    """Return the account state after a fetch attempt."""
+    now = time.time() if now is None else now
+    state = dict(state)
+
+    if error is not None:
+        # exponential backoff on consecutive failures
+        state["failures"] += 1
+        delay = backoff_base * 2 ** (state["failures"] - 1)
+        state["next_fetch"] = now + min(delay, backoff_max)
+        return state
+
+    state["failures"] = 0
+    state["next_fetch"] = 0
+    state["etag"] = headers.get("ETag", state["etag"])
+    state["modified"] = headers.get("Last-Modified", state["modified"])
+    if data is not None and data["entries"]:
+        state["last_seen"] = data["entries"][0].get("link", state["last_seen"])
+    return state
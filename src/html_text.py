@@ -0,0 +1,105 @@
+"""Plain text of feed summaries, same as BeautifulSoup(html, "html.parser").text.
+
+Summaries are short runs of text, <br />, <a> and <img> tags. Those are
+stripped by one regex pass and their entity references decoded in place;
+anything the fast path is not sure to read the way html.parser does
+(comments, declarations, script, style and pre, end tags of void
+elements such as </br>, stray "<", unusual entity references) falls
+back to BeautifulSoup, so the text and the entity offsets computed on it
+never change.
+"""
+import re
+from html.entities import name2codepoint
+
+# start and end tags, quoted attribute values may hold ">"
+_REGEX_TAG = re.compile(
+    r"""<(/?)([a-zA-Z][^\t\n\r\f />\x00]*)(?:[^>"']|"[^"]*"|'[^']*')*>"""
+)
+_REGEX_REFERENCE = re.compile(r"&(?:#([0-9]{1,7})|#[xX]([0-9a-fA-F]{1,6})|(\w+));")
+# "&" that html.parser may read as the start of a reference
+_REGEX_AMBIGUOUS = re.compile(r"&[#a-zA-Z]")
+# elements whose content is raw text or keeps its whitespace
+_SPECIAL_ELEMENTS = frozenset(("script", "style", "pre", "textarea"))
+# void elements, BeautifulSoup turns whitespace around their end tags into
+# separate strings, e.g. "<br>\n </br>" reads "\n"
+_VOID_ELEMENTS = frozenset(
+    "area base basefont bgsound br col command embed frame hr image img input "
+    "isindex keygen link menuitem meta nextid param source spacer track wbr".split()
+)
+# BeautifulSoup collapses a string of only these to one "\n" or " "
+_ASCII_SPACES = "\x20\x0a\x09\x0c\x0d"
+
+
+def _decode_reference(match):
+    number, hex_number, name = match.groups()
+    if name is not None:
+        codepoint = name2codepoint.get(name)
+    else:
+        codepoint = int(number) if number is not None else int(hex_number, 16)
+        # control and windows-1252 remapped ranges are left to the fallback
+        if codepoint < 0x20 or 0x7F <= codepoint < 0xA0 or codepoint > 0x10FFFF:
+            codepoint = None
+        elif 0xD800 <= codepoint < 0xE000:
+            codepoint = None
+    if codepoint is None:
+        raise ValueError(match.group())
+    return chr(codepoint)
+
+
+def _decode_references(text):
+    if "&" not in text:
+        return text
+    try:
+        decoded = _REGEX_REFERENCE.sub(_decode_reference, text)
+    except ValueError:
+        return None
+    # references left over are not in the simple form above
+    if _REGEX_AMBIGUOUS.search(_REGEX_REFERENCE.sub("", text)):
+        return None
+    return decoded
+
+
+def strip_tags(html):
+    """Return the text of simple markup, None when it needs a real parser."""
+    chunks = []
+    position = 0
+    for m in _REGEX_TAG.finditer(html):
+        name = m.group(2).lower()
+        if name in _SPECIAL_ELEMENTS or (m.group(1) and name in _VOID_ELEMENTS):
+            return None
+        chunks.append(html[position : m.start()])
+        position = m.end()
+    chunks.append(html[position:])
+
+    texts = []
+    for chunk in chunks:
+        if "<" in chunk:
+            return None
+        text = _decode_references(chunk)
+        if text is None:
+            return None
+        if text and not text.strip(_ASCII_SPACES):
+            text = "\n" if "\n" in text else " "
+        texts.append(text)
+    return "".join(texts)
+
+
+def parse_text(html):
+    """BeautifulSoup path, for markup strip_tags gives up on."""
+    from bs4 import BeautifulSoup
+
+    return BeautifulSoup(html, "html.parser").text
+
+
+def html_to_text(html):
+    text = strip_tags(html)
+    return parse_text(html) if text is None else text
+
+
+def html_to_texts(summaries):
+    """Return the text of every summary, in order."""
+    texts = []
+    for html in summaries:
+        text = strip_tags(html)
+        texts.append(parse_text(html) if text is None else text)
+    return texts
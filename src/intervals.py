@@ -0,0 +1,70 @@
+"""Sorted [start, stop, label] spans with logarithmic lookups."""
+from bisect import bisect_left, bisect_right
+
+_INF = float("inf")
+
+
+class IntervalSet(object):
+    """Spans kept sorted by (start, stop).
+
+    A span touching [start, stop] starts at start - max_length or later,
+    so lookups bisect to that window instead of scanning every span.
+    version changes on every edit, for caches built from the spans.
+    """
+
+    def __init__(self, spans=()):
+        self.spans = sorted((list(span) for span in spans), key=lambda x: x[:2])
+        self.keys = [(span[0], span[1]) for span in self.spans]
+        self.max_length = max((stop - start for start, stop in self.keys), default=0)
+        self.version = 0
+
+    def __len__(self):
+        return len(self.spans)
+
+    def __iter__(self):
+        return iter(self.spans)
+
+    def __contains__(self, span):
+        return self._position(span) is not None
+
+    def _position(self, span):
+        key = (span[0], span[1])
+        i = bisect_left(self.keys, key)
+        while i < len(self.keys) and self.keys[i] == key:
+            if self.spans[i] == list(span):
+                return i
+            i += 1
+        return None
+
+    def add(self, span):
+        """Add span unless present, return whether it was added."""
+        if span in self:
+            return False
+        key = (span[0], span[1])
+        i = bisect_right(self.keys, key)
+        self.spans.insert(i, list(span))
+        self.keys.insert(i, key)
+        self.max_length = max(self.max_length, span[1] - span[0])
+        self.version += 1
+        return True
+
+    def remove(self, span):
+        i = self._position(span)
+        if i is None:
+            raise ValueError(f"{span} not in spans")
+        del self.spans[i]
+        del self.keys[i]
+        self.version += 1
+
+    def window(self, start, stop):
+        """Return the spans starting in [start - max_length, stop], in order."""
+        lo = bisect_left(self.keys, (start - self.max_length,))
+        hi = bisect_right(self.keys, (stop, _INF))
+        return self.spans[lo:hi]
+
+    def insert_position(self, start):
+        """Index a span starting at start would get after the equal starts."""
+        return bisect_right(self.keys, (start, _INF))
+
+    def tolist(self):
+        return [list(span) for span in self.spans]
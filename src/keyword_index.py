@@ -0,0 +1,397 @@
+"""Compiled keyword index shared by the rss report and the annotator.
+
+Layout of the index file, little endian:
+
+    header   magic b"KWIX", format version u32, generation u64,
+             count u64, next id u64
+    offsets  u64[count + 1], byte offsets of the keywords in the blob
+    table    u32[size], open addressing hash table of position + 1,
+             crc32 keyed, linear probing, size the power of two >= 2 * count
+    ids      u32[count]
+    hits     u32[count]
+    sources  u8[count]
+    blob     utf-8 keywords sorted by bytes, separated by newlines
+
+The file is mapped read-only; a lookup hashes the keyword and compares
+the bytes of one or two slots, nothing is decoded until a keyword list
+or a matcher is asked for. Edits
+live in memory until save() rewrites the file and bumps its generation;
+it holds a lock file and replays the edits on the generation on disk, so
+processes saving in turn keep each other's keywords and hits.
+"""
+import os
+import mmap
+import zlib
+import fcntl
+import struct
+
+from contextlib import contextmanager
+from operator import itemgetter
+
+import numpy as np
+
+from src import settings
+from src.matcher import KeywordMatcher
+
+MAGIC = b"KWIX"
+FORMAT_VERSION = 1
+_HEADER = struct.Struct("<4sIQQQ")
+
+SOURCE_EXTRACTION = 0
+SOURCE_ANNOTATION = 1
+SOURCES = {"extraction": SOURCE_EXTRACTION, "annotation": SOURCE_ANNOTATION}
+
+
+def _table_size(count):
+    return 1 << max(3, (2 * count - 1).bit_length())
+
+
+def _build_table(keys):
+    size = _table_size(len(keys))
+    mask = size - 1
+    table = [0] * size
+    for position, key in enumerate(keys, 1):
+        slot = zlib.crc32(key) & mask
+        while table[slot]:
+            slot = (slot + 1) & mask
+        table[slot] = position
+    return np.array(table, dtype=np.uint32)
+
+
+@contextmanager
+def _locked(path):
+    # one writer at a time, from reading the file to replacing it
+    with open(f"{path}.lock", "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+class KeywordIndex(object):
+    """Keywords with their id, hit count and source."""
+
+    def __init__(self, path=None):
+        self.path = path
+        self._reset()
+        if path is not None and os.path.exists(path):
+            self._load(path)
+
+    def _reset(self):
+        self.generation = 0
+        self.next_id = 0
+
+        self._count = 0
+        self._mmap = None
+        self._blob_start = 0
+        self._offsets = memoryview(bytes(8)).cast("Q")
+        self._table = memoryview(bytes(4 * _table_size(0))).cast("I")
+        self._ids = np.zeros(0, dtype=np.uint32)
+        self._hits = np.zeros(0, dtype=np.uint32)
+        self._sources = np.zeros(0, dtype=np.uint8)
+
+        self._added = {}  # keyword -> [id, hits, source]
+        self._removed = set()
+        self._hit_counts = {}  # base position -> hits since loaded
+        self._matcher = None
+
+    def _load(self, path):
+        with open(path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            if size < _HEADER.size:
+                raise ValueError(f"{path} is not a keyword index")
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, generation, count, next_id = _HEADER.unpack_from(buffer)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            buffer.close()
+            raise ValueError(f"{path} is not a keyword index of version {FORMAT_VERSION}")
+
+        offset = _HEADER.size
+        # a memoryview indexes to python ints, much faster than numpy scalars
+        self._offsets = memoryview(buffer)[offset : offset + 8 * (count + 1)].cast("Q")
+        offset += 8 * (count + 1)
+        size = _table_size(count)
+        self._table = memoryview(buffer)[offset : offset + 4 * size].cast("I")
+        offset += 4 * size
+        self._ids = np.frombuffer(buffer, np.uint32, count, offset)
+        offset += self._ids.nbytes
+        self._hits = np.frombuffer(buffer, np.uint32, count, offset)
+        offset += self._hits.nbytes
+        self._sources = np.frombuffer(buffer, np.uint8, count, offset)
+        offset += self._sources.nbytes
+
+        self._mmap = buffer
+        self._blob_start = offset
+        self._count = count
+        self.generation = generation
+        self.next_id = next_id
+
+    def _base_keyword(self, position):
+        start = self._blob_start + self._offsets[position]
+        stop = self._blob_start + self._offsets[position + 1] - 1
+        return self._mmap[start:stop]
+
+    def _base_keywords(self):
+        """Return the utf-8 keywords of the file."""
+        if not self._count:
+            return []
+        stop = self._blob_start + self._offsets[self._count] - 1
+        return self._mmap[self._blob_start : stop].split(b"\n")
+
+    def _find(self, keyword):
+        """Return the position of keyword in the file, or -1."""
+        if not self._count:
+            return -1
+
+        key = keyword.encode("utf-8")
+        table = self._table
+        mask = len(table) - 1
+        slot = zlib.crc32(key) & mask
+        while table[slot]:
+            position = table[slot] - 1
+            if self._base_keyword(position) == key:
+                return position
+            slot = (slot + 1) & mask
+        return -1
+
+    def __contains__(self, keyword):
+        return self.lookup(keyword) is not None
+
+    def __len__(self):
+        return self._count - len(self._removed) + len(self._added)
+
+    def __iter__(self):
+        return iter(self.keywords())
+
+    def lookup(self, keyword):
+        """Return (id, hits, source) of keyword, or None."""
+        if keyword in self._added:
+            return tuple(self._added[keyword])
+        if keyword in self._removed:
+            return None
+
+        position = self._find(keyword)
+        if position < 0:
+            return None
+        hits = int(self._hits[position]) + self._hit_counts.get(position, 0)
+        return int(self._ids[position]), hits, int(self._sources[position])
+
+    def keywords(self):
+        """Return every keyword, sorted."""
+        keywords = []
+        if self._count:
+            stop = self._blob_start + self._offsets[self._count] - 1
+            keywords = self._mmap[self._blob_start : stop].decode("utf-8").split("\n")
+        if self._removed:
+            keywords = [keyword for keyword in keywords if keyword not in self._removed]
+        if self._added:
+            keywords = sorted(
+                keywords + list(self._added), key=lambda x: x.encode("utf-8")
+            )
+        return keywords
+
+    def add(self, keyword, source=SOURCE_EXTRACTION):
+        self.update([keyword], source)
+
+    def update(self, keywords, source=SOURCE_EXTRACTION):
+        """Add keywords not in the index yet, new ids follow their order."""
+        keywords = dict.fromkeys(keyword.strip() for keyword in keywords)
+        keywords.pop("", None)
+        for keyword in keywords:
+            if keyword in self._added:
+                continue
+
+            if keyword in self._removed:
+                # back to the row of the file, with its id and hits
+                self._removed.discard(keyword)
+            elif self._find(keyword) < 0:
+                self._added[keyword] = [self.next_id, 0, source]
+                self.next_id += 1
+            else:
+                continue
+
+            if self._matcher is not None:
+                self._matcher.add(keyword)
+
+    def remove(self, keyword):
+        keyword = keyword.strip()
+        if self._added.pop(keyword, None) is None:
+            if keyword in self._removed or self._find(keyword) < 0:
+                return
+            self._removed.add(keyword)
+
+        if self._matcher is not None:
+            self._matcher.remove(keyword)
+
+    def hit(self, keyword, count=1):
+        """Add count to the hits of keyword."""
+        if keyword in self._added:
+            self._added[keyword][1] += count
+            return
+        if keyword in self._removed:
+            return
+
+        position = self._find(keyword)
+        if position >= 0:
+            self._hit_counts[position] = self._hit_counts.get(position, 0) + count
+
+    def sync(self, keywords, source=SOURCE_EXTRACTION):
+        """Make the index hold exactly keywords, keeping known entries."""
+        keywords = set(keyword.strip() for keyword in keywords) - {""}
+        current = set(self.keywords())
+        for keyword in current - keywords:
+            self.remove(keyword)
+        self.update(sorted(keywords - current), source)
+
+    @property
+    def dirty(self):
+        return bool(self._added or self._removed or self._hit_counts)
+
+    def reload(self):
+        """Reopen the file if another process saved a newer generation."""
+        if self.dirty or self.path is None or not os.path.exists(self.path):
+            return
+        with open(self.path, "rb") as f:
+            header = f.read(_HEADER.size)
+        if len(header) == _HEADER.size and _HEADER.unpack(header)[2] != self.generation:
+            self.close()
+            self._reset()
+            self._load(self.path)
+
+    def get_matcher(self):
+        """Return a matcher over the keywords, kept in step with edits.
+
+        A matcher built for an older generation of the file is rebuilt.
+        """
+        self.reload()
+        if self._matcher is None or self._matcher.generation != self.generation:
+            self._matcher = KeywordMatcher(self.keywords(), generation=self.generation)
+        return self._matcher
+
+    def save(self, path=None):
+        """Write the index atomically and bump its generation.
+
+        Saving to its own file replays the edits of this index on the
+        generation on disk, which another process may have saved since
+        this one was loaded.
+        """
+        path = path or self.path
+        with _locked(path):
+            merged = self
+            if path == self.path and os.path.exists(path):
+                merged = KeywordIndex(path)
+                if merged.generation == self.generation:
+                    merged.close()
+                    merged = self
+                else:
+                    self._replay(merged)
+            merged._write(path)
+            if merged is not self:
+                merged.close()
+
+        # the matcher holds the edits, carry it over unless others saved some
+        matcher = self._matcher if merged is self else None
+        self.close()
+        self.path = path
+        self._reset()
+        self._load(path)
+        if matcher is not None:
+            matcher.generation = self.generation
+            self._matcher = matcher
+
+    def _replay(self, index):
+        """Apply the edits of this index to another one."""
+        for keyword in self._removed:
+            index.remove(keyword)
+        for keyword, (_, hits, source) in self._added.items():
+            index.add(keyword, source)
+            index.hit(keyword, hits)
+        for position, count in self._hit_counts.items():
+            index.hit(self._base_keyword(position).decode("utf-8"), count)
+
+    def _write(self, path):
+        hits = self._hits.astype(np.int64)
+        for position, count in self._hit_counts.items():
+            hits[position] += count
+        rows = zip(
+            self._base_keywords(),
+            self._ids.tolist(),
+            hits.tolist(),
+            self._sources.tolist(),
+        )
+        if self._removed:
+            removed = set(keyword.encode("utf-8") for keyword in self._removed)
+            rows = (row for row in rows if row[0] not in removed)
+        rows = list(rows)
+        if self._added:
+            rows += [
+                (keyword.encode("utf-8"), id_, count, source)
+                for keyword, (id_, count, source) in self._added.items()
+            ]
+            rows.sort(key=itemgetter(0))
+
+        count = len(rows)
+        keys, ids, hits, sources = zip(*rows) if rows else ((), (), (), ())
+        offsets = np.zeros(count + 1, dtype=np.uint64)
+        np.cumsum([len(key) + 1 for key in keys], out=offsets[1:])
+        generation = self.generation + 1
+
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(
+                _HEADER.pack(MAGIC, FORMAT_VERSION, generation, count, self.next_id)
+            )
+            f.write(offsets.tobytes())
+            f.write(_build_table(keys).tobytes())
+            f.write(np.array(ids, dtype=np.uint32).tobytes())
+            f.write(np.array(hits, dtype=np.uint32).tobytes())
+            f.write(np.array(sources, dtype=np.uint8).tobytes())
+            f.write(b"\n".join(keys) + b"\n" if keys else b"")
+        os.replace(tmp_path, path)
+
+    def export(self, path):
+        """Write the keywords as a text file, one per line."""
+        with open(path, "w") as f:
+            for keyword in self.keywords():
+                f.write(keyword + "\n")
+
+    def close(self):
+        if self._mmap is None:
+            return
+        self._ids = self._hits = self._sources = None
+        self._offsets.release()
+        self._table.release()
+        self._offsets = self._table = None
+        self._mmap.close()
+        self._mmap = None
+
+
+def load_keyword_index(index_file, keywords_file=None):
+    """Open the index, (re)compiling it from the text file when stale.
+
+    The text file wins when it is newer than the index or the index has
+    another format version; hits and ids of kept keywords survive.
+    """
+    try:
+        index = KeywordIndex(index_file)
+    except ValueError:
+        os.remove(index_file)
+        index = KeywordIndex(index_file)
+
+    if keywords_file is not None and os.path.exists(keywords_file):
+        index_mtime = os.path.getmtime(index_file) if os.path.exists(index_file) else 0
+        if os.path.getmtime(keywords_file) > index_mtime:
+            with open(keywords_file) as f:
+                index.sync(f)
+            index.save()
+    return index
+
+
+def load_features_index():
+    """Open the configured features index (data.FEATURES_INDEX)."""
+    return load_keyword_index(
+        settings.get_str("data.FEATURES_INDEX", "assets/features.idx"),
+        settings.get_str("data.FEATURES", "assets/features.txt"),
+    )
@@ -0,0 +1,107 @@
+"""Multi-pattern keyword matcher."""
+import re
+from collections import Counter
+
+# runs of non-space chars, keywords are matched inside and across them
+_REGEX_TOKEN = re.compile(r"\S+")
+# positions inside a token where a keyword may start / stop
+_REGEX_INNER_START = re.compile(r"(?<=\W)\S")
+_REGEX_INNER_STOP = re.compile(r"(?<=\S)(?=\W)")
+# positions in the text where a keyword may stop
+_REGEX_WORD_STOP = re.compile(r"(?<=\S)(?!\w)")
+
+
+class KeywordMatcher(object):
+    """Find every keyword occurrence in a single pass over the text.
+
+    Keywords are matched literally and only on word boundaries, they may
+    contain punctuation and spaces. The text is scanned once token by
+    token (runs of non-space chars): a token is looked up whole in the
+    keyword set and only tokens with punctuation are split at their inner
+    word boundaries. Multi-word keywords are reached through the set of
+    their first tokens. Adding or removing a keyword is a set operation,
+    so building the matcher costs no more than building a set.
+    """
+
+    def __init__(self, keywords=(), generation=None):
+        self.keywords = set(keyword.strip() for keyword in keywords)
+        self.keywords.discard("")
+        self.heads = Counter()  # first token of multi-word keywords
+        self.max_length = 0  # longest multi-word keyword
+        self.generation = generation  # version of the source keyword index
+
+        for keyword in self.keywords:
+            head, *tail = keyword.split(maxsplit=1) if " " in keyword else (keyword,)
+            if tail:
+                self.heads[head] += 1
+                self.max_length = max(self.max_length, len(keyword))
+
+    def __len__(self):
+        return len(self.keywords)
+
+    def __contains__(self, keyword):
+        return keyword in self.keywords
+
+    def add(self, keyword):
+        keyword = keyword.strip()
+        if not keyword or keyword in self.keywords:
+            return
+
+        self.keywords.add(keyword)
+        head, *tail = keyword.split(maxsplit=1)
+        if tail:
+            self.heads[head] += 1
+            self.max_length = max(self.max_length, len(keyword))
+
+    def remove(self, keyword):
+        keyword = keyword.strip()
+        if keyword not in self.keywords:
+            return
+
+        self.keywords.remove(keyword)
+        head, *tail = keyword.split(maxsplit=1)
+        if tail:
+            self.heads[head] -= 1
+            if not self.heads[head]:
+                del self.heads[head]
+
+    def _find_phrases(self, text, start, token_stop):
+        """Yield multi-word keywords starting at start."""
+        region = text[start : start + self.max_length + 1]
+        for m in _REGEX_WORD_STOP.finditer(region):
+            stop = m.start()
+            if stop <= token_stop - start:
+                continue
+            if stop > self.max_length:
+                break
+            if region[:stop] in self.keywords:
+                yield start, start + stop
+
+    def finditer(self, text):
+        """Yield (start, stop) of every keyword on word boundaries."""
+        keywords, heads = self.keywords, self.heads
+        for m in _REGEX_TOKEN.finditer(text):
+            token, offset = m.group(), m.start()
+            if token.isalnum():
+                starts, stops = (0,), (len(token),)
+            else:
+                starts = [0] + [x.start() for x in _REGEX_INNER_START.finditer(token)]
+                stops = [x.start() for x in _REGEX_INNER_STOP.finditer(token)]
+                stops.append(len(token))
+
+            for start in starts:
+                for stop in stops:
+                    if start < stop and token[start:stop] in keywords:
+                        yield offset + start, offset + stop
+
+                if heads and token[start:] in heads:
+                    yield from self._find_phrases(text, offset + start, m.end())
+
+    def findall(self, text):
+        """Return [start, stop] of every keyword occurrence, in text order."""
+        return [[start, stop] for start, stop in sorted(self.finditer(text))]
+
+
+def load_keyword_matcher(keywords_file):
+    with open(keywords_file) as f:
+        return KeywordMatcher(line.strip() for line in f)
@@ -0,0 +1,225 @@
+"""Opt-in stage timers, item counters and peak memory of a CLI run.
+
+Profiling is off unless `butler.py --profile` enables it: stage() then
+hands out one shared no-op context manager and count() returns at once,
+so instrumented code pays a global lookup per call.
+
+Stages may run in worker threads, their times add up, so the stages of
+a run can sum to more than its wall time. Forked worker processes
+record nothing.
+"""
+import os
+import sys
+import json
+import time
+import threading
+from pathlib import Path
+from datetime import datetime
+from contextlib import contextmanager, nullcontext
+
+try:
+    import resource
+except ImportError:  # not on windows
+    resource = None
+
+_NULL_STAGE = nullcontext()
+
+# the enabled Profiler, None when profiling is off
+_profiler = None
+
+
+def _peak_rss(who=None):
+    """Return the peak resident set size in bytes, None if unknown."""
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_SELF if who is None else who)
+    # kilobytes on linux, bytes on macOS
+    return usage.ru_maxrss if sys.platform == "darwin" else usage.ru_maxrss * 1024
+
+
+class Profiler(object):
+    """Accumulate stage times and counters of one command run.
+
+    With dump, every stage entered from the main thread outside another
+    profiled stage runs under cProfile, the slowest one is saved.
+    """
+
+    def __init__(self, command, directory, dump=False):
+        self.command = command
+        self.directory = Path(directory)
+        self.dump = dump
+        self.pid = os.getpid()
+        self.started = time.perf_counter()
+        # name -> {"calls", "seconds", "max_seconds", "peak_rss_bytes"}
+        self.stages = {}
+        self.counters = {}
+        self.profiles = {}  # name -> cProfile.Profile
+        self._profiling = False
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name):
+        if os.getpid() != self.pid:
+            yield
+            return
+
+        profile = None
+        if (
+            self.dump
+            and not self._profiling
+            and threading.current_thread() is threading.main_thread()
+        ):
+            import cProfile
+
+            profile = self.profiles.setdefault(name, cProfile.Profile())
+            self._profiling = True
+            profile.enable()
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            if profile is not None:
+                profile.disable()
+                self._profiling = False
+
+            peak = _peak_rss()
+            with self._lock:
+                stats = self.stages.setdefault(
+                    name,
+                    {
+                        "calls": 0,
+                        "seconds": 0.0,
+                        "max_seconds": 0.0,
+                        "peak_rss_bytes": 0,
+                    },
+                )
+                stats["calls"] += 1
+                stats["seconds"] += elapsed
+                stats["max_seconds"] = max(stats["max_seconds"], elapsed)
+                stats["peak_rss_bytes"] = max(stats["peak_rss_bytes"], peak or 0)
+
+    def count(self, name, n=1):
+        if os.getpid() != self.pid:
+            return
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def summary(self):
+        return {
+            "command": self.command,
+            "date": datetime.now().isoformat(timespec="seconds"),
+            "wall_seconds": time.perf_counter() - self.started,
+            "peak_rss_bytes": _peak_rss(),
+            "children_peak_rss_bytes": _peak_rss(
+                resource.RUSAGE_CHILDREN if resource is not None else None
+            ),
+            "stages": self.stages,
+            "counters": self.counters,
+        }
+
+    def write(self):
+        """Write the JSON and Prometheus summaries, return their paths."""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        summary = self.summary()
+        stem = "{}-{}".format(
+            self.command.replace(" ", "-") or "butler",
+            datetime.now().strftime("%Y%m%d-%H%M%S"),
+        )
+        paths = [self.directory / f"{stem}.json", self.directory / f"{stem}.prom"]
+
+        if self.dump and self.profiles:
+            slowest = max(self.profiles, key=lambda name: self.stages[name]["seconds"])
+            path = self.directory / f"{stem}-{slowest.replace(' ', '-')}.prof"
+            self.profiles[slowest].dump_stats(path)
+            summary["profiled_stage"] = slowest
+            paths.append(path)
+
+        with open(paths[0], "w") as f:
+            json.dump(summary, f, indent=2)
+        with open(paths[1], "w") as f:
+            f.write(to_prometheus(summary))
+        return paths
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def to_prometheus(summary):
+    """Render a summary in the Prometheus text exposition format."""
+    command = f'command="{_escape(summary["command"])}"'
+    lines = []
+
+    def metric(name, kind, help, samples):
+        lines.append(f"# HELP butler_{name} {help}")
+        lines.append(f"# TYPE butler_{name} {kind}")
+        for labels, value in samples:
+            lines.append(f"butler_{name}{{{','.join([command, *labels])}}} {value}")
+
+    metric(
+        "run_seconds",
+        "gauge",
+        "Wall time of the command.",
+        [([], summary["wall_seconds"])],
+    )
+    if summary["peak_rss_bytes"] is not None:
+        metric(
+            "peak_rss_bytes",
+            "gauge",
+            "Peak resident set size of the process.",
+            [([], summary["peak_rss_bytes"])],
+        )
+
+    stages = sorted(summary["stages"].items())
+    for key, name, kind, help in (
+        ("seconds", "stage_seconds_total", "counter", "Time spent in a stage."),
+        ("calls", "stage_calls_total", "counter", "Times a stage was entered."),
+        ("max_seconds", "stage_max_seconds", "gauge", "Longest call of a stage."),
+    ):
+        metric(
+            name,
+            kind,
+            help,
+            [([f'stage="{_escape(stage)}"'], stats[key]) for stage, stats in stages],
+        )
+
+    metric(
+        "items_total",
+        "counter",
+        "Items counted by the command.",
+        [
+            ([f'counter="{_escape(name)}"'], value)
+            for name, value in sorted(summary["counters"].items())
+        ],
+    )
+    return "\n".join(lines) + "\n"
+
+
+def enable(command, directory, dump=False):
+    global _profiler
+    _profiler = Profiler(command, directory, dump)
+    return _profiler
+
+
+def finish():
+    """Write the summaries of the enabled profiler and turn profiling off."""
+    global _profiler
+    profiler, _profiler = _profiler, None
+    if profiler is None:
+        return []
+    return profiler.write()
+
+
+def stage(name):
+    """Context manager timing the code of a stage."""
+    if _profiler is None:
+        return _NULL_STAGE
+    return _profiler.stage(name)
+
+
+def count(name, n=1):
+    """Add n to the named item counter."""
+    if _profiler is not None:
+        _profiler.count(name, n)
@@ -0,0 +1,288 @@
+"""Streaming report of matched feeds: JSONL plus an offset index and an edit journal.
+
+    report.jsonl          one [text, {"entities": [...]}] per line, append only;
+                          collapsed near duplicates add {"sources": [...]}
+    report.jsonl.idx      u64 end offset of every line
+    report.jsonl.journal  one {"index", "entities"} per annotation edit,
+                          {"cursor"} where the annotator stopped
+
+Entries are written and flushed one at a time, readers seek to single
+entries through the index, and edits only append to the journal, so
+neither memory nor save time grows with the report. compact() folds the
+journal back into the report; don't run it while a writer is open.
+"""
+import os
+import json
+import struct
+from array import array
+from pathlib import Path
+
+_OFFSET = struct.Struct("<Q")
+
+
+def _paths(path):
+    path = Path(path)
+    return path, Path(f"{path}.idx"), Path(f"{path}.journal")
+
+
+def _scan_line_ends(f, start):
+    """Yield the end offset of every complete line from start on."""
+    f.seek(start)
+    end = start
+    for line in f:
+        if not line.endswith(b"\n"):
+            return
+        end += len(line)
+        yield end
+
+
+def _indexed_end(data_file, index_file):
+    """Return (entries, end offset) covered by the index, (0, 0) if unusable."""
+    count = index_file.seek(0, os.SEEK_END) // _OFFSET.size
+    if not count:
+        return 0, 0
+    index_file.seek((count - 1) * _OFFSET.size)
+    (end,) = _OFFSET.unpack(index_file.read(_OFFSET.size))
+    if end > data_file.seek(0, os.SEEK_END):
+        return 0, 0
+    data_file.seek(end - 1)
+    if data_file.read(1) != b"\n":
+        return 0, 0
+    return count, end
+
+
+def _load_journal(journal_path):
+    """Return ({entry index: entities} of the latest edits, cursor)."""
+    edits, cursor = {}, 0
+    if not journal_path.exists():
+        return edits, cursor
+    with open(journal_path, "rb") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # torn line of a crashed run
+                continue
+            if "cursor" in record:
+                cursor = record["cursor"]
+            else:
+                edits[record["index"]] = record["entities"]
+    return edits, cursor
+
+
+class ReportWriter(object):
+    """Append entries to a report, each durable once append() returns.
+
+    Opening repairs what a crash left behind: a torn last line is cut
+    off and lines missing from the index are indexed.
+    """
+
+    def __init__(self, path):
+        self.path, self.index_path, _ = _paths(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._data = open(self.path, "a+b")
+        self._index = open(self.index_path, "a+b")
+
+        count, end = _indexed_end(self._data, self._index)
+        self._index.truncate(count * _OFFSET.size)
+        self._index.seek(0, os.SEEK_END)
+        for end in _scan_line_ends(self._data, end):
+            self._index.write(_OFFSET.pack(end))
+            count += 1
+        self._data.truncate(end)
+        self._data.seek(0, os.SEEK_END)
+        self._index.flush()
+
+        self.count = count
+        self.end = end
+
+    def __len__(self):
+        return self.count
+
+    def append(self, text, entities, sources=None):
+        """Write one entry, return its index.
+
+        sources are the feeds collapsed into this one as near duplicates.
+        """
+        data = {"entities": entities}
+        if sources:
+            data["sources"] = sources
+        line = json.dumps([text, data], ensure_ascii=False)
+        data = line.encode("utf-8") + b"\n"
+        self._data.write(data)
+        self._data.flush()
+        self.end += len(data)
+        self._index.write(_OFFSET.pack(self.end))
+        self._index.flush()
+        self.count += 1
+        return self.count - 1
+
+    def close(self):
+        self._data.close()
+        self._index.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class Report(object):
+    """Read entries by index, record edits and a resume cursor in the journal.
+
+    Entries appended after opening are not seen.
+    """
+
+    def __init__(self, path):
+        self.path, self.index_path, self.journal_path = _paths(path)
+        self._data = open(self.path, "rb")
+        self._index = open(self.index_path, "a+b")
+
+        count, end = _indexed_end(self._data, self._index)
+        self._ends = None
+        if end < self._data.seek(0, os.SEEK_END):
+            # stale index, maybe a writer is running: index in memory
+            self._ends = array("Q", _scan_line_ends(self._data, 0))
+            count = len(self._ends)
+        self.count = count
+
+        # entries before cursor were annotated in earlier sessions
+        self.edits, self.cursor = _load_journal(self.journal_path)
+        self._journal = None  # opened on the first edit
+
+    def __len__(self):
+        return self.count
+
+    def _end(self, i):
+        if self._ends is not None:
+            return self._ends[i]
+        self._index.seek(i * _OFFSET.size)
+        return _OFFSET.unpack(self._index.read(_OFFSET.size))[0]
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += self.count
+        if not 0 <= i < self.count:
+            raise IndexError("report index out of range")
+
+        start = self._end(i - 1) if i else 0
+        self._data.seek(start)
+        entry = json.loads(self._data.read(self._end(i) - start))
+        if i in self.edits:
+            entry[1]["entities"] = self.edits[i]
+        return entry
+
+    def __iter__(self):
+        """Yield entries in order, reading the report sequentially."""
+        for _, entry in self.entries():
+            yield entry
+
+    def entries(self, start=0):
+        """Yield (index, entry) from entry start on, reading sequentially."""
+        start = min(max(start, 0), self.count)
+        self._data.seek(self._end(start - 1) if start else 0)
+        for i, line in enumerate(self._data, start):
+            if i == self.count:
+                return
+            entry = json.loads(line)
+            if i in self.edits:
+                entry[1]["entities"] = self.edits[i]
+            yield i, entry
+
+    def _write_journal(self, record):
+        if self._journal is None:
+            self._journal = open(self.journal_path, "a+b")
+            if self._journal.seek(0, os.SEEK_END):
+                self._journal.seek(-1, os.SEEK_END)
+                if self._journal.read(1) != b"\n":
+                    # end a torn line, so the next edit starts on its own
+                    self._journal.write(b"\n")
+
+        line = json.dumps(record, ensure_ascii=False)
+        self._journal.write(line.encode("utf-8") + b"\n")
+        self._journal.flush()
+
+    def edit(self, i, entities):
+        """Replace the entities of entry i, durable once this returns."""
+        if not 0 <= i < self.count:
+            raise IndexError("report index out of range")
+        self._write_journal({"index": i, "entities": entities})
+        self.edits[i] = entities
+
+    def save_cursor(self, cursor):
+        """Record that entries before cursor are annotated."""
+        self._write_journal({"cursor": cursor})
+        self.cursor = cursor
+
+    def close(self):
+        self._data.close()
+        self._index.close()
+        if self._journal is not None:
+            self._journal.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def compact(path):
+    """Fold the journal into the report, return (entries, edits folded)."""
+    path, index_path, journal_path = _paths(path)
+    tmp_path, tmp_index_path, _ = _paths(f"{path}.tmp")
+    tmp_path.unlink(missing_ok=True)
+    tmp_index_path.unlink(missing_ok=True)
+
+    with Report(path) as report:
+        edits = len(report.edits)
+        with ReportWriter(tmp_path) as writer:
+            for text, data in report:
+                writer.append(text, data["entities"], data.get("sources"))
+        count = len(report)
+        cursor = report.cursor
+
+    # a stale index is detected and rebuilt, the journal replays idempotently
+    os.replace(tmp_index_path, index_path)
+    os.replace(tmp_path, path)
+    journal_path.unlink(missing_ok=True)
+    if cursor:
+        # entries keep their index, so does the annotator's position
+        with open(journal_path, "wb") as f:
+            f.write(json.dumps({"cursor": cursor}).encode("utf-8") + b"\n")
+    return count, edits
+
+
+def resolve_report(path):
+    """Return the .jsonl path of a report, converting a legacy .json once.
+
+    Both report.json and report.jsonl name the same report; when only the
+    .json array exists it is rewritten as report.jsonl, which is missing
+    until the conversion completes.
+    """
+    path = Path(path)
+    jsonl_path = path.with_suffix(".jsonl")
+    json_path = path.with_suffix(".json")
+    if jsonl_path.exists() or not json_path.exists():
+        return jsonl_path
+
+    with open(json_path, "r", encoding="utf-8") as f:
+        entries = json.load(f)
+    tmp_path, tmp_index_path, _ = _paths(f"{jsonl_path}.tmp")
+    tmp_path.unlink(missing_ok=True)
+    tmp_index_path.unlink(missing_ok=True)
+    with ReportWriter(tmp_path) as writer:
+        for text, data in entries:
+            writer.append(text, data["entities"])
+    os.replace(tmp_index_path, f"{jsonl_path}.idx")
+    os.replace(tmp_path, jsonl_path)
+    return jsonl_path
+
+
+def load_report(path):
+    """Open a report for reading and annotation, creating it if missing."""
+    path = resolve_report(path)
+    if not path.exists():
+        ReportWriter(path).close()
+    return Report(path)
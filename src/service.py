@@ -0,0 +1,295 @@
+"""Local HTTP service for keyword extraction and tagging.
+
+Request handler threads don't run the model themselves: they submit
+their texts to a MicroBatcher, whose single worker thread gathers the
+items arriving within max_wait into one batch for nlp.pipe and the
+block-diagonal PageRank solve.
+
+Endpoints, JSON in and out:
+    POST /analyze  {"text" | "texts", "candidate_pos", "window_size",
+                    "lower", "number"} -> {"keywords"}
+    POST /tag      {"text" | "texts", "html"} -> {"entities"[, "text"]}
+    GET  /metrics  latency percentiles, throughput and batch counters
+    GET  /health
+"""
+import json
+import time
+import queue
+import threading
+from collections import deque
+from concurrent.futures import Future
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from src import html_text
+
+_ANALYZE_DEFAULTS = {
+    "candidate_pos": ["NOUN", "PROPN"],
+    "window_size": 4,
+    "lower": False,
+    "number": 10,
+}
+
+_STOP = object()
+
+
+class MicroBatcher(object):
+    """Run function(key, items) over batches of concurrently submitted items.
+
+    A batch closes when it holds max_batch_size items or max_wait seconds
+    after its first item arrived; items are grouped by key, only items of
+    the same key share a call.
+    """
+
+    def __init__(self, function, max_batch_size=64, max_wait=0.005):
+        self.function = function
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.batches = 0
+        self.items = 0
+
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, key, items):
+        """Queue items, return one future per item."""
+        futures = []
+        for item in items:
+            future = Future()
+            self._queue.put((key, item, future))
+            futures.append(future)
+        return futures
+
+    def __call__(self, key, items, timeout=None):
+        return [future.result(timeout) for future in self.submit(key, items)]
+
+    def close(self):
+        self._queue.put(_STOP)
+        self._thread.join()
+
+    def _collect(self):
+        """Block for the first item, then gather a batch or return None."""
+        first = self._queue.get()
+        if first is _STOP:
+            return None
+
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=max(remaining, 0))
+            except queue.Empty:
+                break
+            if item is _STOP:
+                self._queue.put(_STOP)
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            if batch is None:
+                return
+
+            groups = {}
+            for key, item, future in batch:
+                groups.setdefault(key, []).append((item, future))
+
+            for key, group in groups.items():
+                self.batches += 1
+                self.items += len(group)
+                try:
+                    results = self.function(key, [item for item, _ in group])
+                    if len(results) != len(group):
+                        raise RuntimeError(
+                            f"{len(results)} results for {len(group)} items"
+                        )
+                except Exception as e:
+                    for _, future in group:
+                        future.set_exception(e)
+                    continue
+                for (_, future), result in zip(group, results):
+                    future.set_result(result)
+
+
+def _percentile(samples, q):
+    """q-quantile of sorted samples."""
+    return samples[min(len(samples) - 1, int(len(samples) * q))]
+
+
+class ServiceMetrics(object):
+    """Request counters and a window of latencies per endpoint."""
+
+    def __init__(self, window=10000):
+        self.window = window
+        self.started = time.monotonic()
+        self.requests = {}
+        self.errors = {}
+        self.latencies = {}
+        self._lock = threading.Lock()
+
+    def record(self, endpoint, seconds, error=False):
+        with self._lock:
+            self.requests[endpoint] = self.requests.get(endpoint, 0) + 1
+            if error:
+                self.errors[endpoint] = self.errors.get(endpoint, 0) + 1
+            samples = self.latencies.setdefault(endpoint, deque(maxlen=self.window))
+            samples.append((time.monotonic(), seconds))
+
+    def summary(self, batchers=None):
+        now = time.monotonic()
+        endpoints = {}
+        with self._lock:
+            for endpoint, samples in self.latencies.items():
+                latencies = sorted(seconds for _, seconds in samples)
+                # throughput over the samples still in the window
+                span = now - samples[0][0] if len(samples) > 1 else 0.0
+                endpoints[endpoint] = {
+                    "requests": self.requests[endpoint],
+                    "errors": self.errors.get(endpoint, 0),
+                    "requests_per_sec": len(samples) / span if span else 0.0,
+                    "p50_ms": _percentile(latencies, 0.5) * 1e3,
+                    "p90_ms": _percentile(latencies, 0.9) * 1e3,
+                    "p99_ms": _percentile(latencies, 0.99) * 1e3,
+                    "max_ms": latencies[-1] * 1e3,
+                }
+
+        batches = {}
+        for name, batcher in (batchers or {}).items():
+            batches[name] = {
+                "batches": batcher.batches,
+                "items": batcher.items,
+                "mean_batch_size": batcher.items / max(batcher.batches, 1),
+            }
+        return {
+            "uptime_sec": now - self.started,
+            "endpoints": endpoints,
+            "batching": batches,
+        }
+
+
+def _texts(payload):
+    if "texts" in payload:
+        return [str(text) for text in payload["texts"]], True
+    return [str(payload["text"])], False
+
+
+class AnalysisService(object):
+    """TextRank keyword extraction and keyword tagging behind batchers."""
+
+    def __init__(self, textrank, matcher, max_batch_size=64, max_wait=0.005):
+        self.textrank = textrank
+        self.matcher = matcher
+        self.metrics = ServiceMetrics()
+        self.batchers = {
+            "analyze": MicroBatcher(self._analyze_batch, max_batch_size, max_wait),
+            "tag": MicroBatcher(self._tag_batch, max_batch_size, max_wait),
+        }
+
+    def _analyze_batch(self, key, texts):
+        candidate_pos, window_size, lower, number = key
+        results = self.textrank.analyze_many(
+            texts, list(candidate_pos), window_size, lower, number
+        )
+        return [keywords for _, keywords in results]
+
+    def _tag_batch(self, html, texts):
+        if html:
+            texts = html_text.html_to_texts(texts)
+        findall = self.matcher.findall
+        return [
+            (text, [[start, stop, "KEYWORD"] for start, stop in findall(text)])
+            for text in texts
+        ]
+
+    def analyze(self, payload):
+        texts, many = _texts(payload)
+        params = dict(_ANALYZE_DEFAULTS)
+        params.update((k, payload[k]) for k in _ANALYZE_DEFAULTS if k in payload)
+        key = (
+            tuple(params["candidate_pos"]),
+            int(params["window_size"]),
+            bool(params["lower"]),
+            int(params["number"]),
+        )
+        keywords = self.batchers["analyze"](key, texts)
+        return {"keywords": keywords if many else keywords[0]}
+
+    def tag(self, payload):
+        texts, many = _texts(payload)
+        html = bool(payload.get("html", False))
+        results = self.batchers["tag"](html, texts)
+        if many:
+            response = {"entities": [entities for _, entities in results]}
+            if html:
+                response["texts"] = [text for text, _ in results]
+        else:
+            response = {"entities": results[0][1]}
+            if html:
+                response["text"] = results[0][0]
+        return response
+
+    def close(self):
+        for batcher in self.batchers.values():
+            batcher.close()
+
+
+class ServiceHandler(BaseHTTPRequestHandler):
+    service = None
+
+    def _send_json(self, status, obj):
+        body = json.dumps(obj, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/metrics":
+            self._send_json(200, self.service.metrics.summary(self.service.batchers))
+        elif self.path == "/health":
+            self._send_json(200, {"status": "ok"})
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        endpoints = {"/analyze": self.service.analyze, "/tag": self.service.tag}
+        endpoint = endpoints.get(self.path)
+        if endpoint is None:
+            self._send_json(404, {"error": "not found"})
+            return
+
+        start = time.perf_counter()
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            payload = json.loads(self.rfile.read(length) or b"{}")
+            status, response = 200, endpoint(payload)
+        except (ValueError, KeyError, TypeError) as e:
+            status, response = 400, {"error": f"bad request: {e!r}"}
+        except Exception as e:
+            status, response = 500, {"error": repr(e)}
+        self.service.metrics.record(
+            self.path, time.perf_counter() - start, error=status != 200
+        )
+        self._send_json(status, response)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_server(service, host="127.0.0.1", port=0):
+    """Serve in a background thread, return the server."""
+    handler = type("Handler", (ServiceHandler,), {"service": service})
+    # the default listen backlog of 5 resets connections under load
+    server_class = type(
+        "Server",
+        (ThreadingHTTPServer,),
+        {"request_queue_size": 128, "daemon_threads": True},
+    )
+    server = server_class((host, port), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
@@ -1,9 +1,12 @@
 """Get values / settings from local configuration."""
 
+import os
+import copy
+import time
 import yaml
 from pathlib import Path
 from loguru import logger
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 
 from src import environment
 
@@ -11,6 +14,12 @@ YAML_FILE_EXTENSION = ".yaml"
 SEPARATOR = "."
 PROJECT_PATH = "project"
 
+# BUTLER_RSS__CONCURRENCY=16 overrides rss.CONCURRENCY
+ENV_PREFIX = "BUTLER_"
+ENV_SEPARATOR = "__"
+
+_MISSING = object()
+
 
 def _load_yaml_file(yaml_file_path: Path):
     """Load yaml file and return parsed contents."""
@@ -21,43 +30,136 @@ def _load_yaml_file(yaml_file_path: Path):
             logger.exception(e)
 
 
-def _find_key_in_yaml_file(yaml_file_path: Path, search_keys: List[str]):
-    """Find a key in a yaml file."""
-    if not yaml_file_path.is_file():
-        return None
+def _env_name(key_name: str) -> str:
+    """Return the environment variable overriding a key."""
+    return ENV_PREFIX + key_name.replace(SEPARATOR, ENV_SEPARATOR).upper()
+
+
+class Config(object):
+    """Parsed-once view of a yaml config file.
+
+    The file is parsed on first use and again only when its mtime changes,
+    looked up keys are cached so a repeated lookup is a dict access.
+    Environment overrides are checked on every lookup, and lists and dicts
+    are returned as copies, so callers can't change the cached values.
+    """
+
+    def __init__(self, yaml_file_path: Path, check_interval: float = 1.0):
+        self.yaml_file_path = Path(yaml_file_path)
+        self.check_interval = check_interval  # seconds between mtime checks
+        self._mtime = _MISSING
+        self._checked = 0.0
+        self._data: Any = None
+        self._cache: Dict[str, Any] = {}
+        self._env_names: Dict[str, str] = {}
+        self._env_cache: Dict[str, Any] = {}  # key -> (raw value, parsed value)
 
-    result = _load_yaml_file(yaml_file_path)
+    def _refresh(self):
+        """Re-parse the yaml file if its mtime changed."""
+        now = time.monotonic()
+        if self._mtime is not _MISSING and now - self._checked < self.check_interval:
+            return
+        self._checked = now
 
-    if not search_keys:
-        # Give the entire yaml file contents.
-        # |value_is_relative_path| is not applicable here.
+        try:
+            mtime = self.yaml_file_path.stat().st_mtime_ns
+        except OSError:
+            mtime = None
+
+        if mtime != self._mtime:
+            self._data = _load_yaml_file(self.yaml_file_path) if mtime else None
+            self._cache.clear()
+            self._mtime = mtime
+
+    def _find(self, search_keys: List[str]):
+        """Find a key in the parsed yaml file."""
+        result = self._data
+        for search_key in search_keys:
+            if not isinstance(result, dict) or search_key not in result:
+                return None
+            result = result[search_key]
         return result
 
-    for search_key in search_keys:
-        if search_key not in result:
+    def _lookup_env(self, key_name: str):
+        """Return the parsed environment override of a key, or None."""
+        try:
+            name = self._env_names[key_name]
+        except KeyError:
+            name = self._env_names[key_name] = _env_name(key_name)
+        raw = os.environ.get(name)
+        if raw is None:
             return None
+        cached = self._env_cache.get(key_name)
+        if cached is None or cached[0] != raw:
+            cached = self._env_cache[key_name] = (raw, yaml.safe_load(raw))
+        return cached[1]
+
+    def get(self, key_name: Optional[str] = "", default=None):
+        """Get key value using a key name."""
+        if not key_name:
+            logger.warning(f"Invalid config key: {key_name}")
+            return default
+
+        value = self._lookup_env(key_name)
+        if value is None:
+            self._refresh()
+            try:
+                value = self._cache[key_name]
+            except KeyError:
+                value = self._cache[key_name] = self._find(key_name.split(SEPARATOR))
+
+        if isinstance(value, (list, dict)):
+            value = copy.deepcopy(value)
+        return default if value is None else value
 
-        result = result[search_key]
+    def get_str(self, key_name: str, default: Optional[str] = None):
+        value = self.get(key_name, default)
+        return value if value is None else str(value)
 
-    return result
+    def get_int(self, key_name: str, default: Optional[int] = None):
+        value = self.get(key_name, default)
+        return value if value is None else int(value)
 
+    def get_float(self, key_name: str, default: Optional[float] = None):
+        value = self.get(key_name, default)
+        return value if value is None else float(value)
 
-def _get_helper(key_name: Optional[str] = "", default=None):
-    """Helper for get and get_absolute_functions."""
-    if not key_name:
-        logger.warning(f"Invalid config key: {key_name}")
-        return default
+    def get_bool(self, key_name: str, default: Optional[bool] = None):
+        value = self.get(key_name, default)
+        if isinstance(value, str):
+            return value.lower() in ("1", "true", "yes", "on")
+        return value if value is None else bool(value)
 
-    search_keys = key_name.split(SEPARATOR)
-    yaml_path = environment.get_project_config()
+    def get_list(self, key_name: str, default: Optional[list] = None):
+        value = self.get(key_name, default)
+        if value is None or isinstance(value, list):
+            return value
+        return [value]
 
-    value = _find_key_in_yaml_file(yaml_path, search_keys)
-    if value is None:
-        return default
 
-    return value
+config = Config(environment.get_project_config())
 
 
 def get(key_name: Optional[str] = "", default=None):
     """Get key value using a key name."""
-    return _get_helper(key_name, default=default)
+    return config.get(key_name, default=default)
+
+
+def get_str(key_name: str, default: Optional[str] = None):
+    return config.get_str(key_name, default=default)
+
+
+def get_int(key_name: str, default: Optional[int] = None):
+    return config.get_int(key_name, default=default)
+
+
+def get_float(key_name: str, default: Optional[float] = None):
+    return config.get_float(key_name, default=default)
+
+
+def get_bool(key_name: str, default: Optional[bool] = None):
+    return config.get_bool(key_name, default=default)
+
+
+def get_list(key_name: str, default: Optional[list] = None):
+    return config.get_list(key_name, default=default)
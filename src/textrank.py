@@ -1,32 +1,94 @@
-import spacy
+import functools
 import numpy as np
+from scipy import sparse
 from collections import OrderedDict
-from spacy.lang.en.stop_words import STOP_WORDS
 
 from src import utils
 from src import settings
 
-nlp = spacy.load("en_core_web_sm")
+DAMPING = 0.85  # damping coefficient, usually is .85
+MIN_DIFF = 1e-5  # convergence threshold
+STEPS = 10  # iteration steps, stop once sum(pr) changes less than MIN_DIFF
+CONVERGED_STEPS = 100  # max steps of a solve until the L1 delta is below MIN_DIFF
+MIN_KEYWORD_WEIGHT = 1  # filtered keywords weigh at least this
+
+# TextRank only needs POS tags, stop flags and sentence boundaries
+_MINIMAL_EXCLUDE = ["parser", "ner", "lemmatizer", "senter"]
+
+
+def load_nlp(model="en_core_web_sm", mode="full"):
+    """Load spaCy pipeline, mode is "full" or "minimal".
+
+    minimal is opt-in: the sentencizer splits sentences where the parser
+    did, so the keywords can differ from the full pipeline's.
+    """
+    import spacy
+
+    if mode == "minimal":
+        # tok2vec + tagger + attribute_ruler, sentencizer instead of parser
+        nlp = spacy.load(model, exclude=_MINIMAL_EXCLUDE)
+        nlp.add_pipe("sentencizer")
+        return nlp
+
+    return spacy.load(model)
+
+
+@functools.lru_cache(maxsize=None)
+def get_nlp():
+    """Return the configured spaCy pipeline, loaded on first use."""
+    return load_nlp(
+        settings.get_str("nlp.MODEL", "en_core_web_sm"),
+        settings.get_str("nlp.MODE", "full"),
+    )
+
+
+@functools.lru_cache(maxsize=1 << 16)
+def is_keyword_word(word):
+    """Length and ascii filter of keywords"""
+    return 3 < len(word) < 15 and utils.is_ascii_word(word)
+
+
+def get_model_version():
+    """Return "<model>-<version>[-<mode>]" without loading the model."""
+    from importlib import metadata
+
+    model = settings.get_str("nlp.MODEL", "en_core_web_sm")
+    try:
+        version = metadata.version(model)
+    except metadata.PackageNotFoundError:
+        version = "unknown"
+    return f"{model}-{version}-{settings.get_str('nlp.MODE', 'full')}"
+
+
+def __getattr__(name):
+    # keep `textrank.nlp` working without loading the model at import
+    if name == "nlp":
+        return get_nlp()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 class TextRank(object):
     """Extract keywords from text"""
 
     def __init__(self):
-        self.d = 0.85  # damping coefficient, usually is .85
-        self.min_diff = 1e-5  # convergence threshold
-        self.steps = 10  # iteration steps
+        self.d = DAMPING  # damping coefficient, usually is .85
+        self.min_diff = MIN_DIFF  # convergence threshold
+        self.steps = STEPS  # iteration steps
         self.node_weight = None  # save keywords and its weight
+        self.batch_size = settings.get_int("nlp.BATCH_SIZE", 256)  # nlp.pipe batch
 
         # Set stop words
         self.set_stopwords()
 
     def set_stopwords(self):
         """Set stop words"""
+        from spacy.lang.en.stop_words import STOP_WORDS
+
         stopwords = settings.get("data.STOP")
         with open(stopwords) as f:
             stopwords = [line.strip() for line in f.readlines()]
 
+        nlp = get_nlp()
         for word in STOP_WORDS.union(set(stopwords)):
             lexeme = nlp.vocab[word]
             lexeme.is_stop = True
@@ -46,71 +108,141 @@ class TextRank(object):
             sentences.append(selected_words)
         return sentences
 
+    def segment_many(self, texts, candidate_pos, lower):
+        """Stream texts through nlp.pipe, yield the sentences of each"""
+        for doc in get_nlp().pipe(texts, batch_size=self.batch_size):
+            yield self.sentence_segment(doc, candidate_pos, lower)
+
     def get_vocab(self, sentences):
         """Get all tokens"""
         vocab = OrderedDict()
-        i = 0
         for sentence in sentences:
             for word in sentence:
                 if word not in vocab:
-                    vocab[word] = i
-                    i += 1
+                    vocab[word] = len(vocab)
         return vocab
 
     def get_token_pairs(self, window_size, sentences):
         """Build token_pairs from windows in sentences"""
-        token_pairs = list()
+        # dict keeps the first-seen order and makes the dedupe O(1)
+        token_pairs = dict()
         for sentence in sentences:
             for i, word in enumerate(sentence):
-                for j in range(i + 1, i + window_size):
-                    if j >= len(sentence):
-                        break
-                    pair = (word, sentence[j])
-                    if pair not in token_pairs:
-                        token_pairs.append(pair)
-        return token_pairs
+                for j in range(i + 1, min(i + window_size, len(sentence))):
+                    token_pairs[(word, sentence[j])] = None
+        return list(token_pairs)
+
+    def get_edges(self, vocab, token_pairs):
+        """Map token_pairs to integer-id edge arrays"""
+        edges = np.fromiter(
+            (vocab[word] for pair in token_pairs for word in pair),
+            dtype=np.int64,
+            count=2 * len(token_pairs),
+        ).reshape(-1, 2)
+        return edges[:, 0], edges[:, 1]
 
     def symmetrize(self, a):
-        return a + a.T - np.diag(a.diagonal())
+        return a + a.T - sparse.diags(a.diagonal())
 
-    def get_matrix(self, vocab, token_pairs):
-        """Get normalized matrix"""
-        # Build matrix
-        vocab_size = len(vocab)
-        g = np.zeros((vocab_size, vocab_size), dtype="float")
-        for word1, word2 in token_pairs:
-            i, j = vocab[word1], vocab[word2]
-            g[i][j] = 1
+    def get_normalized_matrix(self, size, rows, cols, weights=None):
+        """Get column normalized sparse matrix from edge arrays"""
+        if weights is None:
+            weights = np.ones(len(rows))
+        g = sparse.coo_matrix(
+            (weights, (rows, cols)),
+            shape=(size, size),
+        ).tocsr()
 
         # Get Symmeric matrix
         g = self.symmetrize(g)
 
-        # Normalize matrix by column
-        norm = np.sum(g, axis=0)
-        g_norm = np.divide(
-            g, norm, where=norm != 0
-        )  # this is ignore the 0 element in norm
+        # Normalize matrix by column, ignore the 0 element in norm
+        norm = np.asarray(g.sum(axis=0)).ravel()
+        inv_norm = np.divide(1.0, norm, out=np.zeros_like(norm), where=norm != 0)
+        g_norm = g @ sparse.diags(inv_norm)
+
+        return g_norm.tocsr()
+
+    def get_matrix(self, vocab, token_pairs):
+        """Get normalized sparse matrix"""
+        rows, cols = self.get_edges(vocab, token_pairs)
+        return self.get_normalized_matrix(len(vocab), rows, cols)
+
+    def pagerank(self, g, pr=None, converge=False):
+        """Power iteration, stopping as the dense engine did.
+
+        That is once sum(pr) changes less than min_diff, usually after
+        two steps, so rankings stay those of earlier runs. converge
+        iterates until the L1 delta drops below min_diff instead, which
+        a warm-started solve needs.
+        """
+        if pr is None:
+            pr = np.ones(g.shape[0])
+        if converge:
+            for epoch in range(CONVERGED_STEPS):
+                previous_pr = pr
+                pr = (1 - self.d) + self.d * (g @ previous_pr)
+                if np.abs(pr - previous_pr).sum() < self.min_diff:
+                    break
+            return pr
+
+        previous_sum = 0
+        for epoch in range(self.steps):
+            pr = (1 - self.d) + self.d * (g @ pr)
+            if abs(previous_sum - pr.sum()) < self.min_diff:
+                break
+            previous_sum = pr.sum()
+        return pr
+
+    def pagerank_many(self, g, blocks, n_blocks):
+        """Power iteration over a block-diagonal matrix.
 
-        return g_norm
+        blocks maps every node to its document, each document stops
+        updating under the rule of pagerank() on its own sum.
+        """
+        pr = np.ones(g.shape[0])
+        previous_sums = np.zeros(n_blocks)
+        active = np.ones(n_blocks, dtype=bool)
+        for epoch in range(self.steps):
+            pr = np.where(active[blocks], (1 - self.d) + self.d * (g @ pr), pr)
+            sums = np.bincount(blocks, weights=pr, minlength=n_blocks)
+            active &= np.abs(previous_sums - sums) >= self.min_diff
+            previous_sums = sums
+            if not active.any():
+                break
+        return pr
 
-    def get_keywords(self, number=10):
+    def select_keywords(self, words, weights, number=10, filtered=True):
+        """Return the top number keywords and weights, best first"""
+        weights = np.asarray(weights, dtype="float")
+        if filtered:
+            mask = weights >= MIN_KEYWORD_WEIGHT
+            mask &= np.fromiter(map(is_keyword_word, words), bool, len(words))
+            index = np.flatnonzero(mask)
+        else:
+            index = np.arange(len(words))
+
+        # argpartition picks the k best, only those get sorted
+        if len(index) > number:
+            index = index[np.argpartition(-weights[index], number - 1)[:number]]
+        index = index[np.argsort(-weights[index], kind="stable")]
+        return {words[i]: weights[i].item() for i in index}
+
+    def get_keywords(self, number=10, node_weight=None, filtered=False):
         """Return top number keywords"""
-        keywords = {}
-        node_weight = OrderedDict(
-            sorted(self.node_weight.items(), key=lambda t: t[1], reverse=True)
-        )
-        for i in range(number):
-            for key, value in node_weight.items():
-                keywords[key] = value
+        if node_weight is None:
+            node_weight = self.node_weight
 
-        return keywords
+        return self.select_keywords(
+            list(node_weight), list(node_weight.values()), number, filtered
+        )
 
     def filter_keywords(self, keywords):
-        keywords = dict(filter(lambda x: x[1] >= 1, keywords.items()))
-        keywords = set(keywords.keys())
-        keywords = list(filter(lambda x: 3 < len(x) < 15, keywords))
-        keywords = list(filter(utils.is_ascii_word, keywords))
-        return keywords
+        """Keep weight, length and ascii qualified keywords, best first"""
+        keywords = self.select_keywords(
+            list(keywords), list(keywords.values()), len(keywords), filtered=True
+        )
+        return list(keywords)
 
     def analyze(
         self,
@@ -122,7 +254,7 @@ class TextRank(object):
         """Main function to analyze text"""
 
         # Pare text by spaCy
-        doc = nlp(text)
+        doc = get_nlp()(text)
 
         # Filter sentences
         sentences = self.sentence_segment(
@@ -138,17 +270,8 @@ class TextRank(object):
         # Get normalized matrix
         g = self.get_matrix(vocab, token_pairs)
 
-        # Initionlization for weight(pagerank value)
-        pr = np.array([1] * len(vocab))
-
-        # Iteration
-        previous_pr = 0
-        for epoch in range(self.steps):
-            pr = (1 - self.d) + self.d * np.dot(g, pr)
-            if abs(previous_pr - sum(pr)) < self.min_diff:
-                break
-            else:
-                previous_pr = sum(pr)
+        # Iteration for weight(pagerank value)
+        pr = self.pagerank(g)
 
         # Get weight for each node
         node_weight = dict()
@@ -156,3 +279,65 @@ class TextRank(object):
             node_weight[word] = pr[index]
 
         self.node_weight = node_weight
+
+    def analyze_many(
+        self,
+        texts,
+        candidate_pos=["PROPN"],
+        window_size=4,
+        lower=False,
+        number=10,
+        filtered=True,
+    ):
+        """Analyze many texts with a single block-diagonal solve.
+
+        Return a list of (node_weight, keywords) for each text, keywords
+        are the top number (filtered) keywords, best first.
+        """
+        vocabs, rows, cols = [], [], []
+        offset = 0
+        for sentences in self.segment_many(texts, candidate_pos, lower):
+            vocab = self.get_vocab(sentences)
+            token_pairs = self.get_token_pairs(window_size, sentences)
+
+            # Shift ids so each document owns its own block
+            _rows, _cols = self.get_edges(vocab, token_pairs)
+            rows.append(_rows + offset)
+            cols.append(_cols + offset)
+            vocabs.append(vocab)
+            offset += len(vocab)
+
+        if not vocabs:
+            return []
+
+        g = self.get_normalized_matrix(
+            offset, np.concatenate(rows), np.concatenate(cols)
+        )
+        sizes = [len(vocab) for vocab in vocabs]
+        blocks = np.repeat(np.arange(len(vocabs)), sizes)
+        pr = self.pagerank_many(g, blocks, len(vocabs))
+
+        # top number keywords of every block at once: sort by block, then
+        # by weight, and keep the first number of each block
+        words = [word for vocab in vocabs for word in vocab]
+        index = np.arange(offset)
+        if filtered:
+            mask = pr >= MIN_KEYWORD_WEIGHT
+            mask &= np.fromiter(map(is_keyword_word, words), bool, len(words))
+            index = index[mask]
+        index = index[np.lexsort((-pr[index], blocks[index]))]
+        first = np.searchsorted(blocks[index], blocks[index])
+        index = index[np.arange(len(index)) - first < number]
+
+        keywords = [dict() for _ in vocabs]
+        for i in index.tolist():
+            keywords[blocks[i]][words[i]] = pr[i].item()
+
+        results = []
+        offset = 0
+        for vocab, top_keywords in zip(vocabs, keywords):
+            weights = pr[offset : offset + len(vocab)].tolist()
+            node_weight = dict(zip(vocab, weights))
+            results.append((node_weight, top_keywords))
+            offset += len(vocab)
+        return results
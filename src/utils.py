@@ -1,6 +1,6 @@
-import re
 import json
 import string
+import itertools
 
 from src import constants
 
@@ -20,29 +20,54 @@ def load_json_lines(json_file):
     return json_objs
 
 
+def iter_json_lines(json_file):
+    with open(json_file, "r", encoding="utf-8") as f:
+        for json_line in f:
+            yield json.loads(json_line)
+
+
 def dump_json(obj, json_file, sort_keys=False):
     with open(json_file, "w", encoding="utf-8") as f:
         json.dump(obj, f, indent=2, sort_keys=sort_keys, ensure_ascii=False)
 
 
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
 def is_ascii_word(word):
     return all(char in string.ascii_lowercase for char in word)
 
 
-def sanitize_text(text):
-    patterns = (
-        constants.REGEX_URL,
-        constants.REGEX_HASHTAG,
-        constants.REGEX_MENTION,
-        constants.REGEX_MD5,
-    )
+def _excluded_words(drop_slang, drop_stopwords):
+    excluded = set()
+    if drop_slang:
+        excluded |= constants.get_slang_words()
+    if drop_stopwords:
+        excluded |= constants.get_stop_words()
+    return excluded
+
+
+def sanitize_many(texts, drop_slang=False, drop_stopwords=False):
+    excluded = _excluded_words(drop_slang, drop_stopwords)
+    sanitize = constants.REGEX_SANITIZE.sub
+    whitespace = constants.REGEX_WHITESPACE_RUN.sub
+
+    for text in texts:
+        # drop urls, hashtags, mentions, md5s and emojis in a single pass
+        text = whitespace(" ", sanitize("", text)).strip().lower()
+        if excluded:
+            text = " ".join(word for word in text.split(" ") if word not in excluded)
+        yield text
 
-    for pattern in patterns:
-        text = re.sub(pattern, "", text)
 
-    text = constants.REGEX_EMOJI_PATTERN.sub(r"", text)
-    text = re.sub(constants.REGEX_WHITESPACE, " ", text)
-    return text.strip().lower()
+def sanitize_text(text, drop_slang=False, drop_stopwords=False):
+    return next(sanitize_many([text], drop_slang, drop_stopwords))
 
 
 def escape_quotes(text):
@@ -0,0 +1,327 @@
+"""Resident fetch -> parse -> match -> write pipeline behind `rss watch`.
+
+Every stage runs in its own thread(s) and hands jobs to the next one
+through a bounded queue, so a slow stage holds the ones before it back
+instead of piling up memory. The write stage runs in the calling thread,
+which owns the sqlite connection. Each account is polled on its own
+interval, adapted to how often it posts.
+"""
+import time
+import queue
+import heapq
+import threading
+from collections import deque
+from email.utils import parsedate_to_datetime
+
+from src import fetcher
+from src import html_text
+from src import profiler
+from src.feed_parser import parse_entries
+
+STAGES = ("queue", "fetch", "parse", "match", "write", "total")
+
+_STOP = object()  # end of stream marker passed down the stages
+
+
+def _posted_span(entries):
+    """Return (entries, seconds) between the oldest and newest entry."""
+    times = []
+    for entry in entries:
+        try:
+            times.append(parsedate_to_datetime(entry["published"]).timestamp())
+        except (TypeError, ValueError):
+            continue
+    if len(times) < 2:
+        return 0, 0.0
+    return len(times) - 1, max(times) - min(times)
+
+
+class AdaptiveSchedule(object):
+    """Per-account poll intervals from an estimate of their posting rate.
+
+    The rate (posts/sec) is an exponential moving average of the new
+    entries seen per poll; the first poll estimates it from the publish
+    times in the feed. An account is polled about once per expected
+    post, within [min_interval, max_interval].
+    """
+
+    def __init__(self, users, min_interval, max_interval, smoothing=0.3):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.smoothing = smoothing
+        self.rates = dict.fromkeys(users)  # None until the first poll
+        self.polled = {}  # user -> time of the last poll
+
+        now = time.time()
+        self._heap = [(now, user) for user in users]
+        heapq.heapify(self._heap)
+        self._condition = threading.Condition()
+
+    def interval(self, user):
+        rate = self.rates.get(user)
+        if not rate:
+            return self.max_interval if rate == 0 else self.min_interval
+        return min(self.max_interval, max(self.min_interval, 1 / rate))
+
+    def observe(self, user, entries, now=None):
+        """Update the posting rate of user from the entries of a poll."""
+        now = time.time() if now is None else now
+        last = self.polled.get(user)
+        self.polled[user] = now
+
+        if last is None:
+            count, seconds = _posted_span(entries)
+            self.rates[user] = count / seconds if seconds else 0.0
+            return
+
+        rate = len(entries) / max(now - last, 1e-3)
+        previous = self.rates[user] or 0.0
+        self.rates[user] = previous + self.smoothing * (rate - previous)
+
+    def push(self, user, due):
+        with self._condition:
+            heapq.heappush(self._heap, (due, user))
+            self._condition.notify()
+
+    def pop(self, stop_event, poll=1.0):
+        """Block until an account is due, return None once stop_event is set."""
+        with self._condition:
+            while not stop_event.is_set():
+                now = time.time()
+                if self._heap and self._heap[0][0] <= now:
+                    return heapq.heappop(self._heap)
+                timeout = self._heap[0][0] - now if self._heap else poll
+                self._condition.wait(min(timeout, poll))
+        return None
+
+
+class StageStats(object):
+    """Latency samples of the pipeline stages."""
+
+    def __init__(self, window=1000):
+        self.samples = {stage: deque(maxlen=window) for stage in STAGES}
+        self.counts = dict.fromkeys(STAGES, 0)
+        self._lock = threading.Lock()
+
+    def record(self, job):
+        times = job["times"]
+        spans = {
+            "queue": times["fetch"] - times["due"],
+            "fetch": times["fetched"] - times["fetch"],
+            "parse": times["parsed"] - times["fetched"],
+            "match": times["matched"] - times["parsed"],
+            "write": times["written"] - times["matched"],
+            "total": times["written"] - times["due"],
+        }
+        with self._lock:
+            for stage, seconds in spans.items():
+                self.samples[stage].append(seconds)
+                self.counts[stage] += 1
+
+    def summary(self):
+        """Return {stage: (count, p50, p95, max)} in seconds."""
+        result = {}
+        with self._lock:
+            for stage in STAGES:
+                samples = sorted(self.samples[stage])
+                if not samples:
+                    continue
+                result[stage] = (
+                    self.counts[stage],
+                    samples[len(samples) // 2],
+                    samples[min(len(samples) - 1, int(len(samples) * 0.95))],
+                    samples[-1],
+                )
+        return result
+
+
+class Watcher(object):
+    """Poll accounts forever and hand matched feeds to a write callback.
+
+    write(job) runs in the thread calling run() and returns the account
+    state after the poll. The job holds the account "state", the fetch
+    "status", "headers" and "error", the parsed "data", and the "entries"
+    kept by entry_filter with their "texts" and "entities".
+    """
+
+    def __init__(
+        self,
+        api,
+        states,
+        matcher,
+        schedule,
+        concurrency=8,
+        timeout=15,
+        queue_size=64,
+        entry_filter=None,
+    ):
+        self.api = api
+        self.entry_filter = entry_filter
+        self.states = {state["user"]: state for state in states}
+        self.matcher = matcher
+        self.schedule = schedule
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.stats = StageStats()
+        self.stop_event = threading.Event()
+
+        self._fetch_queue = queue.Queue(queue_size)
+        self._parse_queue = queue.Queue(queue_size)
+        self._match_queue = queue.Queue(queue_size)
+        self._write_queue = queue.Queue(queue_size)
+
+    def stop(self):
+        self.stop_event.set()
+
+    def _put(self, target, item):
+        # blocks while the next stage is busy, that is the backpressure
+        target.put(item)
+
+    def _schedule_stage(self):
+        while True:
+            item = self.schedule.pop(self.stop_event)
+            if item is None:
+                break
+            due, user = item
+            state = self.states[user]
+            # the first poll reads the whole feed to estimate the posting rate
+            last_seen = state["last_seen"] if user in self.schedule.polled else None
+            job = {
+                "state": state,
+                "last_seen": last_seen,
+                "times": {"due": max(due, state["next_fetch"])},
+            }
+            if job["times"]["due"] > time.time():
+                # still backing off after failures
+                self.schedule.push(user, job["times"]["due"])
+                continue
+            self._put(self._fetch_queue, job)
+
+        for _ in range(self.concurrency):
+            self._put(self._fetch_queue, _STOP)
+
+    def _fetch_stage(self):
+        while True:
+            job = self._fetch_queue.get()
+            if job is _STOP:
+                self._put(self._parse_queue, _STOP)
+                return
+
+            state = job["state"]
+            job["times"]["fetch"] = time.time()
+            try:
+                with profiler.stage("fetch.network"):
+                    job["status"], job["headers"], job["body"] = fetcher.fetch_feed(
+                        self.api.format(user=state["user"]),
+                        state["etag"],
+                        state["modified"],
+                        self.timeout,
+                    )
+                job["error"] = None
+            except Exception as e:
+                job["status"], job["headers"], job["body"] = None, None, b""
+                job["error"] = e
+            job["times"]["fetched"] = time.time()
+            self._put(self._parse_queue, job)
+
+    def _parse_stage(self):
+        stopped = 0
+        while stopped < self.concurrency:
+            job = self._parse_queue.get()
+            if job is _STOP:
+                stopped += 1
+                continue
+
+            job["data"] = None
+            job["entries"] = []
+            job["texts"] = []
+            if job["error"] is None and job["status"] != fetcher.HTTP_NOT_MODIFIED:
+                try:
+                    with profiler.stage("fetch.parse"):
+                        job["data"] = parse_entries(job["body"], job["last_seen"])
+                    job["entries"] = list(
+                        filter(self.entry_filter, job["data"]["entries"])
+                    )
+                    with profiler.stage("html"):
+                        job["texts"] = html_text.html_to_texts(
+                            entry["summary"] for entry in job["entries"]
+                        )
+                    profiler.count("entries.parsed", len(job["data"]["entries"]))
+                except Exception as e:
+                    # nothing is written, the account backs off
+                    job["error"] = e
+                    job["entries"], job["texts"] = [], []
+            del job["body"]
+            job["times"]["parsed"] = time.time()
+            self._put(self._match_queue, job)
+        self._put(self._match_queue, _STOP)
+
+    def _match_stage(self):
+        while True:
+            job = self._match_queue.get()
+            if job is _STOP:
+                self._put(self._write_queue, _STOP)
+                return
+
+            try:
+                with profiler.stage("match"):
+                    job["entities"] = [
+                        [
+                            [start, stop, "KEYWORD"]
+                            for start, stop in self.matcher.findall(text)
+                        ]
+                        for text in job["texts"]
+                    ]
+            except Exception as e:
+                job["error"] = e
+                job["entries"], job["texts"], job["entities"] = [], [], []
+            job["times"]["matched"] = time.time()
+            self._put(self._write_queue, job)
+
+    def run(self, write, tick=None, tick_interval=60.0):
+        """Run until stop() and the in-flight jobs are written.
+
+        tick() is called in this thread about every tick_interval seconds.
+        """
+        threads = [threading.Thread(target=self._schedule_stage)]
+        threads += [
+            threading.Thread(target=self._fetch_stage) for _ in range(self.concurrency)
+        ]
+        threads += [
+            threading.Thread(target=self._parse_stage),
+            threading.Thread(target=self._match_stage),
+        ]
+        for thread in threads:
+            thread.daemon = True
+            thread.start()
+
+        last_tick = time.monotonic()
+        while True:
+            try:
+                job = self._write_queue.get(timeout=1.0)
+            except queue.Empty:
+                job = None
+            if job is _STOP:
+                break
+
+            if job is not None:
+                self.states[job["state"]["user"]] = write(job)
+                job["times"]["written"] = time.time()
+                self.stats.record(job)
+
+                user = job["state"]["user"]
+                if job["data"] is not None:
+                    self.schedule.observe(user, job["data"]["entries"])
+                elif job["error"] is None and user in self.schedule.polled:
+                    # not modified
+                    self.schedule.observe(user, [])
+                self.schedule.push(user, time.time() + self.schedule.interval(user))
+
+            if tick is not None and time.monotonic() - last_tick >= tick_interval:
+                last_tick = time.monotonic()
+                tick()
+
+        for thread in threads:
+            thread.join()
+        if tick is not None:
+            tick()
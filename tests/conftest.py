@@ -0,0 +1,13 @@
+import pytest
+
+from src import database
+
+
+@pytest.fixture
+def store(tmp_path):
+    """A feed store in a temporary sqlite file, the configured one restored after."""
+    previous = database.FeedStore.database
+    database.connect(str(tmp_path / "archives.db"))
+    database.create_table()
+    yield database.FeedStore
+    database.connect(previous)
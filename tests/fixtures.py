@@ -0,0 +1,68 @@
+"""Seeded test data, the same arguments give the same data."""
+import random
+
+WORDS = (
+    "fuzzing exploit kernel heap overflow patch released new blog post on "
+    "the of a bug chain rce sandbox escape browser chrome windows linux "
+    "analysis malware sample reverse engineering talk slides"
+).split()
+NOISE = (
+    "https://t.co/{}",
+    "#infosec",
+    "#{}",
+    "@{}",
+    "{:032x}",
+    "\U0001F600",
+    "\U0001F680",
+)
+
+
+def tweets(count, seed=0):
+    """Return tweet texts with urls, hashtags, mentions, hashes and emoji."""
+    rng = random.Random(seed)
+    texts = []
+    for _ in range(count):
+        words = [rng.choice(WORDS) for _ in range(rng.randint(8, 30))]
+        for _ in range(rng.randint(0, 5)):
+            noise = rng.choice(NOISE).format(rng.getrandbits(128))
+            words.insert(rng.randrange(len(words) + 1), noise)
+        texts.append("  ".join(words) if rng.random() < 0.1 else " ".join(words))
+    return texts
+
+
+def documents(count, length, seed=0):
+    """Return count documents of length words drawn from a zipf-like vocab."""
+    rng = random.Random(seed)
+    vocab = [f"w{i}" for i in range(max(50, length))]
+    weights = [1 / (rank + 1) for rank in range(len(vocab))]
+    return [
+        " ".join(rng.choices(vocab, weights, k=length)) + "." for _ in range(count)
+    ]
+
+
+def near_duplicates(count, copies=0.2, seed=0):
+    """Return (feeds, texts, originals), about copies of the feeds retweet or
+    reword an earlier one; originals[i] is the feed that feeds[i] copies."""
+    rng = random.Random(seed)
+    feeds, texts, originals = [], [], []
+    for i, text in enumerate(tweets(count, seed)):
+        feed = {
+            "author": f"user{i % 100}",
+            "title": f"title of tweet {i}",
+            "link": f"https://twitter.com/user{i % 100}/status/{i}",
+        }
+        original = i
+        if i and rng.random() < copies:
+            original = originals[rng.randrange(i)]
+            words = texts[original].split()
+            for _ in range(rng.randint(0, 2)):
+                words[rng.randrange(len(words))] = rng.choice(WORDS)
+            text = " ".join(words)
+            if rng.random() < 0.5:
+                author = feeds[original]["author"]
+                feed["title"] = f"RT {author}: {text[:100]}"
+                text = f"RT {author}{text}"
+        feeds.append(feed)
+        texts.append(text)
+        originals.append(original)
+    return feeds, texts, originals
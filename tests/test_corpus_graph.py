@@ -0,0 +1,86 @@
+import numpy as np
+import pytest
+
+from src.corpus_graph import CorpusGraph
+
+
+def merge_corpus(graph, path):
+    """Merge the unmerged lines of path, a document of word pairs each."""
+    delta = CorpusGraph()
+    with open(path, "rb") as f:
+        for line in graph.corpus_lines(f):
+            words = line.split()
+            delta.add_pairs(zip(words, words[1:]))
+    graph.merge(delta)
+    return delta.documents
+
+
+def test_save_and_load(tmp_path):
+    graph = CorpusGraph()
+    graph.add_pairs([("heap", "overflow"), ("overflow", "patch")])
+    graph.add_pairs([("heap", "overflow")])
+    graph.corpus_offset, graph.corpus_crc = 10, 42
+    graph.save(tmp_path / "graph.npz")
+
+    loaded = CorpusGraph.load(tmp_path / "graph.npz")
+    assert loaded.words == ["heap", "overflow", "patch"]
+    assert loaded.documents == 2
+    np.testing.assert_array_equal(loaded.weights, [2, 1])
+    assert (loaded.corpus_offset, loaded.corpus_crc) == (10, 42)
+
+
+def test_merges_only_the_appended_tail(tmp_path):
+    corpus = tmp_path / "corpus.txt"
+    corpus.write_text("heap overflow\nkernel patch\n")
+    path = tmp_path / "graph.npz"
+
+    graph = CorpusGraph()
+    assert merge_corpus(graph, corpus) == 2
+    graph.save(path)
+
+    # running again on the same corpus adds nothing
+    graph = CorpusGraph.load(path)
+    assert merge_corpus(graph, corpus) == 0
+    assert graph.documents == 2
+    np.testing.assert_array_equal(graph.weights, [1, 1])
+
+    with open(corpus, "a") as f:
+        f.write("heap overflow again\ntorn line")
+    assert merge_corpus(graph, corpus) == 1
+    graph.save(path)
+    graph = CorpusGraph.load(path)
+    assert graph.documents == 3
+    assert dict(zip(graph.keys.tolist(), graph.weights.tolist()))[1] == 2
+
+    # the torn line is merged once it is complete
+    with open(corpus, "a") as f:
+        f.write(" ends\n")
+    assert merge_corpus(graph, corpus) == 1
+    assert graph.words[-1] == "ends"
+
+
+def test_refuses_another_corpus(tmp_path):
+    corpus = tmp_path / "corpus.txt"
+    corpus.write_text("heap overflow\nkernel patch\n")
+    graph = CorpusGraph()
+    merge_corpus(graph, corpus)
+
+    corpus.write_text("kernel patch\nheap overflow\n")
+    with pytest.raises(ValueError):
+        merge_corpus(graph, corpus)
+    corpus.write_text("heap overflow\n")
+    with pytest.raises(ValueError):
+        merge_corpus(graph, corpus)
+
+
+def test_older_graph_has_no_offset(tmp_path):
+    path = tmp_path / "graph.npz"
+    np.savez_compressed(
+        path,
+        words=np.array(["a", "b"]),
+        keys=np.array([1]),
+        weights=np.array([1.0]),
+        scores=np.ones(2),
+        documents=np.array(1),
+    )
+    assert CorpusGraph.load(path).corpus_offset is None
@@ -0,0 +1,82 @@
+from src import database
+from src import dedupe
+
+from tests import fixtures
+
+TEXT = (
+    "Critical heap overflow in the image parser lets a remote attacker "
+    "run code, patch to version 2.4.1 now https://example.com/advisory"
+)
+
+
+def feed(i, title="advisory"):
+    return {
+        "link": f"https://twitter.com/user/status/{i}",
+        "title": title,
+        "author": "user",
+    }
+
+
+def test_similarity_of_signatures():
+    reworded = TEXT.replace("remote", "local")
+    assert dedupe.similarity(dedupe.signature(TEXT), dedupe.signature(TEXT)) == 1.0
+    assert dedupe.similarity(dedupe.signature(TEXT), dedupe.signature(reworded)) > 0.5
+    assert dedupe.signature("http://example.com ...") is None
+    assert dedupe.shingles("Two words") == {"two words"}
+
+
+def test_collapse_within_run(store):
+    feeds = [feed(0), feed(1, "RT vendor: Critical heap overflow"), feed(2), feed(3)]
+    texts = [
+        TEXT,
+        "RT vendor" + TEXT,
+        "Fuzzing finds a use after free in the font loader of the browser",
+        "",
+    ]
+    kept = dedupe.collapse(feeds, texts, 0.6)
+
+    assert [(f["link"], [d["link"] for d in dups]) for f, _, dups in kept] == [
+        (feeds[0]["link"], [feeds[1]["link"]]),
+        (feeds[2]["link"], []),
+        (feeds[3]["link"], []),
+    ]
+
+
+def test_collapse_across_runs(store):
+    dedupe.collapse([feed(0)], [TEXT], 0.6)
+    # a copy of an archived feed is only recorded
+    assert dedupe.collapse([feed(1)], [TEXT.replace("now", "today")], 0.6) == []
+
+    sql = f"select link, duplicate_of from {store.table}_signatures order by link"
+    assert store.cursor.execute(sql).fetchall() == [
+        (feed(0)["link"], None),
+        (feed(1)["link"], feed(0)["link"]),
+    ]
+
+
+def test_copies_point_at_the_first_feed(store):
+    dedupe.collapse([feed(0), feed(1)], [TEXT, TEXT], 0.6)
+    dedupe.collapse([feed(2)], [TEXT], 0.6)
+    sql = f"select duplicate_of from {store.table}_signatures where link = ?"
+    assert store.cursor.execute(sql, (feed(2)["link"],)).fetchone() == (feed(0)["link"],)
+
+
+def test_max_age_forgets_signatures(store, monkeypatch):
+    dedupe.collapse([feed(0)], [TEXT], 0.6)
+    monkeypatch.setattr(dedupe.time, "time", lambda: 2 ** 40)
+    kept = dedupe.collapse([feed(1)], [TEXT], 0.6, max_age=3600)
+    assert [f["link"] for f, _, _ in kept] == [feed(1)["link"]]
+
+
+def test_recall_and_precision_on_synthetic_copies(store):
+    feeds, texts, originals = fixtures.near_duplicates(500, seed=1)
+    with database.transaction():
+        kept = dedupe.collapse(feeds, texts, 0.6)
+
+    index = {f["link"]: i for i, f in enumerate(feeds)}
+    for f, _, duplicates in kept:
+        for duplicate in duplicates:
+            assert originals[index[duplicate["link"]]] == originals[index[f["link"]]]
+    # reworded short tweets may fall under the threshold, most copies don't
+    copies = sum(1 for i, original in enumerate(originals) if original != i)
+    assert len(feeds) - len(kept) >= 0.6 * copies
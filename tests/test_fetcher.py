@@ -0,0 +1,50 @@
+from src import fetcher
+
+STATE = {
+    "user": "someone",
+    "etag": '"abc"',
+    "modified": "Mon, 01 Jan 2024 00:00:00 GMT",
+    "last_seen": "https://twitter.com/someone/status/1",
+    "failures": 0,
+    "next_fetch": 0,
+}
+
+
+def test_failures_back_off_exponentially():
+    state = STATE
+    delays = []
+    for _ in range(5):
+        state = fetcher.next_state(state, {}, None, OSError(), 60, 600, now=1000)
+        delays.append(state["next_fetch"] - 1000)
+    assert delays == [60, 120, 240, 480, 600]
+    assert state["failures"] == 5
+    assert not fetcher.is_due(state, now=1599)
+    assert fetcher.is_due(state, now=1600)
+
+
+def test_failure_keeps_cache_headers_and_last_seen():
+    headers = {"ETag": '"new"', "Last-Modified": "Tue, 02 Jan 2024 00:00:00 GMT"}
+    data = {"entries": [{"link": "https://twitter.com/someone/status/2"}]}
+    state = fetcher.next_state(STATE, headers, data, OSError(), 60, 600, now=0)
+    for key in ("etag", "modified", "last_seen"):
+        assert state[key] == STATE[key]
+    assert STATE["failures"] == 0
+
+
+def test_success_resets_and_advances():
+    failed = dict(STATE, failures=3, next_fetch=500)
+    headers = {"ETag": '"new"'}
+    data = {"entries": [{"link": "https://twitter.com/someone/status/2"}]}
+    state = fetcher.next_state(failed, headers, data, None, 60, 600, now=0)
+    assert state["failures"] == 0
+    assert state["next_fetch"] == 0
+    assert state["etag"] == '"new"'
+    assert state["modified"] == STATE["modified"]
+    assert state["last_seen"] == "https://twitter.com/someone/status/2"
+
+
+def test_not_modified_keeps_last_seen():
+    state = fetcher.next_state(STATE, {}, None, None, 60, 600, now=0)
+    assert state["last_seen"] == STATE["last_seen"]
+    state = fetcher.next_state(STATE, {}, {"entries": []}, None, 60, 600, now=0)
+    assert state["last_seen"] == STATE["last_seen"]
@@ -0,0 +1,28 @@
+import pytest
+
+from src import html_text
+
+
+@pytest.mark.parametrize(
+    "html",
+    [
+        "plain text",
+        "first<br />second<br>third",
+        "<p>Heap overflow in <b>libpng</b></p>\n<p>patch now</p>",
+        "a &amp; b &lt;tag&gt; &#8217; &#x27; &nbsp;c",
+        "unknown &bogus; and bare & ampersand",
+        "line</br>break",
+        "<img src='x'></img>after",
+        "<script>alert(1)</script>text",
+        "<!-- comment -->text",
+        "a < b and c > d",
+        "  <p> </p>\n<p>\n</p>  ",
+    ],
+)
+def test_same_text_as_beautifulsoup(html):
+    assert html_text.html_to_text(html) == html_text.parse_text(html)
+
+
+def test_void_end_tags_use_the_parser():
+    assert html_text.strip_tags("line</br>break") is None
+    assert html_text.strip_tags("first<br />second") == "firstsecond"
@@ -0,0 +1,131 @@
+import os
+
+from src import keyword_index
+from src.keyword_index import KeywordIndex, load_keyword_index
+
+
+def test_round_trip(tmp_path):
+    path = str(tmp_path / "features.idx")
+    index = KeywordIndex(path)
+    index.update(["fuzz", "apt", "heap overflow"])
+    index.add("cve", keyword_index.SOURCE_ANNOTATION)
+    index.hit("apt", 3)
+    index.save()
+
+    loaded = KeywordIndex(path)
+    assert loaded.generation == 1
+    assert loaded.keywords() == ["apt", "cve", "fuzz", "heap overflow"]
+    assert loaded.lookup("fuzz") == (0, 0, keyword_index.SOURCE_EXTRACTION)
+    assert loaded.lookup("apt") == (1, 3, keyword_index.SOURCE_EXTRACTION)
+    assert loaded.lookup("cve") == (3, 0, keyword_index.SOURCE_ANNOTATION)
+    assert loaded.lookup("missing") is None
+    assert len(loaded) == 4
+
+
+def test_ids_are_not_reused(tmp_path):
+    path = str(tmp_path / "features.idx")
+    index = KeywordIndex(path)
+    index.update(["apt", "fuzz"])
+    index.save()
+    index.remove("fuzz")
+    index.add("cve")
+    index.save()
+
+    assert KeywordIndex(path).lookup("cve") == (2, 0, keyword_index.SOURCE_EXTRACTION)
+
+
+def test_re_add_keeps_row(tmp_path):
+    path = str(tmp_path / "features.idx")
+    index = KeywordIndex(path)
+    index.update(["apt", "fuzz"])
+    index.hit("fuzz", 2)
+    index.save()
+
+    index.remove("fuzz")
+    assert "fuzz" not in index
+    index.add("fuzz")
+    assert index.lookup("fuzz") == (1, 2, keyword_index.SOURCE_EXTRACTION)
+    assert index.keywords() == ["apt", "fuzz"]
+    assert len(index) == 2
+    index.save()
+    assert KeywordIndex(path).keywords() == ["apt", "fuzz"]
+
+
+def test_matcher_follows_edits(tmp_path):
+    index = KeywordIndex(str(tmp_path / "features.idx"))
+    index.update(["apt"])
+    index.save()
+    matcher = index.get_matcher()
+    index.add("fuzz")
+    index.remove("apt")
+    assert matcher.findall("apt fuzz") == [[4, 8]]
+    index.save()
+    assert index.get_matcher() is matcher
+
+
+def test_reloads_newer_generation(tmp_path):
+    path = str(tmp_path / "features.idx")
+    reader = KeywordIndex(path)
+    writer = KeywordIndex(path)
+    writer.update(["apt"])
+    writer.save()
+    assert reader.get_matcher().findall("apt") == [[0, 3]]
+
+
+def test_load_compiles_newer_text_file(tmp_path):
+    index_file = str(tmp_path / "features.idx")
+    keywords_file = str(tmp_path / "features.txt")
+    with open(keywords_file, "w") as f:
+        f.write("apt\nfuzz\n")
+    index = load_keyword_index(index_file, keywords_file)
+    index.hit("fuzz")
+    index.save()
+
+    with open(keywords_file, "w") as f:
+        f.write("fuzz\ncve\n\n")
+    stat = os.stat(index_file)
+    os.utime(keywords_file, (stat.st_atime + 10, stat.st_mtime + 10))
+    index = load_keyword_index(index_file, keywords_file)
+    assert index.keywords() == ["cve", "fuzz"]
+    assert index.lookup("fuzz") == (1, 1, keyword_index.SOURCE_EXTRACTION)
+
+    index.export(str(tmp_path / "export.txt"))
+    with open(tmp_path / "export.txt") as f:
+        assert f.read() == "cve\nfuzz\n"
+
+
+def test_load_replaces_foreign_file(tmp_path):
+    index_file = tmp_path / "features.idx"
+    index_file.write_bytes(b"not an index at all")
+    assert len(load_keyword_index(str(index_file))) == 0
+
+
+def test_writers_saving_in_turn_keep_each_others_edits(tmp_path):
+    path = str(tmp_path / "features.idx")
+    index = KeywordIndex(path)
+    index.update(["alpha", "beta"])
+    index.hit("beta", 2)
+    index.save()
+
+    annotator = KeywordIndex(path)
+    resident = KeywordIndex(path)
+    annotator.add("gamma", keyword_index.SOURCE_ANNOTATION)
+    annotator.remove("alpha")
+    annotator.hit("beta")
+    resident.hit("beta", 3)
+    resident.add("delta")
+    annotator.save()
+    matcher = resident.get_matcher()
+    resident.save()
+
+    assert resident.keywords() == ["beta", "delta", "gamma"]
+    assert resident.lookup("beta") == (1, 6, keyword_index.SOURCE_EXTRACTION)
+    assert resident.lookup("gamma") == (2, 0, keyword_index.SOURCE_ANNOTATION)
+    assert resident.lookup("delta") == (3, 0, keyword_index.SOURCE_EXTRACTION)
+    # the matcher missed the annotator's edits, it is rebuilt
+    assert resident.get_matcher() is not matcher
+    assert resident.get_matcher().findall("alpha gamma") == [[6, 11]]
+
+    annotator.reload()
+    assert annotator.keywords() == ["beta", "delta", "gamma"]
+    assert annotator.generation == 3
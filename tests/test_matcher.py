@@ -0,0 +1,33 @@
+from src.matcher import KeywordMatcher
+
+
+def matched(matcher, text):
+    return [text[start:stop] for start, stop in matcher.findall(text)]
+
+
+def test_matches_on_word_boundaries():
+    matcher = KeywordMatcher(["apt"])
+    assert matched(matcher, "aptitude apt, (apt) xapt apt.") == ["apt", "apt", "apt"]
+
+
+def test_matches_phrases_and_punctuation():
+    matcher = KeywordMatcher(["heap overflow", "c++", "use-after-free", "CVE"])
+    assert matched(matcher, "heap overflow!") == ["heap overflow"]
+    assert matched(matcher, "heap overflowing") == []
+    assert matched(matcher, "a c++ use-after-free") == ["c++", "use-after-free"]
+    assert matched(matcher, "CVE-2021-1234") == ["CVE"]
+
+
+def test_overlapping_keywords_are_sorted():
+    matcher = KeywordMatcher(["linux", "linux kernel"])
+    assert matcher.findall("linux kernel bug") == [[0, 5], [0, 12]]
+    # phrases match their exact spacing only
+    assert matcher.findall("linux  kernel") == [[0, 5]]
+
+
+def test_add_and_remove():
+    matcher = KeywordMatcher(["apt", "heap overflow"])
+    matcher.remove("apt")
+    assert matcher.findall("apt") == []
+    matcher.add("overflow")
+    assert matcher.findall("heap overflow") == [[0, 13], [5, 13]]
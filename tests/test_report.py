@@ -0,0 +1,110 @@
+import json
+
+from src import report
+from src.report import Report, ReportWriter
+
+
+def write(path, count):
+    with ReportWriter(path) as writer:
+        for i in range(count):
+            writer.append(f"text {i}", [[0, 4]])
+
+
+def test_append_and_read(tmp_path):
+    path = tmp_path / "report.jsonl"
+    with ReportWriter(path) as writer:
+        assert writer.append("first", [[0, 5]]) == 0
+        assert writer.append("second", [], sources=["https://a"]) == 1
+
+    with Report(path) as data:
+        assert len(data) == 2
+        assert data[0] == ["first", {"entities": [[0, 5]]}]
+        assert data[-1] == ["second", {"entities": [], "sources": ["https://a"]}]
+        assert [text for text, _ in data] == ["first", "second"]
+
+
+def test_writer_cuts_torn_line(tmp_path):
+    path = tmp_path / "report.jsonl"
+    write(path, 3)
+    with open(path, "ab") as f:
+        f.write(b'["torn", {"enti')
+
+    with ReportWriter(path) as writer:
+        assert len(writer) == 3
+        writer.append("text 3", [])
+    with Report(path) as data:
+        assert [text for text, _ in data] == ["text 0", "text 1", "text 2", "text 3"]
+
+
+def test_writer_indexes_missing_lines(tmp_path):
+    path = tmp_path / "report.jsonl"
+    write(path, 3)
+    index_path = tmp_path / "report.jsonl.idx"
+    index_path.write_bytes(index_path.read_bytes()[:8])
+
+    with ReportWriter(path) as writer:
+        assert len(writer) == 3
+    assert len(index_path.read_bytes()) == 3 * 8
+    with Report(path) as data:
+        assert data[2][0] == "text 2"
+
+
+def test_reader_scans_stale_index(tmp_path):
+    path = tmp_path / "report.jsonl"
+    write(path, 2)
+    (tmp_path / "report.jsonl.idx").unlink()
+
+    with Report(path) as data:
+        assert len(data) == 2
+        assert data[1][0] == "text 1"
+
+
+def test_edits_survive_reopen_and_torn_journal(tmp_path):
+    path = tmp_path / "report.jsonl"
+    write(path, 3)
+    with Report(path) as data:
+        data.edit(1, [[0, 2]])
+        data.save_cursor(2)
+    with open(tmp_path / "report.jsonl.journal", "ab") as f:
+        f.write(b'{"index": 0, "ent')
+
+    with Report(path) as data:
+        assert data.cursor == 2
+        assert data[1][1]["entities"] == [[0, 2]]
+        assert data[0][1]["entities"] == [[0, 4]]
+        data.edit(0, [])
+        assert [i for i, _ in data.entries(data.cursor)] == [2]
+    with Report(path) as data:
+        assert data[0][1]["entities"] == []
+
+
+def test_compact_folds_journal_keeps_cursor(tmp_path):
+    path = tmp_path / "report.jsonl"
+    with ReportWriter(path) as writer:
+        writer.append("first", [[0, 5]], sources=["https://a"])
+        writer.append("second", [])
+    with Report(path) as data:
+        data.edit(0, [])
+        data.edit(1, [[0, 3]])
+        data.edit(1, [[0, 6]])
+        data.save_cursor(1)
+
+    assert report.compact(path) == (2, 2)
+    lines = [json.loads(line) for line in path.read_text().splitlines()]
+    assert lines == [
+        ["first", {"entities": [], "sources": ["https://a"]}],
+        ["second", {"entities": [[0, 6]]}],
+    ]
+    with Report(path) as data:
+        assert data.edits == {}
+        assert data.cursor == 1
+
+
+def test_resolve_converts_legacy_json(tmp_path):
+    entries = [["first", {"entities": [[0, 5]]}], ["second", {"entities": []}]]
+    (tmp_path / "report.json").write_text(json.dumps(entries))
+
+    path = report.resolve_report(tmp_path / "report.json")
+    assert path == tmp_path / "report.jsonl"
+    with report.load_report(tmp_path / "report.json") as data:
+        assert list(data) == entries
@@ -0,0 +1,54 @@
+import re
+
+import pytest
+
+from src import utils
+from src import constants
+
+from tests import fixtures
+
+
+def legacy_sanitize(text):
+    """The rule-by-rule sanitizer sanitize_many replaced."""
+    patterns = (
+        constants.REGEX_URL,
+        constants.REGEX_HASHTAG,
+        constants.REGEX_MENTION,
+        constants.REGEX_MD5,
+    )
+    for pattern in patterns:
+        text = re.sub(pattern, "", text)
+    text = constants.REGEX_EMOJI_PATTERN.sub(r"", text)
+    text = re.sub(constants.REGEX_WHITESPACE, " ", text)
+    return text.strip().lower()
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "",
+        "   ",
+        "Patch NOW https://example.com/advisory #infosec @vendor",
+        "#tag#tag2 @a@b mixed",
+        "#taghttps://example.com/x stuck together",
+        "@userhttp://example.com/y stuck together",
+        "hash d41d8cd98f00b204e9800998ecf8427e and D41D8CD98F00B204E9800998ECF8427E",
+        "emoji \U0001F600 in \U0001F680 between  words",
+        "tabs\tand\nnewlines  stay   apart",
+        "RT @someone: CVE-2021-44228 in log4j ❤ http://t.co/abc",
+    ],
+)
+def test_matches_legacy_rules(text):
+    assert utils.sanitize_text(text) == legacy_sanitize(text)
+
+
+def test_matches_legacy_rules_on_synthetic_tweets():
+    texts = fixtures.tweets(2000, seed=3)
+    assert list(utils.sanitize_many(texts)) == [legacy_sanitize(t) for t in texts]
+
+
+def test_drops_excluded_words():
+    stopword = sorted(constants.get_stop_words())[0]
+    text = f"Heap {stopword} overflow"
+    assert utils.sanitize_text(text) == f"heap {stopword} overflow"
+    assert utils.sanitize_text(text, drop_stopwords=True) == "heap overflow"
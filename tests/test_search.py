@@ -0,0 +1,111 @@
+import sqlite3
+
+from src import database
+
+
+def feed(author, title, link, published="Tue, 02 Mar 2021 15:54:30 GMT"):
+    return {
+        "author": author,
+        "title": title,
+        "link": link,
+        "published": published,
+        "summary": title,
+    }
+
+
+def links(feeds):
+    return sorted(feed["link"] for feed in feeds)
+
+
+def test_account_filter_uses_the_fetched_handle(store):
+    # author holds display names, a retweet links to who tweeted it
+    database.insert_feeds(
+        [
+            feed("Fuzzing Labs", "tips", "https://twitter.com/FuzzingLabs/status/1"),
+            feed("Fuzzing Labs", "RT Some: hi", "https://twitter.com/someone/status/2"),
+        ],
+        "FuzzingLabs",
+    )
+    database.insert_feeds(
+        [feed("Someone", "tips", "https://twitter.com/someone/status/3")], "someone"
+    )
+    total, feeds = database.search_feeds('"tips" OR "hi"', account="fuzzinglabs")
+    assert total == 2
+    assert links(feeds) == [
+        "https://twitter.com/FuzzingLabs/status/1",
+        "https://twitter.com/someone/status/2",
+    ]
+    assert database.search_feeds('"tips" OR "hi"', account="Fuzzing Labs") == (0, [])
+
+
+def test_account_backfilled_for_older_stores(tmp_path):
+    path = str(tmp_path / "old.db")
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "create table Tweets (author varchar(64), title varchar(512), "
+        "link varchar(512), published varchar(64), summary varchar(512))"
+    )
+    conn.executemany(
+        "insert into Tweets values (?, ?, ?, ?, ?)",
+        [
+            ("Alice", "own tweet", "https://twitter.com/alice/status/1", "", ""),
+            ("Alice", "RT Bob: hi", "https://twitter.com/bob/status/2", "", ""),
+            ("Carol", "RT Alice: yo", "https://twitter.com/alice/status/3", "", ""),
+            ("Dave", "RT Carol: hi", "https://twitter.com/carol/status/4", "", ""),
+            ("Erin", "RT Bob: unknown", "https://twitter.com/bob/status/5", "", ""),
+        ],
+    )
+    conn.commit()
+    conn.close()
+
+    previous = database.FeedStore.database
+    database.connect(path)
+    try:
+        database.create_table()
+        sql = "select link, account from Tweets order by link"
+        assert dict(database.FeedStore.cursor.execute(sql).fetchall()) == {
+            "https://twitter.com/alice/status/1": "alice",
+            "https://twitter.com/bob/status/2": "alice",
+            "https://twitter.com/alice/status/3": "carol",
+            "https://twitter.com/carol/status/4": None,
+            "https://twitter.com/bob/status/5": None,
+        }
+    finally:
+        database.connect(previous)
+
+
+def test_total_stops_past_candidates(store):
+    database.insert_feeds(
+        [
+            feed("user", f"exploit {i}", f"https://twitter.com/user/status/{i}")
+            for i in range(30)
+        ]
+    )
+    total, feeds = database.search_feeds('"exploit"', limit=5, candidates=10)
+    assert total == 11
+    # only the newest candidates are ranked
+    assert all(int(f["link"].rsplit("/", 1)[1]) >= 20 for f in feeds)
+    assert database.search_feeds('"exploit"', candidates=None)[0] == 30
+
+
+def test_date_filters(store):
+    database.insert_feeds(
+        [
+            feed(
+                "user",
+                "patch",
+                "https://twitter.com/user/status/0",
+                "Mon, 01 Feb 2021 12:00:00 GMT",
+            ),
+            feed(
+                "user",
+                "patch",
+                "https://twitter.com/user/status/1",
+                "Mon, 08 Feb 2021 12:00:00 GMT",
+            ),
+        ]
+    )
+    _, feeds = database.search_feeds('"patch"', since=1612742400)
+    assert links(feeds) == ["https://twitter.com/user/status/1"]
+    _, feeds = database.search_feeds('"patch"', until=1612742400)
+    assert links(feeds) == ["https://twitter.com/user/status/0"]
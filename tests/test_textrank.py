@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+from scipy import sparse
+
+from src.textrank import TextRank
+
+from tests import fixtures
+
+
+@pytest.fixture
+def textrank():
+    # the graph code needs no spaCy model
+    textrank = TextRank.__new__(TextRank)
+    textrank.d = 0.85
+    textrank.min_diff = 1e-5
+    textrank.steps = 10
+    return textrank
+
+
+def dense_pagerank(textrank, vocab, token_pairs):
+    """The dense engine the sparse one replaced."""
+    vocab_size = len(vocab)
+    g = np.zeros((vocab_size, vocab_size), dtype="float")
+    for word1, word2 in token_pairs:
+        g[vocab[word1]][vocab[word2]] = 1
+    g = g + g.T - np.diag(g.diagonal())
+    norm = np.sum(g, axis=0)
+    g = np.divide(g, norm, out=np.zeros_like(g), where=norm != 0)
+
+    pr = np.array([1] * vocab_size)
+    previous_pr = 0
+    for epoch in range(textrank.steps):
+        pr = (1 - textrank.d) + textrank.d * np.dot(g, pr)
+        if abs(previous_pr - sum(pr)) < textrank.min_diff:
+            break
+        else:
+            previous_pr = sum(pr)
+    return pr
+
+
+def sentences_of(document):
+    return [sentence.split() for sentence in document.split(".") if sentence]
+
+
+@pytest.mark.parametrize("length", [5, 40, 300])
+def test_pagerank_matches_dense_engine(textrank, length):
+    for document in fixtures.documents(5, length, seed=length):
+        sentences = sentences_of(document)
+        vocab = textrank.get_vocab(sentences)
+        token_pairs = textrank.get_token_pairs(4, sentences)
+        pr = textrank.pagerank(textrank.get_matrix(vocab, token_pairs))
+        np.testing.assert_allclose(pr, dense_pagerank(textrank, vocab, token_pairs))
+
+
+def test_pagerank_many_matches_per_document(textrank):
+    matrices, expected = [], []
+    for document in fixtures.documents(6, 50, seed=2):
+        sentences = sentences_of(document)
+        vocab = textrank.get_vocab(sentences)
+        g = textrank.get_matrix(vocab, textrank.get_token_pairs(4, sentences))
+        matrices.append(g)
+        expected.append(textrank.pagerank(g))
+
+    blocks = np.repeat(np.arange(len(matrices)), [g.shape[0] for g in matrices])
+    pr = textrank.pagerank_many(sparse.block_diag(matrices).tocsr(), blocks, len(matrices))
+    np.testing.assert_allclose(pr, np.concatenate(expected))
+
+
+def test_converge_reaches_fixed_point(textrank):
+    sentences = sentences_of(fixtures.documents(1, 200, seed=4)[0])
+    vocab = textrank.get_vocab(sentences)
+    g = textrank.get_matrix(vocab, textrank.get_token_pairs(4, sentences))
+    pr = textrank.pagerank(g, converge=True)
+    assert np.abs((1 - textrank.d) + textrank.d * (g @ pr) - pr).sum() < textrank.min_diff